@@ -1,21 +1,75 @@
 from functools import wraps
 import re
 import mimetypes
-from flask import Flask, redirect, request, jsonify, send_from_directory, render_template, session
+from flask import Flask, Response, redirect, request, jsonify, send_from_directory, render_template, session, stream_with_context
 from flask_cors import CORS
-from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, MongoClient, UpdateOne
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, UTC
 from werkzeug.utils import secure_filename
-import random
 import hashlib
+import base64
+import json
+import atexit
+import click
 import os
 import tempfile
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
 import boto3
 from botocore.client import Config
 from pdf_question_parser import parse_questions_from_file, PDFQuestionParserError, ParseConfig
+from question_difficulty import (
+    BAND_FIELD as DIFFICULTY_BAND_FIELD,
+    DIFFICULTY_FIELD,
+    difficulty_fields,
+    difficulty_pipeline_stages,
+    difficulty_query,
+    parse_difficulty_range,
+)
+from question_sampling import (
+    RANDOM_KEY_FIELD,
+    backfill_random_keys,
+    default_max_scan,
+    new_random_key,
+    reshuffle_many,
+    reshuffle_update,
+    sample_question,
+    sample_questions,
+)
+from practice_seen import SeenFilter
+from content_cache import SizedLRUCache, VersionedCache
+from counter_buffer import CounterBuffer
+from group_dashboard import dashboard_totals, group_key, summarize_group
+from score_ingest import ScoreIngestor, submission_indexes
+from single_flight import SingleFlight
+from simulator_grading import (
+    AnswerKey,
+    grade,
+    grade_submission,
+    item_analysis,
+    parse_submitted_responses,
+    response_matrix,
+    section_stats_row,
+)
+from tabular_export import EXPORT_CHUNK_ROWS, XLSX_MIMETYPE, iter_csv, iter_xlsx
+from image_manifest import DirectoryManifest
+from fast_json import FastJSONProvider
+from compression import init_compression, precompress, precompressed_response
+from question_dedup import (
+    BUCKETS_FIELD,
+    DEFAULT_THRESHOLD as DUPLICATE_THRESHOLD,
+    NUMBERS_FIELD,
+    SIGNATURE_FIELD,
+    LSHIndex,
+    decode_signature,
+    fingerprint_fields,
+    similarity as signature_similarity,
+)
 
 load_dotenv()
 MONGO_URI = os.environ.get("MONGO_URI")
@@ -52,16 +106,126 @@ SIMULATOR_SECTION_ALIASES = {
     "geografía": "Geografía",
     "arte": "Arte"
 }
+# Posicion de cada seccion en el examen; se guarda como section_rank en cada pregunta.
+SIMULATOR_SECTION_RANK = {name: idx for idx, name in enumerate(SIMULATOR_SECTION_ORDER)}
+# Orden de las preguntas de un simulador (cubierto por ix_questions_simulator_order).
+SIMULATOR_QUESTION_SORT = [
+    ('section_rank', ASCENDING),
+    ('simulator_subject', ASCENDING),
+    ('created_at', ASCENDING),
+    ('_id', ASCENDING)
+]
+# Ranking de un simulador (ix_attempts_rank): aciertos, total, quien termino antes y _id como desempate.
+SIMULATOR_RANK_SORT = [
+    ('correct', DESCENDING),
+    ('total', DESCENDING),
+    ('finished_at', ASCENDING),
+    ('_id', ASCENDING)
+]
+SIMULATOR_RANK_PROJECTION = {
+    'user_id': 1, 'student_name': 1, 'student_group': 1, 'correct': 1, 'total': 1,
+    'finished_at': 1, 'section_stats': 1
+}
+SIMULATOR_RANK_DEFAULT_NEIGHBORS = 5
+# Campos de una pregunta que forman la clave de respuestas (simulator_grading.AnswerKey).
+ANSWER_KEY_PROJECTION = {'has_options': 1, 'options': 1, 'correct_option': 1, 'simulator_subject': 1}
+ITEM_ANALYSIS_TEXT_LENGTH = 160
+# Version de los alumnos y sus grupos: el tablero por grupo se reconstruye si cambia.
+STUDENTS_VERSION_KEY = 'students'
+ATTENDANCE_PAGE_MAX_SIZE = 200
+# Descargas de resultados y control de aplicacion (mismas columnas que las tablas del panel).
+SIMULATOR_EXPORT_FORMATS = ('csv', 'xlsx')
+ATTENDANCE_EXPORT_HEADER = ['#', 'Alumno', 'Grupo', 'Estado', 'Puntaje', 'Finalizó']
+SIMULATOR_RANK_MAX_NEIGHBORS = 50
+QUESTION_PAGE_DEFAULT_LIMIT = 50
+QUESTION_PAGE_MAX_LIMIT = 200
+# Busqueda de texto (indice tx_questions_search): campos y pesos del ranking.
+QUESTION_SEARCH_WEIGHTS = {'question': 10, 'options': 5, 'correct_answer': 3, 'solution': 2}
+QUESTION_SEARCH_MAX_QUERY_LENGTH = 200
+QUESTION_FILTER_FIELDS = ('subject', 'topic', 'university', 'simulator_subject')
+# created_at usa ix_questions_created_at_desc; times_shown solo se usa para "top N".
+QUESTION_SORT_FIELDS = ('created_at', 'times_shown')
+QUESTION_EXPORT_FORMATS = ('ndjson', 'csv')
+QUESTION_EXPORT_DEFAULT_BATCH = 500
+QUESTION_EXPORT_MAX_BATCH = 5000
+# Lineas acumuladas antes de enviar un chunk al cliente.
+QUESTION_EXPORT_CHUNK_LINES = 200
+QUESTION_EXPORT_CSV_COLUMNS = [
+    '_id', 'subject', 'topic', 'simulator_subject', 'university', 'question',
+    'has_options', 'options', 'correct_option', 'correct_answer', 'solution',
+    'image', 'times_shown', 'times_correct', 'source', 'created_at', 'updated_at'
+]
+QUESTION_PROJECTABLE_FIELDS = {
+    'subject', 'topic', 'simulator_subject', 'question', 'has_options', 'options',
+    'correct_answer', 'correct_option', 'answer', 'solution', 'university', 'image',
+    'created_at', 'updated_at', 'times_shown', 'times_correct', 'source', DIFFICULTY_FIELD
+}
+# Campos que cambian con cada respuesta (no mueven la version del catalogo).
+QUESTION_COUNTER_FIELDS = ('times_shown', 'times_correct', DIFFICULTY_FIELD)
+# Practica por lotes: /api/questions/random?n=K
+PRACTICE_BATCH_MAX = 50
+PRACTICE_SESSION_TTL_SECONDS = 12 * 60 * 60
+# Si el filtro de vistas se satura, se reinicia para no descartar preguntas de mas.
+PRACTICE_SEEN_MAX_FALSE_POSITIVE = 0.2
+# Reintentos al guardar el filtro si otra peticion de la misma sesion escribio antes.
+PRACTICE_SEEN_SAVE_RETRIES = 5
+# Antes de reiniciar la ronda se busca de nuevo leyendo hasta este multiplo del tope normal.
+PRACTICE_RESCAN_FACTOR = 10
+# Contador de version del catalogo materia -> tema -> conteo (content_versions).
+CATALOG_VERSION_KEY = 'catalog'
+# Respuestas con ETag: el navegador guarda el cuerpo pero revalida siempre.
+CONTENT_CACHE_CONTROL = 'private, max-age=0, must-revalidate'
+# Campos internos (muestreo y deteccion de duplicados) que no se envian al cliente.
+QUESTION_INTERNAL_PROJECTION = {RANDOM_KEY_FIELD: 0, SIGNATURE_FIELD: 0, BUCKETS_FIELD: 0, NUMBERS_FIELD: 0}
+# Las respuestas no viajan al navegador: el servidor califica con la clave (get_simulator_answer_key).
+SIMULATOR_ANSWER_FIELDS = ('correct_option', 'correct_answer', 'solution')
+# El examen no usa contadores ni random_key; excluirlos mantiene estable el ETag del simulador.
+SIMULATOR_QUESTION_PROJECTION = {
+    'times_shown': 0, 'times_correct': 0, **QUESTION_INTERNAL_PROJECTION,
+    **{field: 0 for field in SIMULATOR_ANSWER_FIELDS}
+}
+# Carga masiva: que hacer con preguntas casi duplicadas (skip = omitir, flag = insertar marcadas).
+QUESTION_DUPLICATE_MODES = ('skip', 'flag', 'allow')
+# Documento materializado de /api/stats (coleccion question_stats).
+QUESTION_STATS_DOC_ID = 'global'
+QUESTION_STATS_BUCKETS = (('subject', 'subjects'), ('university', 'universities'), ('topic', 'topics'))
+QUESTION_STATS_FIELDS = {'subject': 1, 'university': 1, 'topic': 1, 'times_shown': 1, 'times_correct': 1}
+# Contadores times_shown/times_correct con escritura diferida (COUNTER_BUFFER_SYNC=1 escribe al momento).
+COUNTER_FLUSH_MAX_PENDING = int(os.getenv("COUNTER_FLUSH_MAX_PENDING", "500"))
+COUNTER_FLUSH_INTERVAL_SECONDS = float(os.getenv("COUNTER_FLUSH_INTERVAL_SECONDS", "2"))
+COUNTER_BUFFER_SYNC = os.getenv("COUNTER_BUFFER_SYNC", "").strip().lower() in ('1', 'true', 'yes', 'si', 'sí')
+# Envios de puntaje de simulador: cola durable aplicada por lotes (SCORE_INGEST_SYNC=1 aplica al momento).
+SCORE_INGEST_BATCH_SIZE = int(os.getenv("SCORE_INGEST_BATCH_SIZE", "500"))
+SCORE_INGEST_INTERVAL_SECONDS = float(os.getenv("SCORE_INGEST_INTERVAL_SECONDS", "0.5"))
+SCORE_INGEST_SYNC = os.getenv("SCORE_INGEST_SYNC", "").strip().lower() in ('1', 'true', 'yes', 'si', 'sí')
+SCORE_SUBMISSION_TTL_SECONDS = 7 * 24 * 60 * 60
+# Recalificar al cambiar la clave de un simulador corre en segundo plano (SIMULATOR_REGRADE_SYNC=1 al momento).
+SIMULATOR_REGRADE_SYNC = os.getenv("SIMULATOR_REGRADE_SYNC", "").strip().lower() in ('1', 'true', 'yes', 'si', 'sí')
 _pix2text_instance = None
 _r2_client = None
+_catalog_cache = VersionedCache()
+# Paquetes precompilados de /api/simulators/<name>/questions (JSON + variantes comprimidas) por worker.
+SIMULATOR_BUNDLE_CACHE_BYTES = int(os.getenv("SIMULATOR_BUNDLE_CACHE_MB", "64")) * 1024 * 1024
+_simulator_bundles = SizedLRUCache(SIMULATOR_BUNDLE_CACHE_BYTES, sizeof=lambda bundle: bundle['size'])
+# Claves de respuestas compiladas por simulador (arreglos NumPy), invalidadas por version.
+ANSWER_KEY_CACHE_BYTES = int(os.getenv("ANSWER_KEY_CACHE_MB", "16")) * 1024 * 1024
+_answer_keys = SizedLRUCache(ANSWER_KEY_CACHE_BYTES, sizeof=lambda entry: entry['size'])
+# Analisis de reactivos por simulador; se recalcula si cambian sus preguntas o sus intentos.
+ITEM_ANALYSIS_CACHE_BYTES = int(os.getenv("ITEM_ANALYSIS_CACHE_MB", "8")) * 1024 * 1024
+_item_analyses = SizedLRUCache(ITEM_ANALYSIS_CACHE_BYTES, sizeof=lambda analysis: analysis['size'])
+# Una sola ejecucion por clave y worker para lecturas costosas pedidas a la vez.
+_read_flights = SingleFlight()
 
 # ========== CONFIGURACIÓN DE LA APLICACIÓN ==========
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'svg'}
 UPLOAD_FOLDER = os.path.join(app.root_path, 'static', 'img')
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Imagenes locales heredadas: se consultan en memoria en lugar de os.path.exists por pregunta.
+local_images = DirectoryManifest(UPLOAD_FOLDER)
 CORS(app)
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY")
 app.config['R2_ENDPOINT_URL'] = os.getenv("R2_ENDPOINT_URL", "").strip()
@@ -70,6 +234,11 @@ app.config['R2_SECRET_ACCESS_KEY'] = os.getenv("R2_SECRET_ACCESS_KEY", "").strip
 app.config['R2_BUCKET_NAME'] = os.getenv("R2_BUCKET_NAME", "").strip()
 app.config['R2_REGION'] = os.getenv("R2_REGION", "auto").strip()
 app.config['R2_PUBLIC_BASE_URL'] = os.getenv("R2_PUBLIC_BASE_URL", "").strip().rstrip("/")
+app.config['COMPRESSION_ENABLED'] = os.getenv("COMPRESSION_ENABLED", "1").strip().lower() not in ('0', 'false', 'no')
+app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+app.config['COMPRESSION_GZIP_LEVEL'] = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+init_compression(app)
 
 # ========== CONEXIÓN A MONGODB ==========
 client = MongoClient(MONGO_URI)
@@ -79,6 +248,12 @@ users_collection = db['usuarios']
 simulators_collection = db['simuladores']
 simulator_scores_collection = db['simulator_scores']
 simulator_attempts_collection = db['simulator_attempts']
+practice_sessions_collection = db['practice_sessions']
+content_versions_collection = db['content_versions']
+question_stats_collection = db['question_stats']
+question_duplicates_collection = db['question_duplicate_clusters']
+simulator_submissions_collection = db['simulator_submissions']
+simulator_dashboards_collection = db['simulator_dashboards']
 
 
 def _safe_create_indexes(collection, indexes, label):
@@ -102,6 +277,17 @@ def _drop_legacy_scores_index():
         pass
 
 
+def _drop_index_if_keys_differ(collection, name, keys):
+    """Drop an index whose key spec changed so ensure_mongo_indexes can rebuild it."""
+    try:
+        info = collection.index_information().get(name)
+        if info and [tuple(k) for k in info.get('key', [])] != list(keys):
+            collection.drop_index(name)
+            print(f"[mongo] {collection.name}: dropped outdated {name}")
+    except Exception as exc:
+        print(f"[mongo] warning checking index {name}: {exc}")
+
+
 def ensure_mongo_indexes():
     """Ensure production indexes for users, simulators, attempts and scoreboards."""
     _safe_create_indexes(
@@ -118,10 +304,47 @@ def ensure_mongo_indexes():
             IndexModel([("subject", ASCENDING), ("topic", ASCENDING)], name="ix_questions_subject_topic"),
             IndexModel([("subject", ASCENDING), ("university", ASCENDING)], name="ix_questions_subject_university"),
             IndexModel([("topic", ASCENDING), ("simulator_subject", ASCENDING)], name="ix_questions_topic_simulator_subject"),
-            IndexModel([("created_at", DESCENDING)], name="ix_questions_created_at_desc"),
+            # created_at + _id: orden estable para paginacion por cursor (keyset).
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="ix_questions_created_at_desc"),
+            # Muestreo aleatorio por rango sobre random_key (ver question_sampling).
+            IndexModel([(RANDOM_KEY_FIELD, ASCENDING)], name="ix_questions_random"),
+            IndexModel([("subject", ASCENDING), (RANDOM_KEY_FIELD, ASCENDING)], name="ix_questions_subject_random"),
+            IndexModel([("subject", ASCENDING), ("topic_key", ASCENDING), (RANDOM_KEY_FIELD, ASCENDING)], name="ix_questions_subject_topic_random"),
+            # Practica por dificultad: difficulty_band $in + rango de random_key (ver question_difficulty).
+            IndexModel([(DIFFICULTY_BAND_FIELD, ASCENDING), (RANDOM_KEY_FIELD, ASCENDING)], name="ix_questions_difficulty_random"),
+            IndexModel(
+                [("subject", ASCENDING), (DIFFICULTY_BAND_FIELD, ASCENDING), (RANDOM_KEY_FIELD, ASCENDING)],
+                name="ix_questions_subject_difficulty_random",
+            ),
+            IndexModel(
+                [("subject", ASCENDING), ("topic_key", ASCENDING), (DIFFICULTY_BAND_FIELD, ASCENDING), (RANDOM_KEY_FIELD, ASCENDING)],
+                name="ix_questions_subject_topic_difficulty_random",
+            ),
+            IndexModel(
+                [("subject", ASCENDING), ("topic_key", ASCENDING), ("section_rank", ASCENDING),
+                 ("simulator_subject", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+                name="ix_questions_simulator_order",
+            ),
+            # Bandas LSH (multikey) para buscar casi duplicados sin recorrer el banco.
+            IndexModel([(BUCKETS_FIELD, ASCENDING)], name="ix_questions_lsh_buckets"),
         ],
         "matematicas",
     )
+    # Indice de texto aparte: Mongo permite uno por coleccion y no debe bloquear los demas.
+    # Con idioma spanish ignora acentos y mayusculas y aplica stemming.
+    _safe_create_indexes(
+        questions_collection,
+        [
+            IndexModel(
+                [(field, TEXT) for field in QUESTION_SEARCH_WEIGHTS],
+                name="tx_questions_search",
+                weights=QUESTION_SEARCH_WEIGHTS,
+                default_language="spanish",
+                language_override="search_language",
+            ),
+        ],
+        "matematicas (texto)",
+    )
     _safe_create_indexes(
         simulators_collection,
         [
@@ -137,6 +360,17 @@ def ensure_mongo_indexes():
             IndexModel([("simulator", ASCENDING), ("user_id", ASCENDING)], unique=True, name="ux_attempts_simulator_user"),
             IndexModel([("simulator", ASCENDING), ("finished_at", DESCENDING)], name="ix_attempts_simulator_finished"),
             IndexModel([("user_id", ASCENDING), ("finished_at", DESCENDING)], name="ix_attempts_user_finished"),
+            # Ranking paginado por Mongo (SIMULATOR_RANK_SORT), general y por grupo.
+            IndexModel(
+                [("simulator", ASCENDING), ("correct", DESCENDING), ("total", DESCENDING),
+                 ("finished_at", ASCENDING), ("_id", ASCENDING)],
+                name="ix_attempts_rank",
+            ),
+            IndexModel(
+                [("simulator", ASCENDING), ("student_group", ASCENDING), ("correct", DESCENDING),
+                 ("total", DESCENDING), ("finished_at", ASCENDING), ("_id", ASCENDING)],
+                name="ix_attempts_group_rank",
+            ),
         ],
         "simulator_attempts",
     )
@@ -149,16 +383,96 @@ def ensure_mongo_indexes():
         ],
         "simulator_scores",
     )
+    _safe_create_indexes(
+        practice_sessions_collection,
+        [
+            IndexModel(
+                [("updated_at", ASCENDING)],
+                expireAfterSeconds=PRACTICE_SESSION_TTL_SECONDS,
+                name="ttl_practice_sessions_updated",
+            ),
+        ],
+        "practice_sessions",
+    )
+    _safe_create_indexes(
+        simulator_submissions_collection,
+        submission_indexes(SCORE_SUBMISSION_TTL_SECONDS),
+        "simulator_submissions",
+    )
 
 
 # Safe to call in every worker boot; Mongo create_indexes is idempotent.
 _drop_legacy_scores_index()
+_drop_index_if_keys_differ(
+    questions_collection,
+    "ix_questions_created_at_desc",
+    [("created_at", DESCENDING), ("_id", DESCENDING)],
+)
+_drop_index_if_keys_differ(
+    questions_collection,
+    "ix_questions_subject_topic_random",
+    [("subject", ASCENDING), ("topic_key", ASCENDING), (RANDOM_KEY_FIELD, ASCENDING)],
+)
 ensure_mongo_indexes()
 
+
+def ensure_question_random_keys():
+    """Backfill random_key for questions created before index-backed sampling."""
+    try:
+        updated = backfill_random_keys(questions_collection)
+        if updated:
+            print(f"[mongo] matematicas: random_key asignado a {updated} preguntas")
+    except Exception as exc:
+        print(f"[mongo] warning backfilling random_key: {exc}")
+
+
+ensure_question_random_keys()
+
+
+def ensure_question_difficulty():
+    """Backfill difficulty/difficulty_band from the counters of existing questions."""
+    try:
+        result = questions_collection.update_many(
+            {DIFFICULTY_BAND_FIELD: {'$exists': False}},
+            difficulty_pipeline_stages()
+        )
+        if result.modified_count:
+            print(f"[mongo] matematicas: dificultad calculada para {result.modified_count} preguntas")
+    except Exception as exc:
+        print(f"[mongo] warning backfilling difficulty: {exc}")
+
+
+ensure_question_difficulty()
+
+
+def ensure_attempt_student_groups():
+    """Backfill student_group on attempts saved without it, so ix_attempts_group_rank can filter by group."""
+    try:
+        missing = list(simulator_attempts_collection.find(
+            {'$or': [{'student_group': {'$exists': False}}, {'student_group': None}, {'student_group': ''}]},
+            {'user_id': 1}
+        ))
+        user_ids = {str(a.get('user_id')) for a in missing if ObjectId.is_valid(str(a.get('user_id') or ''))}
+        if not user_ids:
+            return
+        groups = {
+            str(doc['_id']): (doc.get('grupo') or '').strip()
+            for doc in users_collection.find({'_id': {'$in': [ObjectId(uid) for uid in user_ids]}}, {'grupo': 1})
+        }
+        ops = [
+            UpdateOne({'_id': a['_id']}, {'$set': {'student_group': groups[str(a.get('user_id'))]}})
+            for a in missing if groups.get(str(a.get('user_id')))
+        ]
+        if ops:
+            simulator_attempts_collection.bulk_write(ops, ordered=False)
+            print(f"[mongo] simulator_attempts: grupo completado en {len(ops)} intentos")
+    except Exception as exc:
+        print(f"[mongo] warning backfilling attempt groups: {exc}")
+
+
+ensure_attempt_student_groups()
+
 # ========== FUNCIONES HELPER ==========
-# Crear carpeta si no existe
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
 def allowed_file(filename):
@@ -249,6 +563,7 @@ def delete_image_from_storage(image_ref):
             os.remove(local_path)
         except OSError:
             pass
+        local_images.invalidate()
 
 
 def hash_password(password):
@@ -261,38 +576,518 @@ def jsonify_user(user):
         user['_id'] = str(user['_id'])
     return user
 
+def is_local_image_ref(image_name):
+    return bool(image_name) and not image_name.startswith('questions/') and not is_external_image_ref(image_name)
+
+def local_image_exists(image_name):
+    if '/' in image_name or os.sep in image_name:
+        return os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], image_name))
+    return image_name in local_images
+
+def resolve_image_fields(image_ref):
+    """Campos image_url / image_available que se guardan al escribir la pregunta."""
+    image_name = str(image_ref or '').strip()
+    if not image_name:
+        return {'image_url': '', 'image_available': False}
+    if image_name.startswith('questions/'):
+        # Clave de R2 guardada en DB: exponer URL si hay dominio público configurado.
+        public_base = app.config.get('R2_PUBLIC_BASE_URL', '').rstrip('/')
+        url = f"{public_base}/{image_name}" if public_base else image_name
+        return {'image_url': url, 'image_available': True}
+    if is_external_image_ref(image_name):
+        return {'image_url': image_name, 'image_available': True}
+    available = local_image_exists(image_name)
+    return {'image_url': image_name if available else '', 'image_available': available}
+
 def jsonify_question(question):
-    """Convierte ObjectId a string para una pregunta"""
+    """Convierte ObjectId a string para una pregunta (sin acceso a disco)"""
     if question and '_id' in question:
         question['_id'] = str(question['_id'])
-    if question and question.get('image'):
+    if not question:
+        return question
+    image_url = question.pop('image_url', None)
+    image_available = question.pop('image_available', None)
+    question.pop('topic_key', None)
+    question.pop('section_rank', None)
+    question.pop(DIFFICULTY_BAND_FIELD, None)
+    question.pop(RANDOM_KEY_FIELD, None)
+    question.pop(SIGNATURE_FIELD, None)
+    question.pop(BUCKETS_FIELD, None)
+    question.pop(NUMBERS_FIELD, None)
+    if question.get('duplicate_of'):
+        question['duplicate_of'] = str(question['duplicate_of'])
+    if question.get('image'):
         image_name = str(question.get('image')).strip()
-        public_base = app.config.get('R2_PUBLIC_BASE_URL', '').rstrip('/')
-        if image_name.startswith('questions/'):
-            # Clave de R2 guardada en DB: exponer URL si hay dominio público configurado.
-            if public_base:
-                question['image'] = f"{public_base}/{image_name}"
-        elif image_name and not is_external_image_ref(image_name):
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_name)
+        if is_local_image_ref(image_name):
             # Evita 404 en frontend cuando el registro apunta a una imagen inexistente.
-            if not os.path.exists(image_path):
-                question['image'] = ''
+            question['image'] = image_name if local_image_exists(image_name) else ''
+        elif image_url is not None:
+            question['image'] = image_url if image_available else ''
+        else:
+            question['image'] = resolve_image_fields(image_name)['image_url']
     return question
 
+def backfill_question_image_fields(refresh=False):
+    """Resuelve image_url / image_available de las preguntas con imagen que no los tienen.
+
+    Con refresh=True se recalculan todas (p. ej. tras cambiar R2_PUBLIC_BASE_URL).
+    """
+    query = {'image': {'$nin': [None, '']}}
+    if not refresh:
+        query['image_url'] = {'$exists': False}
+    ops = []
+    updated = 0
+    for question in questions_collection.find(query, {'image': 1}):
+        ops.append(UpdateOne({'_id': question['_id']}, {'$set': resolve_image_fields(question.get('image'))}))
+        if len(ops) >= 500:
+            updated += questions_collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += questions_collection.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
+def ensure_question_image_fields():
+    """Backfill image_url for questions written before write-time resolution."""
+    try:
+        updated = backfill_question_image_fields()
+        if updated:
+            print(f"[mongo] matematicas: image_url resuelto para {updated} preguntas")
+    except Exception as exc:
+        print(f"[mongo] warning resolving image_url: {exc}")
+
+
+ensure_question_image_fields()
+
+
+def encode_question_cursor(question, sort_field='created_at'):
+    """Genera un cursor opaco (valor de orden, _id) para la siguiente pagina."""
+    value = question.get(sort_field)
+    if isinstance(value, datetime):
+        value = {'$date': value.isoformat()}
+    payload = [value, str(question['_id'])]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_question_cursor(token):
+    """Decodifica un cursor de encode_question_cursor. Lanza ValueError si es invalido."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, oid_raw = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value['$date'])
+        return value, ObjectId(oid_raw)
+    except Exception as exc:
+        raise ValueError('Cursor invalido') from exc
+
+def question_keyset_clause(sort_field, value, oid, descending=True):
+    """Condicion "despues de (sort_field, _id)" compatible con el orden del indice.
+
+    Los documentos sin el campo ordenan como null: al final en orden
+    descendente y al inicio en ascendente.
+    """
+    id_op = '$lt' if descending else '$gt'
+    if value is None:
+        if descending:
+            return {sort_field: None, '_id': {id_op: oid}}
+        return {'$or': [
+            {sort_field: None, '_id': {id_op: oid}},
+            {sort_field: {'$ne': None}}
+        ]}
+    clauses = [
+        {sort_field: {'$lt' if descending else '$gt': value}},
+        {sort_field: value, '_id': {id_op: oid}}
+    ]
+    if descending:
+        clauses.append({sort_field: None})
+    return {'$or': clauses}
+
+def build_question_filters(args):
+    """Filtros exactos de la lista de preguntas a partir de los query params."""
+    query = {}
+    for field in QUESTION_FILTER_FIELDS:
+        value = (args.get(field) or '').strip()
+        if value and value.lower() != 'todos':
+            query[field] = value
+    if 'subject' not in query and parse_bool(args.get('exclude_simulator'), False):
+        query['subject'] = {'$ne': SIMULATOR_SUBJECT}
+    has_options = args.get('has_options')
+    if has_options is not None and str(has_options).strip() != '':
+        query['has_options'] = parse_bool(has_options)
+    return query
+
+def parse_question_projection(raw_fields):
+    """Convierte fields=a,b,c en proyeccion de Mongo (None = documento completo)."""
+    if not raw_fields:
+        return None
+    fields = {f.strip() for f in str(raw_fields).split(',') if f.strip()}
+    unknown = fields - QUESTION_PROJECTABLE_FIELDS - {'_id'}
+    if unknown:
+        raise ValueError(f"Campos no permitidos: {', '.join(sorted(unknown))}")
+    projection = {field: 1 for field in fields}
+    if 'image' in projection:
+        projection.update({'image_url': 1, 'image_available': 1})
+    return projection
+
+def _export_json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return datetime_to_iso_utc(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+def iter_questions_ndjson(cursor):
+    """Genera el export NDJSON (un documento por linea) desde un cursor de Mongo."""
+    lines = []
+    try:
+        for doc in cursor:
+            lines.append(json.dumps(doc, default=_export_json_default, ensure_ascii=False))
+            if len(lines) >= QUESTION_EXPORT_CHUNK_LINES:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    finally:
+        cursor.close()
+
+def iter_question_csv_rows(cursor, columns):
+    """Filas del export CSV (valores de ``columns`` por pregunta); el formato de celda es el de ``iter_csv``."""
+    try:
+        for doc in cursor:
+            yield [doc.get(column) for column in columns]
+    finally:
+        cursor.close()
+
+def get_content_version(key):
+    """Version actual de un contenido cacheado (0 si nunca se ha escrito)."""
+    doc = content_versions_collection.find_one({'_id': key}, {'version': 1})
+    return int((doc or {}).get('version', 0) or 0)
+
+def bump_content_version(*keys):
+    """Incrementa versiones tras una escritura; invalida las caches de todos los workers."""
+    now_utc = datetime.now(UTC)
+    ops = [
+        UpdateOne({'_id': key}, {'$inc': {'version': 1}, '$set': {'updated_at': now_utc}}, upsert=True)
+        for key in dict.fromkeys(keys) if key
+    ]
+    if ops:
+        content_versions_collection.bulk_write(ops, ordered=False)
+
+def simulator_version_key(simulator_name):
+    """Clave de version del contenido de un simulador (sin distinguir mayusculas)."""
+    return f"simulator:{normalize_topic_key(simulator_name)}"
+
+def simulator_attempts_version_key(simulator_name):
+    """Version de los intentos de un simulador: cambia al aplicar envios o recalificar."""
+    return f"attempts:{normalize_topic_key(simulator_name)}"
+
+def question_version_keys(*questions):
+    """Versiones que cambian al escribir estas preguntas: catalogo y sus simuladores."""
+    keys = [CATALOG_VERSION_KEY]
+    for question in questions:
+        if question and question.get('subject') == SIMULATOR_SUBJECT and question.get('topic'):
+            keys.append(simulator_version_key(question.get('topic')))
+    return keys
+
+def make_content_etag(*parts):
+    """ETag fuerte a partir de versiones y parametros que determinan el cuerpo."""
+    raw = json.dumps(parts, separators=(',', ':'), default=str, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def conditional_json(etag, build_payload):
+    """Responde 304 si el cliente ya tiene ``etag``; si no, construye y firma el JSON.
+
+    ``build_payload`` solo se ejecuta cuando hay que enviar el cuerpo.
+    """
+    # contains_weak: al comprimir la respuesta el ETag se vuelve debil (ver compression.py).
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CONTENT_CACHE_CONTROL
+    return response
+
+def build_simulator_bundle(simulator_name, etag):
+    """Compila las preguntas de un simulador: JSON serializado y sus variantes comprimidas."""
+    simul = simulators_collection.find_one({'name': simulator_name})
+    query = {'subject': SIMULATOR_SUBJECT, 'topic_key': normalize_topic_key(simulator_name)}
+    # Los contadores cambian con cada respuesta; fuera del payload la version basta como ETag.
+    # El orden por seccion sale del indice ix_questions_simulator_order.
+    cursor = questions_collection.find(query, SIMULATOR_QUESTION_PROJECTION).sort(SIMULATOR_QUESTION_SORT)
+    questions = []
+    for question in cursor:
+        question['simulator_subject'] = normalize_simulator_section(question.get('simulator_subject', ''))
+        questions.append(jsonify_question(question))
+    body = app.json.dumps({
+        'success': True,
+        'count': len(questions),
+        'simulator': simulator_name,
+        'time_limit': simul.get('time_limit', DEFAULT_SIMULATOR_TIME) if simul else DEFAULT_SIMULATOR_TIME,
+        'enabled_from': datetime_to_iso_utc(simul.get('enabled_from')) if simul else None,
+        'enabled_until': datetime_to_iso_utc(simul.get('enabled_until')) if simul else None,
+        'force_enabled': parse_bool(simul.get('force_enabled'), False) if simul else False,
+        'questions': questions
+    }).encode('utf-8')
+    variants = precompress(body, app.config)
+    return {
+        'simulator': simul,
+        'etag': etag,
+        'body': body,
+        'variants': variants,
+        'size': len(body) + sum(len(data) for data in variants.values())
+    }
+
+def get_simulator_bundle(simulator_name):
+    """Paquete del simulador desde la LRU del worker; se recompila si cambio su version.
+
+    Editar preguntas del simulador o su configuracion incrementa
+    ``simulator_version_key`` y cambiar static/img la version del manifiesto,
+    asi que una sola lectura de version decide si el paquete sigue vigente.
+    """
+    version_key = simulator_version_key(simulator_name)
+    version = (get_content_version(version_key), local_images.version)
+    etag = make_content_etag(version_key, version[0], simulator_name, version[1])
+    return _simulator_bundles.get(
+        simulator_name,
+        version,
+        lambda: _read_flights.do(
+            ('simulator_questions', simulator_name, version),
+            lambda: build_simulator_bundle(simulator_name, etag)
+        )
+    )
+
+def build_question_catalog():
+    """Arbol {materia: {'count': n, 'topics': {tema: n}}} con una sola agregacion."""
+    catalog = {}
+    grouped = questions_collection.aggregate([
+        {'$group': {'_id': {'subject': '$subject', 'topic': '$topic'}, 'count': {'$sum': 1}}}
+    ])
+    for item in grouped:
+        key = item.get('_id') or {}
+        subject = key.get('subject')
+        if not subject:
+            continue
+        node = catalog.setdefault(subject, {'count': 0, 'topics': {}})
+        node['count'] += item.get('count', 0)
+        topic = key.get('topic')
+        if topic:
+            node['topics'][topic] = node['topics'].get(topic, 0) + item.get('count', 0)
+    return catalog
+
+def get_question_catalog():
+    """Catalogo cacheado en el worker; se reconstruye solo si cambio su version."""
+    return _catalog_cache.get(
+        CATALOG_VERSION_KEY,
+        get_content_version(CATALOG_VERSION_KEY),
+        build_question_catalog
+    )
+
+def _stats_key(value):
+    """Nombre de campo seguro para Mongo (sin '.' ni '$' inicial)."""
+    key = str(value).replace('.', '\uff0e')
+    if key.startswith('$'):
+        key = '\uff04' + key[1:]
+    return key
+
+def _stats_label(key):
+    label = key.replace('\uff0e', '.')
+    if label.startswith('\uff04'):
+        label = '$' + label[1:]
+    return label
+
+def question_stats_delta(questions, sign=1):
+    """Incrementos ($inc) del documento de estadisticas al agregar o quitar preguntas."""
+    inc = {}
+    def add(path, amount):
+        if amount:
+            inc[path] = inc.get(path, 0) + amount
+    for question in questions:
+        add('total_questions', sign)
+        for field, bucket in QUESTION_STATS_BUCKETS:
+            value = question.get(field)
+            if value is not None and value != '':
+                add(f"{bucket}.{_stats_key(value)}", sign)
+        add('total_shown', sign * int(question.get('times_shown', 0) or 0))
+        add('total_correct', sign * int(question.get('times_correct', 0) or 0))
+    return inc
+
+def merge_stats_deltas(*deltas):
+    merged = {}
+    for delta in deltas:
+        for path, amount in delta.items():
+            merged[path] = merged.get(path, 0) + amount
+    return {path: amount for path, amount in merged.items() if amount}
+
+def apply_question_stats(inc):
+    """Aplica incrementos al documento de estadisticas (atomico, sin leer el banco)."""
+    if not inc:
+        return
+    question_stats_collection.update_one(
+        {'_id': QUESTION_STATS_DOC_ID},
+        {'$inc': inc, '$set': {'updated_at': datetime.now(UTC)}},
+        upsert=True
+    )
+
+def flush_question_counters_stats(pending, result):
+    """Refleja en /api/stats los contadores volcados por question_counters."""
+    if result.matched_count < len(pending):
+        # Preguntas borradas antes del volcado: sus incrementos no cuentan.
+        existing = {
+            doc['_id'] for doc in questions_collection.find({'_id': {'$in': list(pending)}}, {'_id': 1})
+        }
+        pending = {_id: entry for _id, entry in pending.items() if _id in existing}
+    inc = {}
+    for entry in pending.values():
+        counters = entry.get('$inc', {})
+        inc['total_shown'] = inc.get('total_shown', 0) + counters.get('times_shown', 0)
+        inc['total_correct'] = inc.get('total_correct', 0) + counters.get('times_correct', 0)
+    apply_question_stats({path: amount for path, amount in inc.items() if amount})
+
+question_counters = CounterBuffer(
+    questions_collection,
+    max_pending=COUNTER_FLUSH_MAX_PENDING,
+    flush_interval=COUNTER_FLUSH_INTERVAL_SECONDS,
+    synchronous=COUNTER_BUFFER_SYNC,
+    on_flush=flush_question_counters_stats,
+    # La dificultad se recalcula en la misma escritura que los contadores.
+    derived_stages=difficulty_pipeline_stages()
+)
+atexit.register(question_counters.close)
+
+def resolve_student_profiles(user_ids):
+    """{user_id: {'name', 'group'}} de los alumnos de un lote de envios, en una consulta."""
+    object_ids = [ObjectId(uid) for uid in user_ids if ObjectId.is_valid(str(uid))]
+    profiles = {}
+    if not object_ids:
+        return profiles
+    for user_doc in users_collection.find({'_id': {'$in': object_ids}}, {'nombre': 1, 'apellido': 1, 'grupo': 1}):
+        nombre = (user_doc.get('nombre') or '').strip()
+        apellido = (user_doc.get('apellido') or '').strip()
+        profiles[str(user_doc['_id'])] = {
+            'name': f"{nombre} {apellido}".strip(),
+            'group': (user_doc.get('grupo') or '').strip()
+        }
+    return profiles
+
+def on_scores_applied(submissions):
+    """Invalida en todos los workers lo que depende de los intentos y actualiza los tableros."""
+    bump_content_version(*(simulator_attempts_version_key(doc['simulator']) for doc in submissions))
+    groups_by_simulator = {}
+    for doc in submissions:
+        groups_by_simulator.setdefault(doc['simulator'], set()).add((doc.get('student_group') or '').strip())
+    for simulator_name, groups in groups_by_simulator.items():
+        try:
+            refresh_simulator_dashboard(simulator_name, groups)
+        except Exception as exc:
+            print(f"[dashboard] warning refreshing {simulator_name}: {exc}")
+
+score_ingestor = ScoreIngestor(
+    simulator_submissions_collection,
+    simulator_attempts_collection,
+    simulator_scores_collection,
+    resolve_students=resolve_student_profiles,
+    batch_size=SCORE_INGEST_BATCH_SIZE,
+    flush_interval=SCORE_INGEST_INTERVAL_SECONDS,
+    synchronous=SCORE_INGEST_SYNC,
+    on_apply=on_scores_applied
+)
+atexit.register(score_ingestor.close)
+
+def recompute_question_stats():
+    """Reconstruye desde cero el documento de estadisticas (reparacion)."""
+    # Lo pendiente en este worker se escribe antes de contar.
+    question_counters.flush()
+    doc = {
+        '_id': QUESTION_STATS_DOC_ID,
+        'total_questions': questions_collection.count_documents({}),
+        'total_shown': 0,
+        'total_correct': 0,
+    }
+    for field, bucket in QUESTION_STATS_BUCKETS:
+        grouped = questions_collection.aggregate([
+            {'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}
+        ])
+        doc[bucket] = {
+            _stats_key(item['_id']): item['count']
+            for item in grouped
+            if item.get('_id') is not None and item.get('_id') != ''
+        }
+    totals = list(questions_collection.aggregate([
+        {'$group': {
+            '_id': None,
+            'shown': {'$sum': '$times_shown'},
+            'correct': {'$sum': '$times_correct'}
+        }}
+    ]))
+    if totals:
+        doc['total_shown'] = totals[0].get('shown', 0) or 0
+        doc['total_correct'] = totals[0].get('correct', 0) or 0
+    now_utc = datetime.now(UTC)
+    doc['rebuilt_at'] = now_utc
+    doc['updated_at'] = now_utc
+    question_stats_collection.replace_one({'_id': QUESTION_STATS_DOC_ID}, doc, upsert=True)
+    return doc
+
+def _stats_bucket_list(bucket, limit=None):
+    items = [
+        {'_id': _stats_label(key), 'count': count}
+        for key, count in (bucket or {}).items()
+        if count and count > 0
+    ]
+    items.sort(key=lambda item: (-item['count'], item['_id']))
+    return items[:limit] if limit else items
+
+def get_practice_session_id():
+    """Id estable de la sesion de practica guardado en la cookie de sesion."""
+    practice_id = session.get('practice_id')
+    if not practice_id:
+        practice_id = uuid.uuid4().hex
+        session['practice_id'] = practice_id
+    return practice_id
+
+def simulator_defaults(name, now_utc=None):
+    """Documento de un simulador nuevo (sin ventana de apertura)."""
+    now_utc = now_utc or datetime.now(UTC)
+    return {
+        'name': name,
+        'time_limit': DEFAULT_SIMULATOR_TIME,
+        'enabled_from': None,
+        'enabled_until': None,
+        'force_enabled': False,
+        'created_at': now_utc,
+        'updated_at': now_utc
+    }
+
 def ensure_simulator(name):
     if not name or not str(name).strip():
         return
     simul = simulators_collection.find_one({'name': name})
     if not simul:
-        simulators_collection.insert_one({
-            'name': name,
-            'time_limit': DEFAULT_SIMULATOR_TIME,
-            'enabled_from': None,
-            'enabled_until': None,
-            'force_enabled': False,
-            'created_at': datetime.now(UTC),
-            'updated_at': datetime.now(UTC)
-        })
+        simulators_collection.insert_one(simulator_defaults(name))
+
+def simulator_overview_pipeline():
+    """Una agregacion con el conteo de preguntas por simulador y su documento de configuracion.
+
+    Parte de las preguntas del simulador agrupadas por tema (indice subject+topic)
+    y une ``simuladores`` con ``$unionWith``; el ``$group`` final junta ambos
+    lados por nombre. Un simulador sin preguntas queda con 0 y un tema sin
+    documento queda con ``simulator`` nulo.
+    """
+    return [
+        {'$match': {'subject': SIMULATOR_SUBJECT}},
+        {'$group': {'_id': '$topic', 'question_count': {'$sum': 1}}},
+        {'$unionWith': {
+            'coll': simulators_collection.name,
+            'pipeline': [{'$project': {'_id': '$name', 'simulator': '$$ROOT'}}]
+        }},
+        {'$group': {
+            '_id': '$_id',
+            'question_count': {'$sum': '$question_count'},
+            'simulator': {'$max': '$simulator'}
+        }},
+        {'$sort': {'_id': 1}}
+    ]
 
 def parse_bool(value, default=False):
     if value is None:
@@ -311,14 +1106,202 @@ def normalize_simulator_section(value):
     normalized_key = re.sub(r'\s+', ' ', normalized_key)
     return SIMULATOR_SECTION_ALIASES.get(normalized_key, raw)
 
-def simulator_section_sort_key(question):
-    section = normalize_simulator_section(question.get('simulator_subject'))
-    order_map = {name: idx for idx, name in enumerate(SIMULATOR_SECTION_ORDER)}
-    rank = order_map.get(section, len(SIMULATOR_SECTION_ORDER))
-    created = question.get('created_at') or datetime.min.replace(tzinfo=UTC)
-    if created.tzinfo is None:
-        created = created.replace(tzinfo=UTC)
-    return (rank, section.lower(), created)
+def normalize_topic_key(value):
+    """Tema en minusculas: reemplaza la comparacion con $regex ^...$ /i por igualdad indexada."""
+    return str(value or '').strip().lower()
+
+def simulator_section_rank(value):
+    return SIMULATOR_SECTION_RANK.get(normalize_simulator_section(value), len(SIMULATOR_SECTION_ORDER))
+
+def simulator_section_rank_key(section):
+    """Orden de secciones ya normalizadas: el del examen y luego alfabetico."""
+    return (SIMULATOR_SECTION_RANK.get(section, len(SIMULATOR_SECTION_ORDER)), section.lower())
+
+def question_key_fields(topic, simulator_subject=''):
+    """Campos derivados que se guardan junto a topic / simulator_subject."""
+    return {
+        'topic_key': normalize_topic_key(topic),
+        'section_rank': simulator_section_rank(simulator_subject)
+    }
+
+def backfill_question_key_fields():
+    """Asigna topic_key / section_rank a las preguntas que no los tienen. Idempotente."""
+    query = {'$or': [{'topic_key': {'$exists': False}}, {'section_rank': {'$exists': False}}]}
+    ops = []
+    updated = 0
+    for question in questions_collection.find(query, {'topic': 1, 'subject': 1, 'simulator_subject': 1}):
+        fields = {'topic_key': normalize_topic_key(question.get('topic'))}
+        if question.get('subject') == SIMULATOR_SUBJECT:
+            section = normalize_simulator_section(question.get('simulator_subject', ''))
+            fields['simulator_subject'] = section
+            fields['section_rank'] = simulator_section_rank(section)
+        else:
+            fields['section_rank'] = simulator_section_rank('')
+        ops.append(UpdateOne({'_id': question['_id']}, {'$set': fields}))
+        if len(ops) >= 500:
+            updated += questions_collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += questions_collection.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+def ensure_question_key_fields():
+    """Backfill topic_key/section_rank for questions created before they were stored."""
+    try:
+        updated = backfill_question_key_fields()
+        if updated:
+            print(f"[mongo] matematicas: topic_key/section_rank asignados a {updated} preguntas")
+    except Exception as exc:
+        print(f"[mongo] warning backfilling topic_key: {exc}")
+
+ensure_question_key_fields()
+
+def duplicate_scope(question):
+    """Ambito de comparacion: misma materia (y mismo simulador para Simulador)."""
+    subject = question.get('subject') or ''
+    if subject == SIMULATOR_SUBJECT:
+        return (subject, question.get('topic_key') or normalize_topic_key(question.get('topic')))
+    return (subject,)
+
+def apply_duplicate_policy(docs, mode='skip', threshold=DUPLICATE_THRESHOLD):
+    """Calcula las firmas MinHash de ``docs`` y aplica ``mode`` a los casi duplicados.
+
+    Compara contra el banco (un $in sobre ix_questions_lsh_buckets) y contra
+    las preguntas anteriores del mismo lote. Devuelve (docs a insertar, reporte).
+    """
+    for doc in docs:
+        doc.setdefault('_id', ObjectId())
+        doc.update(fingerprint_fields(doc))
+    if mode == 'allow':
+        return docs, []
+
+    all_buckets = sorted({bucket for doc in docs for bucket in doc[BUCKETS_FIELD]})
+    subjects = sorted({doc.get('subject') or '' for doc in docs})
+    indexes = {}
+    if all_buckets:
+        existing = questions_collection.find(
+            {BUCKETS_FIELD: {'$in': all_buckets}, 'subject': {'$in': subjects}},
+            {SIGNATURE_FIELD: 1, BUCKETS_FIELD: 1, NUMBERS_FIELD: 1, 'subject': 1, 'topic': 1, 'topic_key': 1}
+        )
+        for question in existing:
+            signature = decode_signature(question.get(SIGNATURE_FIELD))
+            if signature is not None:
+                indexes.setdefault(duplicate_scope(question), LSHIndex()).add(
+                    question['_id'], signature, question.get(BUCKETS_FIELD), question.get(NUMBERS_FIELD)
+                )
+
+    kept = []
+    report = []
+    batch_ids = set()
+    for position, doc in enumerate(docs):
+        signature = decode_signature(doc.get(SIGNATURE_FIELD))
+        index = indexes.setdefault(duplicate_scope(doc), LSHIndex())
+        matches = index.query(signature, threshold, doc[BUCKETS_FIELD], doc[NUMBERS_FIELD]) if signature else []
+        if matches:
+            duplicate_of, score = matches[0]
+            report.append({
+                'index': position,
+                'question': (doc.get('question') or '')[:120],
+                'duplicate_of': str(duplicate_of),
+                'similarity': round(score, 3),
+                'in_batch': duplicate_of in batch_ids
+            })
+            if mode == 'skip':
+                continue
+            doc['duplicate_of'] = duplicate_of
+        if signature:
+            index.add(doc['_id'], signature, doc[BUCKETS_FIELD], doc[NUMBERS_FIELD])
+            batch_ids.add(doc['_id'])
+        kept.append(doc)
+    return kept, report
+
+def parse_duplicate_mode(value):
+    mode = (value or 'skip').strip().lower()
+    if mode not in QUESTION_DUPLICATE_MODES:
+        raise ValueError(f"on_duplicate debe ser uno de: {', '.join(QUESTION_DUPLICATE_MODES)}")
+    return mode
+
+def scan_duplicate_questions(threshold=DUPLICATE_THRESHOLD):
+    """Busca grupos de casi duplicados en todo el banco y los guarda en question_duplicate_clusters.
+
+    Primero calcula la firma de las preguntas que aun no la tienen.
+    """
+    ops = []
+    fingerprinted = 0
+    missing = questions_collection.find(
+        {SIGNATURE_FIELD: {'$exists': False}},
+        {'question': 1, 'options': 1}
+    )
+    for question in missing:
+        ops.append(UpdateOne({'_id': question['_id']}, {'$set': fingerprint_fields(question)}))
+        if len(ops) >= 500:
+            fingerprinted += questions_collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        fingerprinted += questions_collection.bulk_write(ops, ordered=False).modified_count
+
+    indexes = {}
+    meta = {}
+    for question in questions_collection.find(
+        {SIGNATURE_FIELD: {'$ne': None}},
+        {SIGNATURE_FIELD: 1, BUCKETS_FIELD: 1, NUMBERS_FIELD: 1, 'subject': 1, 'topic': 1, 'topic_key': 1}
+    ):
+        signature = decode_signature(question.get(SIGNATURE_FIELD))
+        if signature is None:
+            continue
+        indexes.setdefault(duplicate_scope(question), LSHIndex()).add(
+            question['_id'], signature, question.get(BUCKETS_FIELD), question.get(NUMBERS_FIELD)
+        )
+        meta[question['_id']] = question
+
+    parent = {}
+    best = {}
+    def find(item):
+        # Union-find con compresion de camino.
+        while parent.get(item, item) != item:
+            parent[item] = parent.get(parent[item], parent[item])
+            item = parent[item]
+        return item
+    for index in indexes.values():
+        for left, right in index.candidate_pairs():
+            if not index.same_numbers(index.numbers(left), index.numbers(right)):
+                continue
+            score = signature_similarity(index.signature(left), index.signature(right))
+            if score >= threshold:
+                root_left, root_right = find(left), find(right)
+                if root_left != root_right:
+                    parent[root_right] = root_left
+                best[left] = max(best.get(left, 0), score)
+                best[right] = max(best.get(right, 0), score)
+
+    groups = {}
+    for item in best:
+        groups.setdefault(find(item), []).append(item)
+    scanned_at = datetime.now(UTC)
+    clusters = []
+    for members in groups.values():
+        members.sort(key=str)
+        first = meta[members[0]]
+        clusters.append({
+            'question_ids': members,
+            'size': len(members),
+            'subject': first.get('subject'),
+            'topic': first.get('topic'),
+            'max_similarity': round(max(best[m] for m in members), 3),
+            'scanned_at': scanned_at
+        })
+    clusters.sort(key=lambda c: (-c['size'], -c['max_similarity']))
+
+    question_duplicates_collection.delete_many({})
+    if clusters:
+        question_duplicates_collection.insert_many(clusters)
+    return {
+        'scanned': len(meta),
+        'fingerprinted': fingerprinted,
+        'clusters': len(clusters),
+        'duplicates': sum(c['size'] - 1 for c in clusters),
+        'scanned_at': scanned_at
+    }
 
 def normalize_section_stats(raw_section_stats):
     normalized = {}
@@ -386,6 +1369,32 @@ def is_simulator_enabled(simul, now_utc=None):
         return False
     return True
 
+def simulator_window_error(simul, now_utc):
+    """Mensaje para el alumno si el simulador esta fuera de su ventana (None si esta abierto)."""
+    if not simul or is_simulator_enabled(simul, now_utc):
+        return None
+    start = simul.get('enabled_from')
+    end = simul.get('enabled_until')
+    if start and start.tzinfo is None:
+        start = start.replace(tzinfo=UTC)
+    if end and end.tzinfo is None:
+        end = end.replace(tzinfo=UTC)
+    if start and now_utc < start:
+        return f'Este simulador estará disponible desde {datetime_to_iso_utc(start)}'
+    if end and now_utc > end:
+        return f'Este simulador cerró en {datetime_to_iso_utc(end)}'
+    return None
+
+def simulator_answers_release(simul, now_utc):
+    """Fecha a partir de la cual se muestran las respuestas correctas (None = ya se pueden mostrar).
+
+    Mientras la ventana de un simulador con cierre siga abierta, la revision solo dice si se acerto.
+    """
+    end = (simul or {}).get('enabled_until')
+    if end and end.tzinfo is None:
+        end = end.replace(tzinfo=UTC)
+    return end if end and now_utc <= end else None
+
 def get_pix2text():
     global _pix2text_instance
     if _pix2text_instance is None:
@@ -494,6 +1503,8 @@ def register_user():
 
         # Insertar en MongoDB
         result = users_collection.insert_one(user_doc)
+        if role == 'alumno':
+            bump_content_version(STUDENTS_VERSION_KEY)
         created_role_label = 'Alumno' if role == 'alumno' else 'Maestro'
 
         return jsonify({
@@ -648,6 +1659,7 @@ def rename_students_group(group_name):
             {'rol': 'alumno', 'grupo': old_group},
             {'$set': {'grupo': new_group}}
         )
+        bump_content_version(STUDENTS_VERSION_KEY)
 
         return jsonify({
             'success': True,
@@ -669,6 +1681,7 @@ def delete_students_group(group_name):
         result = users_collection.delete_many(
             {'rol': 'alumno', 'grupo': target_group},
         )
+        bump_content_version(STUDENTS_VERSION_KEY)
 
         return jsonify({
             'success': True,
@@ -681,21 +1694,129 @@ def delete_students_group(group_name):
 # ========== RUTAS DE PREGUNTAS (CRUD) ==========
 @app.route('/api/questions', methods=['GET'])
 def get_all_questions():
-    """Obtiene todas las preguntas (con filtro opcional por materia)"""
+    """Obtiene preguntas paginadas por cursor (keyset sobre created_at/_id).
+
+    Query params: subject, topic, university, simulator_subject, has_options,
+    exclude_simulator, sort ([-]created_at | [-]times_shown), limit, cursor,
+    fields y with_total.
+
+    Con format=ndjson|csv (solo maestro) se exportan todas las preguntas que
+    cumplen el filtro en streaming, leyendo el cursor en lotes de batch_size.
+    """
     try:
-        subject = request.args.get('subject', None)
-        query = {}
-        if subject:
-            query['subject'] = subject
-            
-        questions = list(questions_collection.find(query))
-        questions = [jsonify_question(q) for q in questions]
-        
-        return jsonify({
-            'success': True,
-            'count': len(questions),
-            'questions': questions
-        })
+        export_format = (request.args.get('format') or '').strip().lower()
+        if export_format and export_format not in QUESTION_EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': 'format debe ser ndjson o csv'}), 400
+        if export_format and session.get('user_role') != 'maestro':
+            return jsonify({
+                'success': False,
+                'error': 'Acceso denegado: Se requiere rol de maestro'
+            }), 403
+
+        try:
+            limit = int(request.args.get('limit', QUESTION_PAGE_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'limit invalido'}), 400
+        limit = max(1, min(limit, QUESTION_PAGE_MAX_LIMIT))
+
+        sort_param = (request.args.get('sort') or '-created_at').strip()
+        descending = sort_param.startswith('-')
+        sort_field = sort_param.lstrip('-')
+        if sort_field not in QUESTION_SORT_FIELDS:
+            return jsonify({
+                'success': False,
+                'error': f"sort debe ser uno de: {', '.join(QUESTION_SORT_FIELDS)} (prefijo - para descendente)"
+            }), 400
+        direction = DESCENDING if descending else ASCENDING
+
+        try:
+            projection = parse_question_projection(request.args.get('fields'))
+        except ValueError as exc:
+            return jsonify({'success': False, 'error': str(exc)}), 400
+        if projection is not None:
+            # El campo de orden siempre se incluye porque forma parte del cursor.
+            projection[sort_field] = 1
+
+        query = base_query = build_question_filters(request.args)
+        with_total = parse_bool(request.args.get('with_total'), False)
+
+        cursor_token = (request.args.get('cursor') or '').strip()
+        if cursor_token:
+            try:
+                last_value, oid = decode_question_cursor(cursor_token)
+            except ValueError as exc:
+                return jsonify({'success': False, 'error': str(exc)}), 400
+            keyset = question_keyset_clause(sort_field, last_value, oid, descending)
+            query = {'$and': [query, keyset]} if query else keyset
+
+        if export_format:
+            try:
+                batch_size = int(request.args.get('batch_size', QUESTION_EXPORT_DEFAULT_BATCH))
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'batch_size invalido'}), 400
+            batch_size = max(1, min(batch_size, QUESTION_EXPORT_MAX_BATCH))
+            export_cursor = (
+                questions_collection.find(query, projection if projection is not None else QUESTION_INTERNAL_PROJECTION)
+                .sort([(sort_field, direction), ('_id', direction)])
+                .batch_size(batch_size)
+            )
+            stamp = datetime.now(UTC).strftime('%Y%m%d_%H%M%S')
+            if export_format == 'csv':
+                columns = QUESTION_EXPORT_CSV_COLUMNS
+                if projection is not None:
+                    columns = ['_id'] + [c for c in QUESTION_EXPORT_CSV_COLUMNS if c in projection]
+                body = iter_csv(
+                    columns, iter_question_csv_rows(export_cursor, columns), chunk_rows=QUESTION_EXPORT_CHUNK_LINES
+                )
+                mimetype = 'text/csv'
+            else:
+                body = iter_questions_ndjson(export_cursor)
+                mimetype = 'application/x-ndjson'
+            return Response(
+                stream_with_context(body),
+                mimetype=mimetype,
+                headers={
+                    'Content-Disposition': f'attachment; filename=preguntas_{stamp}.{export_format}',
+                    'X-Accel-Buffering': 'no'
+                }
+            )
+
+        def build_payload():
+            # Pedimos uno extra para saber si hay otra pagina sin contar documentos.
+            # random_key es interno y cambia al servir preguntas; no debe mover el ETag.
+            docs = list(
+                questions_collection.find(query, projection if projection is not None else QUESTION_INTERNAL_PROJECTION)
+                .sort([(sort_field, direction), ('_id', direction)])
+                .limit(limit + 1)
+            )
+            has_more = len(docs) > limit
+            docs = docs[:limit]
+            next_cursor = encode_question_cursor(docs[-1], sort_field) if has_more and docs else None
+            questions = [jsonify_question(q) for q in docs]
+
+            payload = {
+                'success': True,
+                'count': len(questions),
+                'questions': questions,
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+            if with_total:
+                payload['total'] = questions_collection.count_documents(base_query)
+            return payload
+
+        etag_parts = [
+            CATALOG_VERSION_KEY,
+            get_content_version(CATALOG_VERSION_KEY),
+            sorted(request.args.items(multi=True)),
+            local_images.version
+        ]
+        if projection is None or any(field in projection for field in QUESTION_COUNTER_FIELDS):
+            # Los contadores no tocan el catalogo; cada respuesta si actualiza el documento de stats.
+            stats_doc = question_stats_collection.find_one({'_id': QUESTION_STATS_DOC_ID}, {'updated_at': 1})
+            etag_parts.append((stats_doc or {}).get('updated_at'))
+        return conditional_json(make_content_etag(*etag_parts), build_payload)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -772,13 +1893,22 @@ def create_question():
             'solution': data.get('solution', ''),
             'university': data.get('university', 'UNAM'),
             'image': image_filename,  # Guardar nombre del archivo
+            **question_key_fields(topic_value, simulator_section if subject_value == SIMULATOR_SUBJECT else ''),
+            **fingerprint_fields({'question': data['question'], 'options': options}),
+            **resolve_image_fields(image_filename),
             'created_at': datetime.now(UTC),
             'times_shown': 0,
-            'times_correct': 0
+            'times_correct': 0,
+            RANDOM_KEY_FIELD: new_random_key(),
+            **difficulty_fields()
         }
 
         # Insertar en MongoDB
         result = questions_collection.insert_one(question_doc)
+        bump_content_version(*question_version_keys(question_doc))
+        apply_question_stats(question_stats_delta([question_doc]))
+        # Una pregunta nueva cambia el total del simulador: los intentos guardados se recalifican.
+        schedule_regrades(answer_key_changed(None, question_doc))
 
         # Devolver pregunta creada
         question_doc['_id'] = str(result.inserted_id)
@@ -852,6 +1982,10 @@ def bulk_questions():
         topic = data.get('topic', 'General')
         university = data.get('university', 'UNAM')
         simulator_section = normalize_simulator_section(data.get('simulator_subject', ''))
+        try:
+            on_duplicate = parse_duplicate_mode(data.get('on_duplicate'))
+        except ValueError as exc:
+            return jsonify({'success': False, 'error': str(exc)}), 400
         
         if not texto:
             return jsonify({
@@ -951,6 +2085,7 @@ def bulk_questions():
                 'subject': subject,
                 'topic': topic,
                 'simulator_subject': simulator_section if subject == SIMULATOR_SUBJECT else '',
+                **question_key_fields(topic, simulator_section if subject == SIMULATOR_SUBJECT else ''),
                 'question': pregunta,
                 'has_options': True,
                 'options': opciones,
@@ -962,20 +2097,43 @@ def bulk_questions():
                 'created_at': datetime.now(UTC),
                 'times_shown': 0,
                 'times_correct': 0,
+                RANDOM_KEY_FIELD: new_random_key(),
+                **difficulty_fields(),
                 'source': 'carga_masiva'
             }
             
             preguntas_insertadas.append(pregunta_doc)
         
+        # Casi duplicados (banco y mismo lote) se omiten o marcan segun on_duplicate
+        parsed_count = len(preguntas_insertadas)
+        preguntas_insertadas, duplicados = apply_duplicate_policy(preguntas_insertadas, on_duplicate)
+        
         # Insertar todas las preguntas en batch
         if preguntas_insertadas:
             result = questions_collection.insert_many(preguntas_insertadas)
+            bump_content_version(*question_version_keys(*preguntas_insertadas))
+            schedule_regrades(name for doc in preguntas_insertadas for name in answer_key_changed(None, doc))
+            apply_question_stats(question_stats_delta(preguntas_insertadas))
             
             return jsonify({
                 'success': True,
                 'message': f'Se insertaron {len(preguntas_insertadas)} preguntas',
                 'inserted_count': len(preguntas_insertadas),
                 'inserted_ids': [str(id) for id in result.inserted_ids],
+                'duplicates': duplicados,
+                'skipped_count': parsed_count - len(preguntas_insertadas),
+                'subject': subject,
+                'topic': topic,
+                'university': university
+            })
+        elif duplicados:
+            return jsonify({
+                'success': True,
+                'message': 'Todas las preguntas ya existían; no se insertó ninguna',
+                'inserted_count': 0,
+                'inserted_ids': [],
+                'duplicates': duplicados,
+                'skipped_count': parsed_count,
                 'subject': subject,
                 'topic': topic,
                 'university': university
@@ -1020,6 +2178,10 @@ def bulk_questions_file():
         topic = request.form.get('topic', 'General')
         university = request.form.get('university', 'UNAM')
         simulator_section = normalize_simulator_section(request.form.get('simulator_subject', ''))
+        try:
+            on_duplicate = parse_duplicate_mode(request.form.get('on_duplicate'))
+        except ValueError as exc:
+            return jsonify({'success': False, 'error': str(exc)}), 400
 
         if not topic or topic.strip() == '':
             return jsonify({
@@ -1079,6 +2241,7 @@ def bulk_questions_file():
                 'subject': subject,
                 'topic': topic,
                 'simulator_subject': simulator_section if subject == SIMULATOR_SUBJECT else '',
+                **question_key_fields(topic, simulator_section if subject == SIMULATOR_SUBJECT else ''),
                 'question': pregunta,
                 'has_options': True,
                 'options': opciones,
@@ -1090,6 +2253,8 @@ def bulk_questions_file():
                 'created_at': datetime.now(UTC),
                 'times_shown': 0,
                 'times_correct': 0,
+                RANDOM_KEY_FIELD: new_random_key(),
+                **difficulty_fields(),
                 'source': 'pdf_import'
             }
             preguntas_insertadas.append(pregunta_doc)
@@ -1100,12 +2265,26 @@ def bulk_questions_file():
                 'error': 'No se detectaron preguntas válidas para insertar'
             }), 400
 
-        result = questions_collection.insert_many(preguntas_insertadas)
+        parsed_count = len(preguntas_insertadas)
+        preguntas_insertadas, duplicados = apply_duplicate_policy(preguntas_insertadas, on_duplicate)
+        inserted_ids = []
+        if preguntas_insertadas:
+            result = questions_collection.insert_many(preguntas_insertadas)
+            inserted_ids = [str(i) for i in result.inserted_ids]
+            bump_content_version(*question_version_keys(*preguntas_insertadas))
+            schedule_regrades(name for doc in preguntas_insertadas for name in answer_key_changed(None, doc))
+            apply_question_stats(question_stats_delta(preguntas_insertadas))
+        message = (
+            f'Se insertaron {len(preguntas_insertadas)} preguntas desde archivo'
+            if preguntas_insertadas else 'Todas las preguntas del archivo ya existían; no se insertó ninguna'
+        )
         return jsonify({
             'success': True,
-            'message': f'Se insertaron {len(preguntas_insertadas)} preguntas desde archivo',
+            'message': message,
             'inserted_count': len(preguntas_insertadas),
-            'inserted_ids': [str(i) for i in result.inserted_ids],
+            'inserted_ids': inserted_ids,
+            'duplicates': duplicados,
+            'skipped_count': parsed_count - len(preguntas_insertadas),
             'subject': subject,
             'topic': topic,
             'university': university
@@ -1184,6 +2363,7 @@ def update_question(question_id):
             'university': data.get('university', 'UNAM'),
             'simulator_subject': normalize_simulator_section(data.get('simulator_subject', '')),
             'image': image_value,
+            **resolve_image_fields(image_value),
             'updated_at': datetime.now(UTC)
         }
 
@@ -1196,6 +2376,8 @@ def update_question(question_id):
                 }), 400
         else:
             update_doc['simulator_subject'] = ''
+        update_doc.update(question_key_fields(update_doc['topic'], update_doc['simulator_subject']))
+        update_doc.update(fingerprint_fields(update_doc))
 
         result = questions_collection.update_one(
             {'_id': ObjectId(question_id)},
@@ -1203,11 +2385,19 @@ def update_question(question_id):
         )
 
         if result.matched_count == 1:
+            bump_content_version(*question_version_keys(existing_question, {**existing_question, **update_doc}))
+            apply_question_stats(merge_stats_deltas(
+                question_stats_delta([existing_question], -1),
+                question_stats_delta([{**existing_question, **update_doc}], 1)
+            ))
+            # Corregir la respuesta de un simulador ya aplicado recalifica sus intentos.
+            regrading = schedule_regrades(answer_key_changed(existing_question, {**existing_question, **update_doc}))
             updated_question = questions_collection.find_one({'_id': ObjectId(question_id)})
             return jsonify({
                 'success': True,
                 'message': 'Pregunta actualizada exitosamente',
-                'question': jsonify_question(updated_question)
+                'question': jsonify_question(updated_question),
+                'regrading': regrading
             })
 
         return jsonify({
@@ -1223,10 +2413,17 @@ def update_question(question_id):
 def delete_question(question_id):
     """Elimina una pregunta"""
     try:
-        question = questions_collection.find_one({'_id': ObjectId(question_id)}, {'image': 1})
+        question = questions_collection.find_one(
+            {'_id': ObjectId(question_id)},
+            {'image': 1, **QUESTION_STATS_FIELDS}
+        )
         result = questions_collection.delete_one({'_id': ObjectId(question_id)})
         
         if result.deleted_count == 1:
+            bump_content_version(*question_version_keys(question))
+            if question:
+                apply_question_stats(question_stats_delta([question], -1))
+                schedule_regrades(answer_key_changed(question, None))
             if question and question.get('image'):
                 delete_image_from_storage(question.get('image'))
             return jsonify({
@@ -1243,9 +2440,137 @@ def delete_question(question_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ========== RUTAS DE CONSULTA ==========
+@app.route('/api/questions/search', methods=['GET'])
+@maestro_required
+def search_questions():
+    """Busqueda de texto en pregunta, opciones, respuesta y solucion.
+
+    Query params: q (requerido), subject, topic, university, simulator_subject,
+    has_options, page, limit y with_total. Resultados ordenados por relevancia.
+    """
+    try:
+        text = (request.args.get('q') or '').strip()
+        if not text:
+            return jsonify({'success': False, 'error': 'q es requerido'}), 400
+        if len(text) > QUESTION_SEARCH_MAX_QUERY_LENGTH:
+            return jsonify({
+                'success': False,
+                'error': f'q admite hasta {QUESTION_SEARCH_MAX_QUERY_LENGTH} caracteres'
+            }), 400
+        try:
+            limit = int(request.args.get('limit', QUESTION_PAGE_DEFAULT_LIMIT))
+            page = int(request.args.get('page', 1))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'limit/page invalido'}), 400
+        limit = max(1, min(limit, QUESTION_PAGE_MAX_LIMIT))
+        page = max(1, page)
+
+        query = {'$text': {'$search': text}, **build_question_filters(request.args)}
+        score = {'$meta': 'textScore'}
+        docs = list(
+            questions_collection.find(query, {'score': score, **QUESTION_INTERNAL_PROJECTION})
+            .sort([('score', score), ('_id', DESCENDING)])
+            .skip((page - 1) * limit)
+            .limit(limit + 1)
+        )
+        has_more = len(docs) > limit
+        questions = [jsonify_question(q) for q in docs[:limit]]
+
+        payload = {
+            'success': True,
+            'count': len(questions),
+            'questions': questions,
+            'page': page,
+            'limit': limit,
+            'has_more': has_more
+        }
+        if parse_bool(request.args.get('with_total'), False):
+            payload['total'] = questions_collection.count_documents(query)
+        return jsonify(payload)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/questions/duplicates', methods=['GET'])
+@maestro_required
+def get_duplicate_clusters():
+    """Grupos de casi duplicados del ultimo escaneo (POST /api/questions/duplicates/scan)"""
+    try:
+        try:
+            limit = int(request.args.get('limit', QUESTION_PAGE_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'limit invalido'}), 400
+        limit = max(1, min(limit, QUESTION_PAGE_MAX_LIMIT))
+        query = {}
+        subject = (request.args.get('subject') or '').strip()
+        if subject and subject.lower() != 'todos':
+            query['subject'] = subject
+        clusters = list(
+            question_duplicates_collection.find(query)
+            .sort([('size', DESCENDING), ('max_similarity', DESCENDING), ('_id', ASCENDING)])
+            .limit(limit)
+        )
+
+        # Vista previa de todas las preguntas de la pagina en una sola consulta.
+        ids = [qid for cluster in clusters for qid in cluster.get('question_ids', [])]
+        previews = {
+            q['_id']: q for q in questions_collection.find(
+                {'_id': {'$in': ids}},
+                {'question': 1, 'subject': 1, 'topic': 1, 'university': 1, 'created_at': 1, 'duplicate_of': 1}
+            )
+        }
+        result = []
+        for cluster in clusters:
+            # Las preguntas borradas despues del escaneo ya no cuentan.
+            members = [previews[qid] for qid in cluster.get('question_ids', []) if qid in previews]
+            if len(members) < 2:
+                continue
+            result.append({
+                'size': len(members),
+                'subject': cluster.get('subject'),
+                'topic': cluster.get('topic'),
+                'max_similarity': cluster.get('max_similarity'),
+                'questions': [
+                    {
+                        '_id': str(q['_id']),
+                        'question': q.get('question', ''),
+                        'topic': q.get('topic', ''),
+                        'university': q.get('university', ''),
+                        'created_at': datetime_to_iso_utc(q.get('created_at')),
+                        'duplicate_of': str(q['duplicate_of']) if q.get('duplicate_of') else None
+                    }
+                    for q in members
+                ]
+            })
+        scanned_at = clusters[0].get('scanned_at') if clusters else None
+        return jsonify({
+            'success': True,
+            'count': len(result),
+            'clusters': result,
+            'scanned_at': datetime_to_iso_utc(scanned_at)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/questions/duplicates/scan', methods=['POST'])
+@maestro_required
+def scan_duplicates():
+    """Escanea todo el banco en busca de casi duplicados"""
+    try:
+        summary = scan_duplicate_questions()
+        summary['scanned_at'] = datetime_to_iso_utc(summary['scanned_at'])
+        return jsonify({'success': True, **summary})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/questions/random', methods=['GET'])
 def get_random_question():
-    """Obtiene una pregunta aleatoria (con filtros opcionales)"""
+    """Obtiene una pregunta aleatoria (con filtros opcionales).
+
+    Con n=K devuelve un lote de K preguntas distintas que el alumno no ha visto
+    en esta sesion de practica (reset_seen=1 reinicia el registro).
+    difficulty=facil|media|dificil (o min_difficulty/max_difficulty entre 0 y 1)
+    limita la seleccion a una banda de dificultad usando el indice.
+    """
     try:
         subject = request.args.get('subject', None)
         topic = request.args.get('topic', None)
@@ -1257,25 +2582,38 @@ def get_random_question():
         elif exclude_simulator:
             query['subject'] = {'$ne': SIMULATOR_SUBJECT}
         if topic and topic.lower() != 'todos' and topic.lower() != 'all':
-            query['topic'] = {'$regex': f'^{topic}$', '$options': 'i'}
+            query['topic_key'] = normalize_topic_key(topic)
+        try:
+            difficulty_range = parse_difficulty_range(
+                request.args.get('difficulty'),
+                request.args.get('min_difficulty'),
+                request.args.get('max_difficulty')
+            )
+        except ValueError as exc:
+            return jsonify({'success': False, 'error': str(exc)}), 400
+        if difficulty_range:
+            query.update(difficulty_query(*difficulty_range))
+
+        batch_raw = request.args.get('n')
+        if batch_raw is not None and str(batch_raw).strip() != '':
+            try:
+                batch_size = int(batch_raw)
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'n invalido'}), 400
+            batch_size = max(1, min(batch_size, PRACTICE_BATCH_MAX))
+            return serve_practice_batch(query, batch_size, parse_bool(request.args.get('reset_seen'), False))
         
-        # Obtener preguntas que cumplen el filtro
-        questions = list(questions_collection.find(query))
+        # Lectura por indice de random_key: no carga las preguntas que cumplen el filtro.
+        random_question = sample_question(questions_collection, query)
         
-        if not questions:
+        if not random_question:
             return jsonify({
                 'success': False,
                 'error': 'No hay preguntas disponibles'
             }), 404
         
-        # Seleccionar aleatoriamente
-        random_question = random.choice(questions)
-        
-        # Incrementar contador de veces mostrada
-        questions_collection.update_one(
-            {'_id': random_question['_id']},
-            {'$inc': {'times_shown': 1}}
-        )
+        # Incrementar contador y reasignar la clave aleatoria (escritura diferida)
+        question_counters.add(random_question['_id'], {'times_shown': 1}, reshuffle_update())
         
         return jsonify({
             'success': True,
@@ -1285,6 +2623,83 @@ def get_random_question():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def add_served_to_seen(seen, served_ids):
+    """Agrega lo servido al filtro; si se satura, empieza de nuevo con solo lo servido."""
+    seen.update(served_ids)
+    if seen.false_positive_rate() > PRACTICE_SEEN_MAX_FALSE_POSITIVE:
+        seen.clear()
+        seen.update(served_ids)
+        return True
+    return False
+
+def save_practice_seen(practice_id, state, seen, served_ids, reset):
+    """Guarda el filtro de vistas con control optimista sobre ``seen_rev``.
+
+    Si otra peticion de la misma sesion escribio entre la lectura y la
+    escritura, se relee su filtro y se le agregan los ids servidos (salvo que
+    esta peticion haya reiniciado la ronda). Devuelve el filtro guardado.
+    """
+    for _ in range(PRACTICE_SEEN_SAVE_RETRIES):
+        rev = (state or {}).get('seen_rev')
+        now_utc = datetime.now(UTC)
+        try:
+            # Con upsert, si el _id existe con otra seen_rev el insert choca con el _id.
+            practice_sessions_collection.update_one(
+                {'_id': practice_id, 'seen_rev': rev if rev is not None else {'$exists': False}},
+                {
+                    '$set': {'seen': seen.to_document(), 'updated_at': now_utc},
+                    '$inc': {'seen_rev': 1},
+                    '$setOnInsert': {'created_at': now_utc}
+                },
+                upsert=True
+            )
+            return seen
+        except DuplicateKeyError:
+            state = practice_sessions_collection.find_one({'_id': practice_id}, {'seen': 1, 'seen_rev': 1})
+            if not reset:
+                seen = SeenFilter.from_document((state or {}).get('seen'))
+                add_served_to_seen(seen, served_ids)
+    raise RuntimeError('No se pudo guardar la sesion de practica; intenta de nuevo')
+
+def serve_practice_batch(query, batch_size, reset_seen=False):
+    """Lote de preguntas sin repetir las ya vistas en la sesion de practica."""
+    practice_id = get_practice_session_id()
+    state = practice_sessions_collection.find_one({'_id': practice_id}, {'seen': 1, 'seen_rev': 1})
+    seen = SeenFilter() if reset_seen else SeenFilter.from_document((state or {}).get('seen'))
+
+    round_reset = False
+    questions = sample_questions(questions_collection, query, batch_size, exclude=seen.__contains__)
+    if not questions and seen.count:
+        # max_scan pudo agotarse saltando vistas: antes de reiniciar se busca con un tope mayor.
+        questions = sample_questions(
+            questions_collection, query, batch_size, exclude=seen.__contains__,
+            max_scan=default_max_scan(batch_size) * PRACTICE_RESCAN_FACTOR
+        )
+    if not questions and seen.count:
+        # Ya se vio todo lo disponible con este filtro: empieza una ronda nueva.
+        seen.clear()
+        round_reset = True
+        questions = sample_questions(questions_collection, query, batch_size)
+
+    if not questions:
+        return jsonify({
+            'success': False,
+            'error': 'No hay preguntas disponibles'
+        }), 404
+
+    served_ids = [q['_id'] for q in questions]
+    round_reset = add_served_to_seen(seen, served_ids) or round_reset
+    seen = save_practice_seen(practice_id, state, seen, served_ids, reset_seen or round_reset)
+    reshuffle_many(questions_collection, served_ids)
+
+    return jsonify({
+        'success': True,
+        'count': len(questions),
+        'questions': [jsonify_question(q) for q in questions],
+        'seen_count': seen.count,
+        'round_reset': round_reset
+    })
+
 @app.route('/api/questions/<question_id>/answer', methods=['POST'])
 def register_answer(question_id):
     """Registra una respuesta a una pregunta"""
@@ -1292,14 +2707,12 @@ def register_answer(question_id):
         data = request.get_json()
         correct = data.get('correct', False)
         
-        update_data = {'$inc': {'times_shown': 1}}
+        counters = {'times_shown': 1}
         if correct:
-            update_data['$inc']['times_correct'] = 1
+            counters['times_correct'] = 1
         
-        questions_collection.update_one(
-            {'_id': ObjectId(question_id)},
-            update_data
-        )
+        # Se acumula por pregunta y se escribe en lote; /api/stats se actualiza al volcar.
+        question_counters.add(ObjectId(question_id), counters)
         
         return jsonify({
             'success': True,
@@ -1313,11 +2726,15 @@ def register_answer(question_id):
 def get_subjects():
     """Obtiene la lista de materias disponibles"""
     try:
-        subjects = questions_collection.distinct('subject')
-        return jsonify({
+        catalog = get_question_catalog()
+        subjects = sorted(catalog)
+        payload = {
             'success': True,
             'subjects': subjects
-        })
+        }
+        if parse_bool(request.args.get('with_counts'), False):
+            payload['counts'] = {subject: catalog[subject]['count'] for subject in subjects}
+        return jsonify(payload)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1325,12 +2742,15 @@ def get_subjects():
 def get_topics_by_subject(subject):
     """Obtiene los temas de una materia específica"""
     try:
-        topics = questions_collection.distinct('topic', {'subject': subject})
-        return jsonify({
+        node = get_question_catalog().get(subject) or {'topics': {}}
+        payload = {
             'success': True,
             'subject': subject,
-            'topics': topics
-        })
+            'topics': sorted(node['topics'])
+        }
+        if parse_bool(request.args.get('with_counts'), False):
+            payload['counts'] = dict(node['topics'])
+        return jsonify(payload)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1361,31 +2781,33 @@ def get_simulators():
                     'total': latest_total if latest_total is not None else first_total
                 }
 
-        topic_names = questions_collection.distinct('topic', {'subject': SIMULATOR_SUBJECT})
-        topic_names = [s for s in topic_names if s and str(s).strip() != '']
-        stored_names = simulators_collection.distinct('name')
-        simulator_names = sorted(set(topic_names + stored_names))
+        rows = [
+            row for row in questions_collection.aggregate(simulator_overview_pipeline())
+            if row.get('_id') and str(row['_id']).strip()
+        ]
 
-        simulators = []
         now_utc = datetime.now(UTC)
-        for name in simulator_names:
-            simul = simulators_collection.find_one({'name': name})
-            if not simul:
-                ensure_simulator(name)
-                simul = simulators_collection.find_one({'name': name})
-
-            count = questions_collection.count_documents({
-                'subject': SIMULATOR_SUBJECT,
-                'topic': name
-            })
+        missing = [row['_id'] for row in rows if not row.get('simulator')]
+        if missing:
+            # Temas de simulador sin documento propio: se crean de una vez con valores por defecto.
+            simulators_collection.bulk_write([
+                UpdateOne({'name': name}, {'$setOnInsert': simulator_defaults(name, now_utc)}, upsert=True)
+                for name in missing
+            ], ordered=False)
+            bump_content_version(*(simulator_version_key(name) for name in missing))
+
+        simulators = []
+        for row in rows:
+            name = row['_id']
+            simul = row.get('simulator') or simulator_defaults(name, now_utc)
             simulators.append({
                 'name': name,
-                'time_limit': simul.get('time_limit', DEFAULT_SIMULATOR_TIME) if simul else DEFAULT_SIMULATOR_TIME,
-                'question_count': count,
+                'time_limit': simul.get('time_limit', DEFAULT_SIMULATOR_TIME),
+                'question_count': row.get('question_count', 0),
                 'last_score': user_scores.get(name),
-                'enabled_from': datetime_to_iso_utc(simul.get('enabled_from')) if simul else None,
-                'enabled_until': datetime_to_iso_utc(simul.get('enabled_until')) if simul else None,
-                'force_enabled': parse_bool(simul.get('force_enabled'), False) if simul else False,
+                'enabled_from': datetime_to_iso_utc(simul.get('enabled_from')),
+                'enabled_until': datetime_to_iso_utc(simul.get('enabled_until')),
+                'force_enabled': parse_bool(simul.get('force_enabled'), False),
                 'is_open': is_simulator_enabled(simul, now_utc)
             })
         return jsonify({
@@ -1430,6 +2852,7 @@ def create_or_update_simulator():
              '$setOnInsert': {'created_at': datetime.now(UTC)}},
             upsert=True
         )
+        bump_content_version(simulator_version_key(name))
 
         return jsonify({'success': True, 'message': 'Simulador guardado'})
     except Exception as e:
@@ -1476,10 +2899,23 @@ def update_simulator(simulator_name):
             )
 
             # Actualizar preguntas asociadas
+            renamed_questions = list(questions_collection.find(
+                {'subject': SIMULATOR_SUBJECT, 'topic': simulator_name},
+                QUESTION_STATS_FIELDS
+            ))
             questions_collection.update_many(
                 {'subject': SIMULATOR_SUBJECT, 'topic': simulator_name},
-                {'$set': {'topic': new_name}}
+                {'$set': {'topic': new_name, 'topic_key': normalize_topic_key(new_name)}}
             )
+            bump_content_version(
+                CATALOG_VERSION_KEY,
+                simulator_version_key(simulator_name),
+                simulator_version_key(new_name)
+            )
+            apply_question_stats(merge_stats_deltas(
+                question_stats_delta(renamed_questions, -1),
+                question_stats_delta([{**q, 'topic': new_name} for q in renamed_questions], 1)
+            ))
             simulator_scores_collection.update_many(
                 {'simulator': simulator_name},
                 {'$set': {'simulator': new_name}}
@@ -1488,6 +2924,12 @@ def update_simulator(simulator_name):
                 {'simulator': simulator_name},
                 {'$set': {'simulator': new_name}}
             )
+            simulator_submissions_collection.update_many(
+                {'simulator': simulator_name},
+                {'$set': {'simulator': new_name}}
+            )
+            # El tablero del nombre nuevo se construye en la primera lectura.
+            simulator_dashboards_collection.delete_many({'_id': {'$in': [simulator_name, new_name]}})
 
             return jsonify({'success': True, 'message': 'Simulador actualizado'})
 
@@ -1503,6 +2945,7 @@ def update_simulator(simulator_name):
              '$setOnInsert': {'created_at': datetime.now(UTC)}},
             upsert=True
         )
+        bump_content_version(simulator_version_key(simulator_name))
 
         return jsonify({'success': True, 'message': 'Simulador actualizado'})
     except Exception as e:
@@ -1514,9 +2957,17 @@ def delete_simulator(simulator_name):
     """Elimina un simulador y sus preguntas"""
     try:
         simulators_collection.delete_one({'name': simulator_name})
+        removed_questions = list(questions_collection.find(
+            {'subject': SIMULATOR_SUBJECT, 'topic': simulator_name},
+            QUESTION_STATS_FIELDS
+        ))
         questions_collection.delete_many({'subject': SIMULATOR_SUBJECT, 'topic': simulator_name})
+        bump_content_version(CATALOG_VERSION_KEY, simulator_version_key(simulator_name))
+        apply_question_stats(question_stats_delta(removed_questions, -1))
         simulator_scores_collection.delete_many({'simulator': simulator_name})
         simulator_attempts_collection.delete_many({'simulator': simulator_name})
+        simulator_submissions_collection.delete_many({'simulator': simulator_name})
+        simulator_dashboards_collection.delete_one({'_id': simulator_name})
         return jsonify({'success': True, 'message': 'Simulador eliminado'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1536,120 +2987,377 @@ def toggle_simulator_force_enable(simulator_name):
             }},
             upsert=True
         )
+        bump_content_version(simulator_version_key(simulator_name))
         return jsonify({'success': True, 'force_enabled': force_enabled})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/simulators/<simulator_name>/answers', methods=['POST'])
 @app.route('/api/simulators/<simulator_name>/score', methods=['POST'])
 @login_required
-def save_simulator_score(simulator_name):
-    """Guarda solo el primer intento del alumno por simulador."""
+def submit_simulator_answers(simulator_name):
+    """Califica en el servidor las respuestas del alumno y guarda su intento.
+
+    ``/score`` queda como alias para clientes viejos; correct/total/section_stats
+    enviados por el navegador se ignoran.
+    """
     try:
         data = request.get_json() or {}
-        correct = int(data.get('correct', 0))
-        total = int(data.get('total', 0))
-        section_stats = normalize_section_stats(data.get('section_stats'))
-
-        if total < 0 or correct < 0 or correct > total:
-            return jsonify({'success': False, 'error': 'Puntaje invalido'}), 400
-
-        user_id = session.get('user_id')
-        user_name = (session.get('nombre') or '').strip()
-        user_group = ''
-        if not user_name and user_id:
-            try:
-                user_doc = users_collection.find_one({'_id': ObjectId(user_id)})
-                if user_doc:
-                    nombre = (user_doc.get('nombre') or '').strip()
-                    apellido = (user_doc.get('apellido') or '').strip()
-                    user_name = f"{nombre} {apellido}".strip()
-                    user_group = (user_doc.get('grupo') or '').strip()
-            except Exception:
-                user_name = ''
-                user_group = ''
-        elif user_id:
-            try:
-                user_doc = users_collection.find_one({'_id': ObjectId(user_id)}, {'grupo': 1})
-                if user_doc:
-                    user_group = (user_doc.get('grupo') or '').strip()
-            except Exception:
-                user_group = ''
-
-        now_utc = datetime.now(UTC)
-        first_filter = {'user_id': user_id, 'simulator': simulator_name}
-
-        # Escritura atomica:
-        # - correct/total = primer intento (fijo para listas/ranking).
-        # - latest_* = ultimo intento (cambia en cada repeticion para vista previa).
         try:
-            attempt_write = simulator_attempts_collection.update_one(
-                first_filter,
-                {'$setOnInsert': {
-                    'user_id': user_id,
-                    'student_name': user_name or 'Alumno',
-                    'student_group': user_group,
-                    'simulator': simulator_name,
-                    'correct': correct,
-                    'total': total,
-                    'section_stats': section_stats,
-                    'finished_at': now_utc,
-                    'created_at': now_utc
-                }},
-                upsert=True
-            )
-        except DuplicateKeyError:
-            # Otro request simultaneo gano el insert del primer intento.
-            attempt_write = None
+            submitted = parse_submitted_responses(data.get('responses'), data.get('question_ids'))
+        except ValueError as exc:
+            return jsonify({'success': False, 'error': str(exc)}), 400
+        if submitted is None:
+            return jsonify({'success': False, 'error': 'responses y question_ids son requeridos'}), 400
 
-        simulator_scores_collection.update_one(
-            first_filter,
+        # Misma ventana que /questions: fuera de ella no se califica ni se entrega la clave.
+        now_utc = datetime.now(UTC)
+        simul = simulators_collection.find_one(
+            {'name': simulator_name}, {'enabled_from': 1, 'enabled_until': 1, 'force_enabled': 1}
+        )
+        window_error = simulator_window_error(simul, now_utc)
+        if window_error:
+            return jsonify({'success': False, 'error': window_error}), 403
+
+        answer_key = get_simulator_answer_key(simulator_name)
+        if not len(answer_key['key']):
+            return jsonify({'success': False, 'error': 'El simulador no tiene preguntas'}), 404
+        graded = grade_submission(answer_key['key'], submitted[1], submitted[0])
+
+        # Solo se guarda el envio (con journal); el intento y el puntaje se aplican por lotes.
+        # El primero que llega gana igual que antes: ver score_ingest.attempt_update.
+        submission_id = score_ingestor.submit(
+            session.get('user_id'),
+            simulator_name,
+            graded['correct'],
+            graded['total'],
+            graded['section_stats'],
+            student_name=(session.get('nombre') or '').strip(),
+            responses=submitted
+        )
+        # Revision en el orden del envio: las respuestas correctas solo se entregan al terminar
+        # el intento y, si el simulador tiene cierre, despues de ese cierre.
+        answers_release = simulator_answers_release(simul, now_utc)
+        review = [
             {
-                '$setOnInsert': {
-                    'user_id': user_id,
-                    'simulator': simulator_name,
-                    # Primer intento fijo (ranking/listas).
-                    'correct': correct,
-                    'total': total,
-                    'created_at': now_utc,
-                },
-                '$set': {
-                    # Ultimo intento dinamico (vista previa del simulador).
-                    'latest_correct': correct,
-                    'latest_total': total,
-                    'latest_section_stats': section_stats,
-                    'latest_attempt_at': now_utc,
-                    'updated_at': now_utc,
-                }
+                'question_id': str(question_id),
+                'is_correct': bool(hit),
+                **(answer_key['review'][column] if column >= 0 and answers_release is None else {})
+            }
+            for question_id, hit, column in zip(data['question_ids'], graded['hits'], graded['columns'])
+        ]
+        return jsonify({
+            'success': True,
+            'queued': True,
+            'submission_id': str(submission_id),
+            'current_attempt': {
+                'correct': graded['correct'],
+                'total': graded['total'],
+                'section_stats': graded['section_stats']
             },
-            upsert=True
-        )
+            'review': review,
+            'answers_available_at': datetime_to_iso_utc(answers_release)
+        }), 202
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        if attempt_write and attempt_write.upserted_id is not None:
-            return jsonify({
-                'success': True,
-                'persisted': True,
-                'first_attempt': {'correct': correct, 'total': total},
-                'current_attempt': {'correct': correct, 'total': total}
-            })
+def compile_simulator_answer_key(simulator_name):
+    """Clave de respuestas del simulador en el orden del examen, mas lo que se muestra al revisar."""
+    questions = list(questions_collection.find(
+        {'subject': SIMULATOR_SUBJECT, 'topic_key': normalize_topic_key(simulator_name)},
+        {**ANSWER_KEY_PROJECTION, 'correct_answer': 1, 'solution': 1}
+    ).sort(SIMULATOR_QUESTION_SORT))
+    key = AnswerKey.from_questions(questions, normalize_simulator_section)
+    review = [
+        {
+            'correct_option': question.get('correct_option', -1) if question.get('has_options') else -1,
+            'correct_answer': question.get('correct_answer') or '',
+            'solution': question.get('solution') or ''
+        }
+        for question in questions
+    ]
+    size = key.nbytes + sum(len(item['correct_answer']) + len(item['solution']) + 64 for item in review)
+    return {'key': key, 'review': review, 'size': size}
+
+def get_simulator_answer_key(simulator_name):
+    """Clave compilada desde la cache del worker; editar preguntas del simulador sube su version."""
+    version = get_content_version(simulator_version_key(simulator_name))
+    topic_key = normalize_topic_key(simulator_name)
+    return _answer_keys.get(
+        topic_key,
+        version,
+        lambda: _read_flights.do(('answer_key', topic_key, version), lambda: compile_simulator_answer_key(simulator_name))
+    )
 
-        first_attempt = simulator_attempts_collection.find_one(first_filter, {'correct': 1, 'total': 1})
-        return jsonify({
+def grade_stored_responses(key, docs, ids_field='response_ids', responses_field='responses'):
+    """Califica de una vez todos los documentos con respuestas guardadas."""
+    choices, present = response_matrix(key, [(bytes(doc[ids_field]), bytes(doc[responses_field])) for doc in docs])
+    return grade(key, choices, present)
+
+def regrade_simulator(simulator_name):
+    """Recalcula correct/total/section_stats de todos los intentos con respuestas guardadas.
+
+    Solo se escriben los intentos y puntajes cuyo resultado cambia. Los intentos
+    enviados antes de guardar respuestas (clientes viejos) se dejan igual.
+    """
+    # Los envios en cola se aplican antes para no pisar la recalificacion despues.
+    score_ingestor.drain()
+    key = get_simulator_answer_key(simulator_name)['key']
+    now = datetime.now(UTC)
+    binary = {'$type': 'binData'}
+
+    attempts = list(simulator_attempts_collection.find(
+        {'simulator': simulator_name, 'responses': binary, 'response_ids': binary},
+        {'user_id': 1, 'responses': 1, 'response_ids': 1, 'correct': 1, 'total': 1, 'section_stats': 1}
+    ))
+    attempt_ops, score_ops = [], []
+    if attempts:
+        graded = grade_stored_responses(key, attempts)
+        for row, attempt in enumerate(attempts):
+            correct, total = int(graded['correct'][row]), int(graded['total'][row])
+            section_stats = section_stats_row(key, graded, row)
+            if (correct, total, section_stats) == (attempt.get('correct'), attempt.get('total'), attempt.get('section_stats')):
+                continue
+            attempt_ops.append(UpdateOne({'_id': attempt['_id']}, {'$set': {
+                'correct': correct,
+                'total': total,
+                'section_stats': section_stats,
+                'regraded_at': now
+            }}))
+            score_ops.append(UpdateOne(
+                {'user_id': attempt.get('user_id'), 'simulator': simulator_name},
+                {'$set': {'correct': correct, 'total': total, 'updated_at': now}}
+            ))
+
+    latest = list(simulator_scores_collection.find(
+        {'simulator': simulator_name, 'latest_responses': binary, 'latest_response_ids': binary},
+        {'latest_responses': 1, 'latest_response_ids': 1, 'latest_correct': 1, 'latest_total': 1, 'latest_section_stats': 1}
+    ))
+    latest_changed = 0
+    if latest:
+        graded = grade_stored_responses(key, latest, 'latest_response_ids', 'latest_responses')
+        for row, score in enumerate(latest):
+            correct, total = int(graded['correct'][row]), int(graded['total'][row])
+            section_stats = section_stats_row(key, graded, row)
+            if (correct, total, section_stats) == (
+                score.get('latest_correct'), score.get('latest_total'), score.get('latest_section_stats')
+            ):
+                continue
+            latest_changed += 1
+            score_ops.append(UpdateOne({'_id': score['_id']}, {'$set': {
+                'latest_correct': correct,
+                'latest_total': total,
+                'latest_section_stats': section_stats,
+                'updated_at': now
+            }}))
+
+    if attempt_ops:
+        simulator_attempts_collection.bulk_write(attempt_ops, ordered=False)
+    if score_ops:
+        simulator_scores_collection.bulk_write(score_ops, ordered=False)
+    if attempt_ops:
+        bump_content_version(simulator_attempts_version_key(simulator_name))
+        refresh_simulator_dashboard(simulator_name)
+    return {
+        'simulator': simulator_name,
+        'questions': len(key),
+        'attempts': len(attempts),
+        'changed': len(attempt_ops),
+        'latest': len(latest),
+        'latest_changed': latest_changed
+    }
+
+# Un hilo por worker recalifica en orden; asi la ultima corrida usa la clave vigente.
+_regrade_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='simulator-regrade')
+_regrade_pending = set()
+_regrade_pending_lock = threading.Lock()
+
+def _run_scheduled_regrade(simulator_name):
+    with _regrade_pending_lock:
+        # Una edicion que llegue mientras corre vuelve a encolarlo.
+        _regrade_pending.discard(simulator_name)
+    try:
+        summary = regrade_simulator(simulator_name)
+        print(f"[grading] {simulator_name}: {summary['changed']} de {summary['attempts']} intentos cambiaron")
+    except Exception as exc:
+        print(f"[grading] warning regrading {simulator_name}: {exc}")
+
+def schedule_regrades(simulator_names):
+    """Encola la recalificacion de los simuladores sin bloquear la peticion que cambio la clave.
+
+    Un simulador que ya espera en la cola no se agrega dos veces. Devuelve los nombres recibidos.
+    """
+    names = list(dict.fromkeys(simulator_names))
+    for simulator_name in names:
+        if SIMULATOR_REGRADE_SYNC:
+            _run_scheduled_regrade(simulator_name)
+            continue
+        with _regrade_pending_lock:
+            if simulator_name in _regrade_pending:
+                continue
+            _regrade_pending.add(simulator_name)
+        _regrade_executor.submit(_run_scheduled_regrade, simulator_name)
+    return names
+
+def compute_item_analysis(simulator_name):
+    """Analisis de reactivos sobre todos los intentos con respuestas guardadas."""
+    started = time.perf_counter()
+    key = get_simulator_answer_key(simulator_name)['key']
+    binary = {'$type': 'binData'}
+    attempts = [
+        (bytes(doc['response_ids']), bytes(doc['responses']))
+        for doc in simulator_attempts_collection.find(
+            {'simulator': simulator_name, 'responses': binary, 'response_ids': binary},
+            {'_id': 0, 'responses': 1, 'response_ids': 1}
+        ).batch_size(EXPORT_CHUNK_ROWS * 10)
+    ]
+    choices, present = response_matrix(key, attempts)
+    analysis = item_analysis(key, choices, present)
+    texts = {
+        str(doc['_id']): (doc.get('question') or '')[:ITEM_ANALYSIS_TEXT_LENGTH]
+        for doc in questions_collection.find({'_id': {'$in': key.question_ids}}, {'question': 1})
+    } if len(key) else {}
+    for position, item in enumerate(analysis['items'], start=1):
+        item['position'] = position
+        item['question'] = texts.get(item['question_id'], '')
+    analysis.update({
+        'simulator': simulator_name,
+        'questions': len(key),
+        'generated_at': datetime_to_iso_utc(datetime.now(UTC)),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+    analysis['size'] = len(app.json.dumps(analysis))
+    return analysis
+
+def get_item_analysis(simulator_name):
+    """(etag, analisis) desde la cache del worker, vigente para la version de preguntas e intentos."""
+    version = (
+        get_content_version(simulator_version_key(simulator_name)),
+        get_content_version(simulator_attempts_version_key(simulator_name))
+    )
+    etag = make_content_etag('item_analysis', simulator_name, *version)
+    analysis = _item_analyses.get(
+        simulator_name,
+        version,
+        lambda: _read_flights.do(('item_analysis', simulator_name, version), lambda: compute_item_analysis(simulator_name))
+    )
+    return etag, analysis
+
+@app.route('/api/simulators/<simulator_name>/item-analysis', methods=['GET'])
+@maestro_required
+def get_simulator_item_analysis(simulator_name):
+    """Dificultad, discriminacion y distractores por pregunta, y KR-20 del simulador"""
+    try:
+        etag, analysis = get_item_analysis(simulator_name)
+        return conditional_json(etag, lambda: {
             'success': True,
-            'persisted': False,
-            'message': 'El primer intento ya estaba guardado',
-            'first_attempt': {
-                'correct': int((first_attempt or {}).get('correct', 0) or 0),
-                'total': int((first_attempt or {}).get('total', 0) or 0),
-            },
-            'current_attempt': {'correct': correct, 'total': total}
+            **{field: value for field, value in analysis.items() if field != 'size'}
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def answer_key_changed(before, after):
+    """Simuladores cuya clave de respuestas cambia al pasar ``before`` -> ``after``."""
+    names = []
+    for question in (before, after):
+        if question and question.get('subject') == SIMULATOR_SUBJECT and question.get('topic'):
+            if question.get('topic') not in names:
+                names.append(question.get('topic'))
+    if len(names) == 1 and before and after and before.get('subject') == after.get('subject'):
+        if all(before.get(field) == after.get(field) for field in ANSWER_KEY_PROJECTION):
+            return []
+    return names
+
+@app.route('/api/simulators/<simulator_name>/regrade', methods=['POST'])
+@maestro_required
+def regrade_simulator_route(simulator_name):
+    """Recalifica el simulador contra la clave de respuestas actual"""
+    try:
+        return jsonify({'success': True, **regrade_simulator(simulator_name)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def simulator_rank_filter(attempt):
+    """Intentos que quedan antes de ``attempt`` en SIMULATOR_RANK_SORT (para contar su posicion)."""
+    correct = attempt.get('correct', 0)
+    total = attempt.get('total', 0)
+    finished_at = attempt.get('finished_at')
+    return {'$or': [
+        {'correct': {'$gt': correct}},
+        {'correct': correct, 'total': {'$gt': total}},
+        {'correct': correct, 'total': total, 'finished_at': {'$lt': finished_at}},
+        {'correct': correct, 'total': total, 'finished_at': finished_at, '_id': {'$lt': attempt['_id']}},
+    ]}
+
+def simulator_result_sections(simulator_name, attempts=()):
+    """Columnas del ranking: secciones de las preguntas del simulador y de los intentos dados."""
+    sections = {
+        normalize_simulator_section(value)
+        for value in questions_collection.distinct(
+            'simulator_subject',
+            {'subject': SIMULATOR_SUBJECT, 'topic_key': normalize_topic_key(simulator_name)}
+        )
+    }
+    for attempt in attempts:
+        sections.update(normalize_section_stats(attempt.get('section_stats')).keys())
+    sections.discard('')
+    return sorted(sections, key=simulator_section_rank_key)
+
+def fetch_simulator_ranking_page(query, skip, limit):
+    """Intentos de una pagina del ranking, ordenados y recortados por Mongo (ix_attempts_rank)."""
+    cursor = simulator_attempts_collection.find(query, SIMULATOR_RANK_PROJECTION).sort(SIMULATOR_RANK_SORT).skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+def build_simulator_result_rows(attempts, sections, first_position):
+    """Filas del ranking; el grupo faltante se completa desde usuarios solo para esta pagina."""
+    # Evita N+1 queries para grupo cuando falte student_group.
+    missing_group_ids = {
+        str(a.get('user_id'))
+        for a in attempts
+        if not (a.get('student_group') or '').strip()
+        and a.get('user_id')
+        and ObjectId.is_valid(str(a.get('user_id')))
+    }
+    group_by_user_id = {}
+    if missing_group_ids:
+        id_objs = [ObjectId(uid) for uid in missing_group_ids]
+        for user_doc in users_collection.find({'_id': {'$in': id_objs}}, {'grupo': 1}):
+            group_by_user_id[str(user_doc.get('_id'))] = user_doc.get('grupo') or ''
+
+    rows = []
+    for idx, attempt in enumerate(attempts, start=first_position):
+        section_stats = normalize_section_stats(attempt.get('section_stats'))
+        section_scores = {}
+        for section in sections:
+            stats = section_stats.get(section, {'correct': 0, 'total': 0})
+            section_scores[section] = {
+                'correct': int(stats.get('correct', 0) or 0),
+                'total': int(stats.get('total', 0) or 0)
+            }
+        rows.append({
+            'position': idx,
+            'student_name': attempt.get('student_name') or 'Alumno',
+            'student_group': attempt.get('student_group') or group_by_user_id.get(str(attempt.get('user_id') or ''), ''),
+            'correct': int(attempt.get('correct', 0) or 0),
+            'total': int(attempt.get('total', 0) or 0),
+            'finished_at': datetime_to_iso_utc(attempt.get('finished_at')) if attempt.get('finished_at') else None,
+            'section_scores': section_scores
+        })
+    return rows
+
 @app.route('/api/simulators/<simulator_name>/results', methods=['GET'])
 @login_required
 def get_simulator_results(simulator_name):
-    """Obtiene resultados agregados por alumno para un simulador"""
+    """Obtiene el ranking del primer intento por alumno para un simulador.
+
+    Mongo ordena y pagina sobre ix_attempts_rank / ix_attempts_group_rank; la
+    posicion del alumno actual sale de un count. Parametros: page, page_size
+    (max 100; 0 o vacio = todo), group y around=me con neighbors=N para ver
+    solo las N posiciones antes y despues del alumno. Con format=csv|xlsx
+    (solo maestro) descarga el ranking completo en streaming.
+    """
     try:
         page = max(1, int(request.args.get('page', 1)))
         page_size_raw = request.args.get('page_size')
@@ -1659,117 +3367,103 @@ def get_simulator_results(simulator_name):
             if page_size < 0:
                 page_size = 0
             page_size = min(page_size, 100)
+        group = (request.args.get('group') or '').strip()
+        around_me = (request.args.get('around') or '').strip().lower() == 'me'
+        neighbors = min(max(int(request.args.get('neighbors', SIMULATOR_RANK_DEFAULT_NEIGHBORS)), 0), SIMULATOR_RANK_MAX_NEIGHBORS)
 
         current_user_id = str(session.get('user_id') or '')
         current_user_role = str(session.get('user_role') or '').strip().lower()
-        attempts = list(simulator_attempts_collection.find({'simulator': simulator_name}))
-        if not attempts:
-            return jsonify({
-                'success': True,
-                'simulator': simulator_name,
-                'sections': [],
-                'results': [],
-                'pagination': {
-                    'page': 1,
-                    'page_size': page_size or 0,
-                    'total_items': 0,
-                    'total_pages': 1,
-                    'has_prev': False,
-                    'has_next': False
-                }
-            })
 
-        # Tomar solo el primer intento por alumno para el ranking
-        first_by_user = {}
-        for attempt in attempts:
-            user_key = str(attempt.get('user_id') or '')
-            finished_at = attempt.get('finished_at') or datetime.min.replace(tzinfo=UTC)
-            if finished_at.tzinfo is None:
-                finished_at = finished_at.replace(tzinfo=UTC)
-            if user_key not in first_by_user:
-                first_by_user[user_key] = attempt
-                first_by_user[user_key]['finished_at'] = finished_at
-                continue
-            prev_finished = first_by_user[user_key].get('finished_at') or datetime.min.replace(tzinfo=UTC)
-            if prev_finished.tzinfo is None:
-                prev_finished = prev_finished.replace(tzinfo=UTC)
-            if finished_at < prev_finished:
-                first_by_user[user_key] = attempt
-                first_by_user[user_key]['finished_at'] = finished_at
+        export_format = (request.args.get('format') or '').strip().lower()
+        if export_format:
+            if export_format not in SIMULATOR_EXPORT_FORMATS:
+                return jsonify({'success': False, 'error': 'format debe ser csv o xlsx'}), 400
+            if current_user_role != 'maestro':
+                return jsonify({
+                    'success': False,
+                    'error': 'Acceso denegado: Se requiere rol de maestro'
+                }), 403
+            sections = simulator_result_sections(simulator_name)
+            return tabular_export_response(
+                export_format,
+                ['#', 'Alumno', 'Grupo', *sections, 'Total', 'Finalizo'],
+                iter_simulator_result_export_rows(simulator_name, group, sections),
+                f'resultados_{simulator_name}',
+                simulator_name
+            )
 
-        first_attempts = list(first_by_user.values())
+        # ux_attempts_simulator_user: un solo intento (el primero) por alumno.
+        my_attempt = simulator_attempts_collection.find_one(
+            {'simulator': simulator_name, 'user_id': current_user_id},
+            SIMULATOR_RANK_PROJECTION
+        ) if current_user_id else None
 
         # Los alumnos pueden ver el ranking completo solo si ya realizaron ese simulador.
-        if current_user_role != 'maestro':
-            has_attempt = any(
-                str(attempt.get('user_id') or '') == current_user_id
-                for attempt in first_attempts
-            )
-            if not has_attempt:
+        if current_user_role != 'maestro' and not my_attempt:
+            if not simulator_attempts_collection.find_one({'simulator': simulator_name}, {'_id': 1}):
                 return jsonify({
-                    'success': False,
-                    'error': 'Aún no has realizado este simulador'
-                }), 403
-        all_sections = set()
-        for attempt in first_attempts:
-            section_stats = normalize_section_stats(attempt.get('section_stats'))
-            attempt['section_stats'] = section_stats
-            all_sections.update(section_stats.keys())
-
-        order_map = {name: idx for idx, name in enumerate(SIMULATOR_SECTION_ORDER)}
-        sections = sorted(all_sections, key=lambda s: (order_map.get(s, len(SIMULATOR_SECTION_ORDER)), s.lower()))
-        first_attempts.sort(key=lambda a: (-(int(a.get('correct', 0) or 0)), -(int(a.get('total', 0) or 0)), a.get('finished_at') or datetime.max.replace(tzinfo=UTC)))
-
-        # Evita N+1 queries para grupo cuando falte student_group.
-        missing_group_ids = {
-            str(a.get('user_id'))
-            for a in first_attempts
-            if not (a.get('student_group') or '').strip()
-            and a.get('user_id')
-            and ObjectId.is_valid(str(a.get('user_id')))
-        }
-        group_by_user_id = {}
-        if missing_group_ids:
-            id_objs = [ObjectId(uid) for uid in missing_group_ids]
-            for user_doc in users_collection.find({'_id': {'$in': id_objs}}, {'grupo': 1}):
-                group_by_user_id[str(user_doc.get('_id'))] = user_doc.get('grupo') or ''
-
-        rows = []
-        for idx, attempt in enumerate(first_attempts, start=1):
-            section_scores = {}
-            for section in sections:
-                stats = attempt['section_stats'].get(section, {'correct': 0, 'total': 0})
-                section_scores[section] = {
-                    'correct': int(stats.get('correct', 0) or 0),
-                    'total': int(stats.get('total', 0) or 0)
-                }
-            rows.append({
-                'position': idx,
-                'student_name': attempt.get('student_name') or 'Alumno',
-                'student_group': attempt.get('student_group') or group_by_user_id.get(str(attempt.get('user_id') or ''), ''),
-                'correct': int(attempt.get('correct', 0) or 0),
-                'total': int(attempt.get('total', 0) or 0),
-                'finished_at': datetime_to_iso_utc(attempt.get('finished_at')) if attempt.get('finished_at') else None,
-                'section_scores': section_scores
-            })
+                    'success': True,
+                    'simulator': simulator_name,
+                    'sections': [],
+                    'results': [],
+                    'my_rank': None,
+                    'pagination': {
+                        'page': 1,
+                        'page_size': page_size or 0,
+                        'total_items': 0,
+                        'total_pages': 1,
+                        'has_prev': False,
+                        'has_next': False
+                    }
+                })
+            return jsonify({
+                'success': False,
+                'error': 'Aún no has realizado este simulador'
+            }), 403
+
+        query = {'simulator': simulator_name}
+        if group:
+            query['student_group'] = group
+        total_items = simulator_attempts_collection.count_documents(query)
+
+        my_rank = None
+        if my_attempt and (not group or my_attempt.get('student_group') == group):
+            my_rank = simulator_attempts_collection.count_documents({
+                **query, **simulator_rank_filter(my_attempt)
+            }) + 1
 
-        total_items = len(rows)
-        if page_size and page_size > 0:
+        if around_me:
+            if my_rank is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'No hay intento del alumno actual en este ranking'
+                }), 404
+            skip = max(0, my_rank - 1 - neighbors)
+            limit = my_rank - skip + neighbors
+            page_size = limit
+            page, total_pages = 1, 1
+        elif page_size and page_size > 0:
             total_pages = max(1, (total_items + page_size - 1) // page_size)
             page = min(page, total_pages)
-            start = (page - 1) * page_size
-            end = start + page_size
-            paged_rows = rows[start:end]
+            skip, limit = (page - 1) * page_size, page_size
         else:
             total_pages = 1
             page = 1
-            paged_rows = rows
+            skip, limit = 0, 0
+
+        attempts = _read_flights.do(
+            ('simulator_results', simulator_name, group, skip, limit),
+            lambda: fetch_simulator_ranking_page(query, skip, limit)
+        )
+        sections = simulator_result_sections(simulator_name, attempts)
+        rows = build_simulator_result_rows(attempts, sections, skip + 1)
 
         return jsonify({
             'success': True,
             'simulator': simulator_name,
             'sections': sections,
-            'results': paged_rows,
+            'results': rows,
+            'my_rank': my_rank,
             'pagination': {
                 'page': page,
                 'page_size': page_size or 0,
@@ -1779,188 +3473,471 @@ def get_simulator_results(simulator_name):
                 'has_next': page < total_pages
             }
         })
+    except ValueError:
+        return jsonify({'success': False, 'error': 'page, page_size y neighbors deben ser enteros'}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def attendance_students_match(group=''):
+    return {'grupo': group} if group and group != 'todos' else {}
+
+def attendance_attempt_stages(simulator_name):
+    """Une a cada alumno solo su intento de este simulador (``attempt``), via ux_attempts_simulator_user."""
+    return [
+        {'$lookup': {
+            'from': simulator_attempts_collection.name,
+            'let': {'uid': {'$toString': '$_id'}},
+            'pipeline': [
+                {'$match': {'$expr': {'$and': [
+                    {'$eq': ['$simulator', simulator_name]},
+                    {'$eq': ['$user_id', '$$uid']}
+                ]}}},
+                {'$limit': 1},
+                {'$project': {'correct': 1, 'total': 1, 'finished_at': 1}}
+            ],
+            'as': '_attempts'
+        }},
+        {'$set': {'attempt': {'$arrayElemAt': ['$_attempts', 0]}}},
+    ]
+
+def attendance_row_stages(simulator_name, group='', status='', skip=0, limit=0):
+    """Filas del control de aplicacion ordenadas por grupo y nombre (sin limit = todas).
+
+    Sin filtro de estado el ``$lookup`` corre despues de paginar, solo para las filas devueltas.
+    """
+    rows = [
+        {'$match': attendance_students_match(group)},
+        {'$set': {
+            '_group_sort': {'$cond': [{'$gt': [{'$ifNull': ['$grupo', '']}, '']}, '$grupo', 'ZZZ']},
+            '_name_sort': {'$toLower': {'$trim': {'input': {'$concat': [
+                {'$ifNull': ['$nombre', '']}, ' ', {'$ifNull': ['$apellido', '']}
+            ]}}}}
+        }},
+    ]
+    page = [{'$sort': {'_group_sort': 1, '_name_sort': 1, '_id': 1}}, {'$skip': skip}]
+    if limit:
+        page.append({'$limit': limit})
+    if status:
+        rows += attendance_attempt_stages(simulator_name) + [{'$match': {'attempt': {'$exists': status == 'completado'}}}] + page
+    else:
+        rows += page + attendance_attempt_stages(simulator_name)
+    rows.append({'$project': {
+        'nombre': 1, 'apellido': 1, 'email': 1, 'grupo': 1,
+        'attempt.correct': 1, 'attempt.total': 1, 'attempt.finished_at': 1
+    }})
+    return rows
+
+def simulator_attendance_pipeline(simulator_name, group='', status='', skip=0, limit=0):
+    """Agregacion unica del control de aplicacion sobre ``usuarios``.
+
+    ``$facet`` devuelve en una sola ida a Mongo la pagina de filas (ordenada por
+    grupo y nombre), el resumen completados/pendientes del filtro y el conteo
+    de alumnos por grupo.
+    """
+    has_attempt = {'$gt': [{'$ifNull': ['$attempt._id', None]}, None]}
+    return [
+        {'$match': {'rol': 'alumno'}},
+        {'$facet': {
+            'rows': attendance_row_stages(simulator_name, group, status, skip, limit),
+            'summary': [
+                {'$match': attendance_students_match(group)},
+                *attendance_attempt_stages(simulator_name),
+                {'$group': {
+                    '_id': None,
+                    'total': {'$sum': 1},
+                    'completed': {'$sum': {'$cond': [has_attempt, 1, 0]}}
+                }}
+            ],
+            'groups': [
+                {'$match': {'grupo': {'$exists': True, '$ne': ''}}},
+                {'$group': {'_id': '$grupo', 'count': {'$sum': 1}}},
+                {'$sort': {'_id': 1}}
+            ]
+        }}
+    ]
+
+def attendance_row(student):
+    """Fila del control de aplicacion tal como la muestra el panel de maestro."""
+    attempt = student.get('attempt')
+    full_name = f"{(student.get('nombre') or '').strip()} {(student.get('apellido') or '').strip()}".strip()
+    return {
+        'student_id': str(student.get('_id')),
+        'name': full_name or 'Alumno',
+        'email': student.get('email') or '',
+        'group': (student.get('grupo') or '').strip(),
+        'status': 'Completado' if attempt else 'Pendiente',
+        'score': f"{int(attempt.get('correct', 0) or 0)}/{int(attempt.get('total', 0) or 0)}" if attempt else '-',
+        'finished_at': datetime_to_iso_utc(attempt.get('finished_at')) if attempt else None
+    }
+
+def iter_attendance_export_rows(simulator_name, group='', status=''):
+    """Filas de exportacion (columnas de la tabla del panel) leidas del cursor de la agregacion."""
+    cursor = users_collection.aggregate(
+        [{'$match': {'rol': 'alumno'}}] + attendance_row_stages(simulator_name, group, status),
+        batchSize=EXPORT_CHUNK_ROWS
+    )
+    try:
+        for position, student in enumerate(cursor, start=1):
+            row = attendance_row(student)
+            yield [position, row['name'], row['group'] or '-', row['status'], row['score'], row['finished_at'] or '-']
+    finally:
+        cursor.close()
+
+def iter_simulator_result_export_rows(simulator_name, group, sections):
+    """Ranking completo en orden de SIMULATOR_RANK_SORT, procesado por lotes del cursor."""
+    query = {'simulator': simulator_name}
+    if group:
+        query['student_group'] = group
+    cursor = (
+        simulator_attempts_collection.find(query, SIMULATOR_RANK_PROJECTION)
+        .sort(SIMULATOR_RANK_SORT)
+        .batch_size(EXPORT_CHUNK_ROWS)
+    )
+
+    def export_rows(chunk, first_position):
+        for row in build_simulator_result_rows(chunk, sections, first_position):
+            scores = [
+                f"{row['section_scores'][section]['correct']}/{row['section_scores'][section]['total']}"
+                for section in sections
+            ]
+            yield [
+                row['position'], row['student_name'], row['student_group'] or '-',
+                *scores, f"{row['correct']}/{row['total']}", row['finished_at'] or '-'
+            ]
+
+    try:
+        chunk, position = [], 1
+        for attempt in cursor:
+            chunk.append(attempt)
+            if len(chunk) >= EXPORT_CHUNK_ROWS:
+                yield from export_rows(chunk, position)
+                position += len(chunk)
+                chunk = []
+        yield from export_rows(chunk, position)
+    finally:
+        cursor.close()
+
+def tabular_export_response(export_format, header, rows, filename, sheet_name):
+    """Respuesta en streaming CSV o XLSX para los reportes de simulador."""
+    stamp = datetime.now(UTC).strftime('%Y%m%d_%H%M%S')
+    safe_name = secure_filename(filename) or 'reporte'
+    if export_format == 'xlsx':
+        body, mimetype = iter_xlsx(header, rows, sheet_name), XLSX_MIMETYPE
+    else:
+        body, mimetype = iter_csv(header, rows), 'text/csv'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={safe_name}_{stamp}.{export_format}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/api/simulators/<simulator_name>/attendance', methods=['GET'])
 @maestro_required
 def get_simulator_attendance(simulator_name):
-    """Obtiene lista de alumnos y estado de aplicacion para un simulador"""
+    """Obtiene lista de alumnos y estado de aplicacion para un simulador.
+
+    Parametros: group, status (completado|pendiente), page y page_size
+    (max ATTENDANCE_PAGE_MAX_SIZE; sin page_size devuelve todas las filas).
+    Con format=csv|xlsx descarga todas las filas del filtro en streaming.
+    """
     try:
         group = (request.args.get('group') or '').strip()
-        students_query = {'rol': 'alumno'}
-        if group and group != 'todos':
-            students_query['grupo'] = group
-
-        students = list(users_collection.find(
-            students_query,
-            {'nombre': 1, 'apellido': 1, 'email': 1, 'grupo': 1}
-        ))
-
-        attempts = list(simulator_attempts_collection.find(
-            {'simulator': simulator_name},
-            {'user_id': 1, 'finished_at': 1, 'correct': 1, 'total': 1}
-        ))
-        attempts_by_user = {}
-        for attempt in attempts:
-            uid = str(attempt.get('user_id') or '')
-            if not uid:
-                continue
-            finished_at = attempt.get('finished_at') or datetime.min.replace(tzinfo=UTC)
-            if finished_at.tzinfo is None:
-                finished_at = finished_at.replace(tzinfo=UTC)
-            prev = attempts_by_user.get(uid)
-            if not prev or finished_at < prev.get('finished_at', datetime.max.replace(tzinfo=UTC)):
-                attempts_by_user[uid] = {
-                    'finished_at': finished_at,
-                    'correct': int(attempt.get('correct', 0) or 0),
-                    'total': int(attempt.get('total', 0) or 0)
-                }
-
-        rows = []
-        completed = 0
-        for student in students:
-            sid = str(student.get('_id'))
-            attempt = attempts_by_user.get(sid)
-            status = 'Completado' if attempt else 'Pendiente'
-            if attempt:
-                completed += 1
-
-            full_name = f"{(student.get('nombre') or '').strip()} {(student.get('apellido') or '').strip()}".strip()
-            rows.append({
-                'student_id': sid,
-                'name': full_name or 'Alumno',
-                'email': student.get('email') or '',
-                'group': (student.get('grupo') or '').strip(),
-                'status': status,
-                'score': f"{attempt.get('correct', 0)}/{attempt.get('total', 0)}" if attempt else '-',
-                'finished_at': datetime_to_iso_utc(attempt.get('finished_at')) if attempt else None
-            })
+        status = (request.args.get('status') or '').strip().lower()
+        if status in ('', 'todos'):
+            status = ''
+        elif status not in ('completado', 'pendiente'):
+            return jsonify({'success': False, 'error': 'status debe ser completado o pendiente'}), 400
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            page_size = min(max(int(request.args.get('page_size') or 0), 0), ATTENDANCE_PAGE_MAX_SIZE)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'page y page_size deben ser enteros'}), 400
+
+        export_format = (request.args.get('format') or '').strip().lower()
+        if export_format:
+            if export_format not in SIMULATOR_EXPORT_FORMATS:
+                return jsonify({'success': False, 'error': 'format debe ser csv o xlsx'}), 400
+            return tabular_export_response(
+                export_format,
+                ATTENDANCE_EXPORT_HEADER,
+                iter_attendance_export_rows(simulator_name, group, status),
+                f'control_{simulator_name}',
+                simulator_name
+            )
 
-        rows.sort(key=lambda item: (
-            item.get('group') or 'ZZZ',
-            item.get('name', '').lower()
-        ))
+        skip = (page - 1) * page_size if page_size else 0
+        result = next(users_collection.aggregate(
+            simulator_attendance_pipeline(simulator_name, group, status, skip, page_size)
+        ), {})
+        summary = (result.get('summary') or [{}])[0]
+        total_students = int(summary.get('total', 0) or 0)
+        completed = int(summary.get('completed', 0) or 0)
+        pending = max(0, total_students - completed)
+        if page_size:
+            filtered_total = {'completado': completed, 'pendiente': pending}.get(status, total_students)
+            total_pages = max(1, (filtered_total + page_size - 1) // page_size)
+        else:
+            total_pages = 1
 
-        groups_summary = list(users_collection.aggregate([
-            {'$match': {'rol': 'alumno', 'grupo': {'$exists': True, '$ne': ''}}},
-            {'$group': {'_id': '$grupo', 'count': {'$sum': 1}}},
-            {'$sort': {'_id': 1}}
-        ]))
+        rows = [attendance_row(student) for student in result.get('rows') or []]
 
         return jsonify({
             'success': True,
             'simulator': simulator_name,
             'group': group or 'todos',
-            'total_students': len(students),
+            'total_students': total_students,
             'completed_students': completed,
-            'pending_students': max(0, len(students) - completed),
+            'pending_students': pending,
             'rows': rows,
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total_pages': total_pages,
+                'has_prev': page > 1,
+                'has_next': page < total_pages
+            },
             'groups': [
                 {'name': item.get('_id'), 'count': int(item.get('count', 0))}
-                for item in groups_summary if item.get('_id')
+                for item in result.get('groups') or [] if item.get('_id')
             ]
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/simulators/<simulator_name>/questions', methods=['GET'])
-def get_simulator_questions(simulator_name):
-    """Obtiene las preguntas de un simulador en orden fijo"""
-    try:
-        simul = simulators_collection.find_one({'name': simulator_name})
-        now_utc = datetime.now(UTC)
-        if simul and not is_simulator_enabled(simul, now_utc):
-            start = simul.get('enabled_from')
-            end = simul.get('enabled_until')
-            if start and start.tzinfo is None:
-                start = start.replace(tzinfo=UTC)
-            if end and end.tzinfo is None:
-                end = end.replace(tzinfo=UTC)
-
-            if start and now_utc < start:
-                return jsonify({
-                    'success': False,
-                    'error': f'Este simulador estará disponible desde {datetime_to_iso_utc(start)}'
-                }), 403
-            if end and now_utc > end:
-                return jsonify({
-                    'success': False,
-                    'error': f'Este simulador cerró en {datetime_to_iso_utc(end)}'
-                }), 403
+def count_students_by_group(groups=None):
+    """Alumnos por grupo (todos o solo ``groups``) en una sola agregacion.
+
+    Un alumno sin ``grupo`` cuenta en ``''``, igual que sus intentos.
+    """
+    match = {'rol': 'alumno'}
+    if groups is not None:
+        wanted = list(groups)
+        # None en $in tambien encuentra a quien no tiene el campo.
+        match['grupo'] = {'$in': wanted + [None] if '' in groups else wanted}
+    counts = {}
+    for doc in users_collection.aggregate([
+        {'$match': match},
+        {'$group': {'_id': {'$ifNull': ['$grupo', '']}, 'count': {'$sum': 1}}}
+    ]):
+        group = (doc['_id'] or '').strip()
+        counts[group] = counts.get(group, 0) + doc['count']
+    return counts
+
+def refresh_simulator_dashboard(simulator_name, groups=None):
+    """Recalcula el tablero del simulador: completo, o solo los grupos dados (incremental).
+
+    La actualizacion incremental solo aplica si el documento ya existe; si no,
+    se construye completo.
+    """
+    students_version = get_content_version(STUDENTS_VERSION_KEY)
+    query = {'simulator': simulator_name}
+    if groups is not None:
+        groups = {(group or '').strip() for group in groups}
+        query['student_group'] = {'$in': list(groups)}
+    attempts_by_group = {}
+    # ix_attempts_group_rank: simulador + grupo.
+    for attempt in simulator_attempts_collection.find(
+        query, {'_id': 0, 'student_group': 1, 'correct': 1, 'total': 1, 'section_stats': 1}
+    ):
+        attempts_by_group.setdefault((attempt.get('student_group') or '').strip(), []).append(attempt)
+    students = count_students_by_group(groups)
+    names = groups if groups is not None else set(attempts_by_group) | set(students)
+    entries = {
+        group_key(group): summarize_group(
+            group, attempts_by_group.get(group, ()), students.get(group, 0),
+            normalize_section_stats, simulator_section_rank_key
+        )
+        for group in names
+    }
+    now = datetime.now(UTC)
+    if groups is None:
+        simulator_dashboards_collection.update_one(
+            {'_id': simulator_name},
+            {'$set': {
+                'simulator': simulator_name,
+                'groups': entries,
+                'students_version': students_version,
+                'updated_at': now
+            }, '$inc': {'revision': 1}},
+            upsert=True
+        )
+        return
+    empty = {key for key, entry in entries.items() if not entry['students'] and not entry['completed']}
+    update = {
+        '$set': {**{f'groups.{key}': entry for key, entry in entries.items() if key not in empty}, 'updated_at': now},
+        '$inc': {'revision': 1}
+    }
+    if empty:
+        update['$unset'] = {f'groups.{key}': '' for key in empty}
+    result = simulator_dashboards_collection.update_one({'_id': simulator_name}, update)
+    if not result.matched_count:
+        refresh_simulator_dashboard(simulator_name)
+
+def load_simulator_dashboard(simulator_name):
+    """Documento del tablero; se reconstruye si falta o si cambiaron los alumnos."""
+    students_version = get_content_version(STUDENTS_VERSION_KEY)
+    doc = simulator_dashboards_collection.find_one({'_id': simulator_name})
+    if doc is None or doc.get('students_version') != students_version:
+        _read_flights.do(
+            ('dashboard', simulator_name, students_version),
+            lambda: refresh_simulator_dashboard(simulator_name)
+        )
+        doc = simulator_dashboards_collection.find_one({'_id': simulator_name}) or {}
+    return doc
 
-        query = {
-            'subject': SIMULATOR_SUBJECT,
-            'topic': {'$regex': f'^{re.escape(simulator_name)}$', '$options': 'i'}
-        }
-        questions = list(questions_collection.find(query))
-        for question in questions:
-            question['simulator_subject'] = normalize_simulator_section(question.get('simulator_subject', ''))
-        questions.sort(key=simulator_section_sort_key)
-        questions = [jsonify_question(q) for q in questions]
-        
-        return jsonify({
+@app.route('/api/simulators/<simulator_name>/dashboard', methods=['GET'])
+@maestro_required
+def get_simulator_dashboard(simulator_name):
+    """Promedio, mediana y tasa de finalizacion por grupo y seccion (documento materializado)"""
+    try:
+        doc = load_simulator_dashboard(simulator_name)
+        groups = sorted((doc.get('groups') or {}).values(), key=lambda entry: (not entry['group'], entry['group'].lower()))
+        sections = sorted(
+            {section['section'] for entry in groups for section in entry['sections']},
+            key=simulator_section_rank_key
+        )
+        etag = make_content_etag('dashboard', simulator_name, doc.get('revision'), doc.get('students_version'))
+        return conditional_json(etag, lambda: {
             'success': True,
-            'count': len(questions),
             'simulator': simulator_name,
-            'time_limit': simul.get('time_limit', DEFAULT_SIMULATOR_TIME) if simul else DEFAULT_SIMULATOR_TIME,
-            'enabled_from': datetime_to_iso_utc(simul.get('enabled_from')) if simul else None,
-            'enabled_until': datetime_to_iso_utc(simul.get('enabled_until')) if simul else None,
-            'force_enabled': parse_bool(simul.get('force_enabled'), False) if simul else False,
-            'questions': questions
+            'sections': sections,
+            'groups': groups,
+            'totals': dashboard_totals(groups),
+            'updated_at': datetime_to_iso_utc(doc.get('updated_at'))
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/simulators/<simulator_name>/questions', methods=['GET'])
+def get_simulator_questions(simulator_name):
+    """Obtiene las preguntas de un simulador en orden fijo"""
+    try:
+        bundle = get_simulator_bundle(simulator_name)
+        window_error = simulator_window_error(bundle['simulator'], datetime.now(UTC))
+        if window_error:
+            return jsonify({'success': False, 'error': window_error}), 403
+
+        if request.if_none_match.contains_weak(bundle['etag']):
+            response = Response(status=304)
+            response.set_etag(bundle['etag'])
+        else:
+            response = precompressed_response(bundle['body'], bundle['variants'])
+            # Igual que compression.py: con otra codificacion el ETag pasa a debil.
+            response.set_etag(bundle['etag'], weak='Content-Encoding' in response.headers)
+        response.headers['Cache-Control'] = CONTENT_CACHE_CONTROL
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def load_question_stats():
+    """Documento materializado de estadisticas (lo reconstruye si no existe)."""
+    doc = question_stats_collection.find_one({'_id': QUESTION_STATS_DOC_ID})
+    if not doc or not doc.get('rebuilt_at'):
+        # Solo se reconstruye si nunca se materializo (o un $inc creo un documento parcial).
+        doc = recompute_question_stats()
+    return doc
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Obtiene estadísticas del sistema"""
+    """Obtiene estadísticas del sistema desde el documento materializado"""
     try:
-        total = questions_collection.count_documents({})
-        
-        # Estadísticas por materia
-        pipeline_subjects = [
-            {'$group': {'_id': '$subject', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}}
-        ]
-        subjects_stats = list(questions_collection.aggregate(pipeline_subjects))
-        
-        # Estadísticas por universidad
-        pipeline_universities = [
-            {'$group': {'_id': '$university', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}}
-        ]
-        universities_stats = list(questions_collection.aggregate(pipeline_universities))
-        
-        # Top temas
-        pipeline_topics = [
-            {'$group': {'_id': '$topic', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}},
-            {'$limit': 5}
-        ]
-        top_topics = list(questions_collection.aggregate(pipeline_topics))
-        
-        # Total de veces mostradas
-        pipeline_shown = [
-            {'$group': {'_id': None, 'total': {'$sum': '$times_shown'}}}
-        ]
-        total_shown = list(questions_collection.aggregate(pipeline_shown))
+        doc = _read_flights.do(('stats',), load_question_stats)
         
         return jsonify({
             'success': True,
             'stats': {
-                'total_questions': total,
-                'subjects': subjects_stats,
-                'universities': universities_stats,
-                'top_topics': top_topics,
-                'total_shown': total_shown[0]['total'] if total_shown else 0
+                'total_questions': int(doc.get('total_questions', 0) or 0),
+                'subjects': _stats_bucket_list(doc.get('subjects')),
+                'universities': _stats_bucket_list(doc.get('universities')),
+                'top_topics': _stats_bucket_list(doc.get('topics'), limit=5),
+                'total_shown': int(doc.get('total_shown', 0) or 0),
+                'total_correct': int(doc.get('total_correct', 0) or 0),
+                'updated_at': datetime_to_iso_utc(doc.get('updated_at'))
             }
         })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/stats/recompute', methods=['POST'])
+@maestro_required
+def recompute_stats():
+    """Reconstruye las estadísticas materializadas desde cero"""
+    try:
+        doc = recompute_question_stats()
+        return jsonify({
+            'success': True,
+            'message': 'Estadísticas reconstruidas',
+            'total_questions': doc['total_questions']
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/stats/cache', methods=['GET'])
+@maestro_required
+def get_cache_stats():
+    """Contadores de caches y coalescencia del worker que atiende la peticion"""
+    try:
+        return jsonify({
+            'success': True,
+            'pid': os.getpid(),
+            'single_flight': _read_flights.stats(),
+            'simulator_bundles': _simulator_bundles.stats(),
+            'answer_keys': _answer_keys.stats(),
+            'item_analyses': _item_analyses.stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.cli.command('recompute-stats')
+def recompute_stats_command():
+    """Reconstruye el documento de estadísticas: flask --app app recompute-stats"""
+    doc = recompute_question_stats()
+    print(f"[stats] {doc['total_questions']} preguntas, {doc['total_shown']} vistas")
+
+@app.cli.command('scan-duplicates')
+def scan_duplicates_command():
+    """Agrupa preguntas casi duplicadas: flask --app app scan-duplicates"""
+    summary = scan_duplicate_questions()
+    print(
+        f"[duplicates] {summary['scanned']} preguntas, {summary['clusters']} grupos, "
+        f"{summary['duplicates']} duplicados ({summary['fingerprinted']} firmas nuevas)"
+    )
+
+@app.cli.command('regrade-simulator')
+@click.argument('name')
+def regrade_simulator_command(name):
+    """Recalifica un simulador: flask --app app regrade-simulator NOMBRE"""
+    summary = regrade_simulator(name)
+    print(
+        f"[grading] {summary['simulator']}: {summary['attempts']} intentos recalificados "
+        f"({summary['changed']} cambiaron), {summary['questions']} preguntas en la clave"
+    )
+
+@app.cli.command('item-analysis')
+@click.argument('name')
+def item_analysis_command(name):
+    """Analisis de reactivos de un simulador: flask --app app item-analysis NOMBRE"""
+    analysis = compute_item_analysis(name)
+    flagged = [item for item in analysis['items'] if item['flags']]
+    print(
+        f"[items] {name}: {analysis['attempts']} intentos, {analysis['questions']} preguntas, "
+        f"KR-20={analysis['kr20']}, {len(flagged)} preguntas a revisar ({analysis['elapsed_ms']} ms)"
+    )
+    for item in flagged:
+        print(f"  #{item['position']} p={item['p_value']} r={item['discrimination']} {', '.join(item['flags'])}")
+
+@app.cli.command('refresh-image-urls')
+def refresh_image_urls_command():
+    """Recalcula image_url de todas las preguntas: flask --app app refresh-image-urls"""
+    updated = backfill_question_image_fields(refresh=True)
+    print(f"[images] image_url actualizado en {updated} preguntas")
+
 # ========== RUTAS DE LA API ==========
+
 @app.route('/api')
 def api_info():
     """Información de la API"""
@@ -1969,13 +3946,19 @@ def api_info():
         'database': db.name,
         'collection': questions_collection.name,
         'endpoints': {
-            'GET /api/questions': 'Obtener todas las preguntas',
+            'GET /api/questions': 'Obtener preguntas paginadas por cursor (filtros, sort, fields)',
+            'GET /api/questions?format=ndjson|csv': 'Exportar banco de preguntas en streaming (solo maestro)',
             'POST /api/questions': 'Crear nueva pregunta',
-            'GET /api/questions/random': 'Obtener pregunta aleatoria',
+            'GET /api/questions/random': 'Obtener pregunta aleatoria (n=K: lote sin repetir vistas; difficulty=facil|media|dificil)',
             'PUT /api/questions/<id>': 'Actualizar pregunta',
             'DELETE /api/questions/<id>': 'Eliminar pregunta',
             'POST /api/questions/<id>/answer': 'Registrar respuesta',
             'GET /api/stats': 'Estadísticas',
+            'GET /api/questions/search': 'Buscar preguntas por texto con relevancia (solo maestro)',
+            'GET /api/questions/duplicates': 'Grupos de preguntas casi duplicadas (solo maestro)',
+            'POST /api/questions/duplicates/scan': 'Escanear el banco en busca de duplicados (solo maestro)',
+            'POST /api/stats/recompute': 'Reconstruir estadísticas materializadas (solo maestro)',
+            'GET /api/stats/cache': 'Contadores de cache y single flight del worker (solo maestro)',
             'GET /api/subjects': 'Obtener materias disponibles',
             'GET /api/subjects/<subject>/topics': 'Obtener temas por materia',
             'GET /api/students': 'Obtener alumnos (solo maestro)',
@@ -1987,9 +3970,13 @@ def api_info():
             'PUT /api/simulators/<name>': 'Actualizar simulador',
             'DELETE /api/simulators/<name>': 'Eliminar simulador',
             'POST /api/simulators/<name>/force-enable': 'Habilitar/deshabilitar simulador fuera de horario',
-            'POST /api/simulators/<name>/score': 'Guardar puntaje del usuario en simulador',
-            'GET /api/simulators/<name>/results': 'Obtener ranking y resultados por simulador',
+            'POST /api/simulators/<name>/answers': 'Enviar respuestas del simulador; se califican en el servidor (alias: /score)',
+            'GET /api/simulators/<name>/item-analysis': 'Analisis de reactivos: dificultad, discriminacion, distractores y KR-20 (solo maestro)',
+            'POST /api/simulators/<name>/regrade': 'Recalificar intentos contra la clave de respuestas actual (solo maestro)',
+            'GET /api/simulators/<name>/results': 'Ranking paginado por simulador (page, page_size, group, around=me&neighbors=N)',
             'GET /api/simulators/<name>/attendance': 'Obtener control de aplicacion por alumno',
+            'GET /api/simulators/<name>/dashboard': 'Promedios, medianas y tasa de finalizacion por grupo y seccion (solo maestro)',
+            'GET /api/simulators/<name>/results|attendance?format=csv|xlsx': 'Descargar resultados o control de aplicacion en streaming (solo maestro)',
             'POST /api/register': 'Registrar alumno o maestro (solo maestro)',
             'POST /api/bulk_questions_file': 'Procesar PDF/imagen y cargar preguntas',
             'POST /api/login': 'Iniciar sesión',
@@ -2024,6 +4011,21 @@ def serve_static(path):
 
 # ========== FUNCIONES DE INICIALIZACIÓN ==========
 
+def ensure_score_submissions_applied():
+    """Aplica envios que quedaron en cola en un reinicio anterior.
+
+    Va al final del modulo: ``on_scores_applied`` necesita todos los helpers
+    de versiones y tableros ya definidos.
+    """
+    try:
+        applied = score_ingestor.drain()
+        if applied:
+            print(f"[mongo] simulator_submissions: {applied} envios pendientes aplicados")
+    except Exception as exc:
+        print(f"[mongo] warning applying pending submissions: {exc}")
+
+ensure_score_submissions_applied()
+
 
 def create_default_users():
     """Crea usuarios por defecto si no existen"""
@@ -2063,7 +4065,7 @@ def print_startup_info():
     print(f"📚 Colección de preguntas: {questions_collection.name}")
     
     # Mostrar materias disponibles
-    subjects = questions_collection.distinct('subject')
+    subjects = sorted(get_question_catalog())
     print(f"📝 Materias disponibles: {', '.join(subjects) if subjects else 'Ninguna'}")
     
     # Mostrar cuentas de prueba
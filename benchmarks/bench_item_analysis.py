@@ -0,0 +1,92 @@
+"""Benchmark: analisis de reactivos de un simulador con miles de intentos.
+
+Uso:
+    python benchmarks/bench_item_analysis.py
+
+No usa Mongo: genera BENCH_ATTEMPTS intentos sinteticos (por defecto 5000) de
+un simulador de BENCH_QUESTIONS preguntas (120) con 4 opciones, ya codificados
+como se guardan (``responses`` / ``response_ids``), y mide por separado:
+
+- ``matriz``: ``response_matrix`` (bytes guardados -> matriz intentos x preguntas);
+- ``analisis``: ``item_analysis`` (p, punto-biserial, distractores y KR-20).
+
+BENCH_ORDERS controla cuantos ordenes de preguntas distintos hay entre los
+intentos (1 = todos vieron el mismo examen). Reporta la mediana de BENCH_RUNS
+corridas.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator_grading import (  # noqa: E402
+    UNANSWERED,
+    AnswerKey,
+    item_analysis,
+    pack_question_ids,
+    response_matrix,
+)
+
+
+ATTEMPTS = int(os.getenv("BENCH_ATTEMPTS", "5000"))
+QUESTIONS = int(os.getenv("BENCH_QUESTIONS", "120"))
+ORDERS = max(1, int(os.getenv("BENCH_ORDERS", "1")))
+RUNS = int(os.getenv("BENCH_RUNS", "5"))
+SECTIONS = ["Matemáticas", "Español", "Química", "Biología", "Física", "Historia"]
+
+
+def build_fixture(rng):
+    questions = [
+        {
+            "_id": ObjectId(),
+            "has_options": True,
+            "options": ["a", "b", "c", "d"],
+            "correct_option": int(rng.integers(0, 4)),
+            "simulator_subject": SECTIONS[idx * len(SECTIONS) // QUESTIONS],
+        }
+        for idx in range(QUESTIONS)
+    ]
+    key = AnswerKey.from_questions(questions)
+    orders = [rng.permutation(QUESTIONS) for _ in range(ORDERS)]
+    packed_orders = [pack_question_ids(key.question_ids[i] for i in order) for order in orders]
+    # Habilidad por alumno: acierta con esa probabilidad, si no elige otra opcion o deja en blanco.
+    skill = rng.beta(4, 3, ATTEMPTS)
+    attempts = []
+    for row in range(ATTEMPTS):
+        order = orders[row % ORDERS]
+        correct = key.correct[order]
+        wrong = (correct + rng.integers(1, 4, QUESTIONS)) % 4
+        chosen = np.where(rng.random(QUESTIONS) < skill[row], correct, wrong).astype(np.uint8)
+        chosen[rng.random(QUESTIONS) < 0.03] = UNANSWERED
+        attempts.append((packed_orders[row % ORDERS], chosen.tobytes()))
+    return key, attempts
+
+
+def main():
+    rng = np.random.default_rng(7)
+    key, attempts = build_fixture(rng)
+    matrix_times, analysis_times = [], []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        choices, present = response_matrix(key, attempts)
+        built = time.perf_counter()
+        result = item_analysis(key, choices, present)
+        done = time.perf_counter()
+        matrix_times.append((built - started) * 1000)
+        analysis_times.append((done - built) * 1000)
+    flagged = sum(1 for item in result["items"] if item["flags"])
+    print(f"{ATTEMPTS} intentos x {QUESTIONS} preguntas, {ORDERS} orden(es), mediana de {RUNS} corridas")
+    print(f"  matriz    {statistics.median(matrix_times):8.1f} ms")
+    print(f"  analisis  {statistics.median(analysis_times):8.1f} ms")
+    print(f"  total     {statistics.median(m + a for m, a in zip(matrix_times, analysis_times)):8.1f} ms")
+    print(f"  KR-20={result['kr20']}  preguntas senaladas={flagged}")
+
+
+if __name__ == "__main__":
+    main()
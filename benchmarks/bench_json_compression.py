@@ -0,0 +1,109 @@
+"""Benchmark: serializacion JSON y compresion de respuestas grandes.
+
+Uso:
+    python benchmarks/bench_json_compression.py
+
+No necesita Mongo: arma paginas sinteticas de preguntas (con LaTeX largo,
+ObjectId y fechas como las devuelve pymongo) y mide por peticion, antes y
+despues de la capa de respuesta:
+
+- ``stdlib``: ``json.dumps`` con los ajustes de ``jsonify`` de Flask (antes).
+- ``FastJSONProvider``: orjson si esta instalado (despues).
+- bytes y CPU de gzip (niveles 1/6/9) y brotli (calidades 1/4/6) sobre el JSON.
+
+Variables: BENCH_SIZES (preguntas por respuesta, por defecto 50,200,2000) y
+BENCH_ITERATIONS.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import brotli, compress_body  # noqa: E402
+from fast_json import FastJSONProvider, orjson  # noqa: E402
+
+
+SIZES = [int(x) for x in os.getenv("BENCH_SIZES", "50,200,2000").split(",")]
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "20"))
+LATEX = [
+    r"\int_{0}^{\pi} \sin^{2}(x)\,dx",
+    r"\frac{-b \pm \sqrt{b^{2}-4ac}}{2a}",
+    r"\lim_{x \to \infty} \left(1 + \frac{1}{x}\right)^{x}",
+    r"\sum_{n=1}^{\infty} \frac{1}{n^{2}} = \frac{\pi^{2}}{6}",
+]
+
+
+def make_questions(size, rng):
+    base = datetime(2024, 1, 1)
+    questions = []
+    for i in range(size):
+        formula = rng.choice(LATEX)
+        questions.append({
+            "_id": ObjectId(),
+            "subject": rng.choice(["Matemáticas", "Física", "Química"]),
+            "topic": f"Tema {i % 30}",
+            "question": f"Calcula ${formula}$ y justifica cada paso del desarrollo ({i}).",
+            "has_options": True,
+            "options": [f"${formula} + {k}$" for k in range(4)],
+            "correct_option": i % 4,
+            "correct_answer": f"A. ${formula}$",
+            "solution": f"Aplicando la definición: ${formula}$. " * 3,
+            "university": "UNAM",
+            "created_at": base + timedelta(minutes=i),
+            "times_shown": rng.randint(0, 500),
+            "times_correct": rng.randint(0, 250),
+        })
+    return questions
+
+
+def stdlib_dumps(payload):
+    # Equivalente a jsonify de Flask 2.3: sort_keys, ensure_ascii y default propio.
+    def default(value):
+        if isinstance(value, ObjectId):
+            return str(value)
+        return DefaultJSONProvider.default(value)
+    return json.dumps(payload, default=default, ensure_ascii=True, sort_keys=True).encode("utf-8")
+
+
+def cpu_ms(fn, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        result = fn()
+    return (time.process_time() - start) * 1000 / iterations, result
+
+
+def main():
+    rng = random.Random(42)
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+    print(f"orjson: {'si' if orjson is not None else 'no'} | brotli: {'si' if brotli is not None else 'no'}")
+    for size in SIZES:
+        payload = {"success": True, "count": size, "questions": make_questions(size, rng)}
+        before_ms, before = cpu_ms(lambda: stdlib_dumps(payload), ITERATIONS)
+        after_ms, after = cpu_ms(lambda: provider.dumps(payload).encode("utf-8"), ITERATIONS)
+        print(f"\n{size} preguntas")
+        print(f"  stdlib json        {len(before):>10,} B  {before_ms:8.2f} ms/req")
+        print(f"  FastJSONProvider   {len(after):>10,} B  {after_ms:8.2f} ms/req  ({before_ms / after_ms:.1f}x)")
+
+        variants = [("gzip", level, {"gzip_level": level}) for level in (1, 6, 9)]
+        if brotli is not None:
+            variants += [("br", quality, {"brotli_quality": quality}) for quality in (1, 4, 6)]
+        for encoding, level, kwargs in variants:
+            ms, body = cpu_ms(lambda: compress_body(after, encoding, **kwargs), ITERATIONS)
+            print(
+                f"  {encoding:<4} nivel {level:<2}      {len(body):>10,} B  {ms:8.2f} ms/req"
+                f"  ({len(body) / len(after):.1%} del JSON)"
+            )
+
+
+if __name__ == "__main__":
+    main()
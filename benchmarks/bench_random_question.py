@@ -0,0 +1,81 @@
+"""Benchmark: pregunta aleatoria cargando todo vs muestreo por random_key.
+
+Uso:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_random_question.py
+
+Crea una base temporal (BENCH_DB, por defecto ``preguntas_bench``), la llena
+con bancos de distinto tamano y mide el costo por peticion de:
+
+- ``list_choice``: implementacion anterior (``list(find(query))`` + ``random.choice``).
+- ``sample_question``: lectura por indice de ``random_key``.
+
+El costo de ``sample_question`` debe mantenerse constante al crecer el banco.
+"""
+
+import os
+import random
+import sys
+import time
+
+from pymongo import ASCENDING, MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_sampling import RANDOM_KEY_FIELD, new_random_key, sample_question  # noqa: E402
+
+
+SIZES = [int(x) for x in os.getenv("BENCH_SIZES", "1000,10000,50000").split(",")]
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "50"))
+SUBJECTS = ["Matemáticas", "Física", "Química", "Biología"]
+
+
+def seed(collection, size):
+    collection.drop()
+    collection.create_index([("subject", ASCENDING), (RANDOM_KEY_FIELD, ASCENDING)])
+    collection.create_index([(RANDOM_KEY_FIELD, ASCENDING)])
+    batch = []
+    for i in range(size):
+        batch.append({
+            "subject": SUBJECTS[i % len(SUBJECTS)],
+            "topic": f"Tema {i % 25}",
+            "question": f"Pregunta {i} " + "x" * 300,
+            "options": ["A", "B", "C", "D"],
+            "correct_option": i % 4,
+            RANDOM_KEY_FIELD: new_random_key(),
+        })
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def time_per_call(fn):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    uri = os.getenv("MONGO_URI")
+    if not uri:
+        sys.exit("Define MONGO_URI para ejecutar el benchmark")
+    client = MongoClient(uri)
+    db = client[os.getenv("BENCH_DB", "preguntas_bench")]
+    collection = db["questions"]
+    query = {"subject": "Física"}
+
+    print(f"{'preguntas':>10} | {'list_choice ms':>14} | {'sample_question ms':>18}")
+    try:
+        for size in SIZES:
+            seed(collection, size)
+            old_ms = time_per_call(lambda: random.choice(list(collection.find(query))))
+            new_ms = time_per_call(lambda: sample_question(collection, query))
+            print(f"{size:>10} | {old_ms:>14.2f} | {new_ms:>18.2f}")
+    finally:
+        client.drop_database(db.name)
+
+
+if __name__ == "__main__":
+    main()
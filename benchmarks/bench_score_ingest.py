@@ -0,0 +1,175 @@
+"""Benchmark: 1,000 envios de puntaje simultaneos al cerrar un simulador.
+
+Uso:
+    BENCH_MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_score_ingest.py
+
+Usa una base desechable (BENCH_DB, por defecto ``bench_score_ingest``) que se
+borra al terminar. Compara, con BENCH_THREADS hilos enviando a la vez (por
+defecto 6 = 3 workers x 2 hilos de gunicorn):
+
+- ``antes``: el camino anterior de ``save_simulator_score`` por envio (lectura
+  del alumno, upsert en simulator_attempts, upsert en simulator_scores y
+  ``find_one`` del primer intento).
+- ``despues``: ``ScoreIngestor.submit`` (un insert con journal) y el drenado
+  por lotes con ``bulk_write``.
+
+Reporta latencia de confirmacion por envio (p50/p95/p99), tiempo total hasta
+confirmar los 1,000 y, para ``despues``, el tiempo hasta que todos quedaron
+aplicados. Con BENCH_MONGOMOCK=1 corre contra mongomock (solo para probar el
+script; los tiempos no son representativos).
+
+Variables: BENCH_SUBMISSIONS (1000), BENCH_THREADS (6), BENCH_REPEAT_RATE
+(fraccion de alumnos que envian dos veces, 0.1).
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from score_ingest import ScoreIngestor, submission_indexes  # noqa: E402
+
+
+SUBMISSIONS = int(os.getenv("BENCH_SUBMISSIONS", "1000"))
+THREADS = int(os.getenv("BENCH_THREADS", "6"))
+REPEAT_RATE = float(os.getenv("BENCH_REPEAT_RATE", "0.1"))
+SIMULATOR = "Simulacro final"
+
+
+def connect():
+    if os.getenv("BENCH_MONGOMOCK", "").strip() in ("1", "true", "yes"):
+        import mongomock
+        return mongomock.MongoClient()
+    return MongoClient(os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017"))
+
+
+def setup(db, students):
+    db.usuarios.insert_many(students)
+    for name in ("simulator_attempts", "simulator_scores"):
+        db[name].create_indexes([
+            IndexModel([("simulator", ASCENDING), ("user_id", ASCENDING)], unique=True, name=f"ux_{name}_simulator_user"),
+        ])
+    db.simulator_submissions.create_indexes(submission_indexes(3600))
+
+
+def make_submissions(students, rng):
+    submissions = []
+    for student in students:
+        uid = str(student["_id"])
+        submissions.append((uid, rng.randint(0, 120), 120))
+        if rng.random() < REPEAT_RATE:
+            submissions.append((uid, rng.randint(0, 120), 120))
+    return submissions[:SUBMISSIONS]
+
+
+def legacy_save(db, user_id, correct, total):
+    """Camino anterior de save_simulator_score (sin la parte HTTP)."""
+    user_doc = db.usuarios.find_one({"_id": ObjectId(user_id)})
+    user_name = f"{user_doc.get('nombre', '')} {user_doc.get('apellido', '')}".strip()
+    user_group = (user_doc.get("grupo") or "").strip()
+    now = datetime.now(timezone.utc)
+    first_filter = {"user_id": user_id, "simulator": SIMULATOR}
+    try:
+        attempt_write = db.simulator_attempts.update_one(
+            first_filter,
+            {"$setOnInsert": {
+                "user_id": user_id, "student_name": user_name or "Alumno", "student_group": user_group,
+                "simulator": SIMULATOR, "correct": correct, "total": total, "section_stats": {},
+                "finished_at": now, "created_at": now,
+            }},
+            upsert=True,
+        )
+    except Exception:
+        attempt_write = None
+    db.simulator_scores.update_one(
+        first_filter,
+        {
+            "$setOnInsert": {"user_id": user_id, "simulator": SIMULATOR, "correct": correct, "total": total, "created_at": now},
+            "$set": {"latest_correct": correct, "latest_total": total, "latest_section_stats": {},
+                     "latest_attempt_at": now, "updated_at": now},
+        },
+        upsert=True,
+    )
+    if not (attempt_write and attempt_write.upserted_id is not None):
+        db.simulator_attempts.find_one(first_filter, {"correct": 1, "total": 1})
+
+
+def resolver(db):
+    def resolve(user_ids):
+        ids = [ObjectId(uid) for uid in user_ids]
+        return {
+            str(doc["_id"]): {"name": f"{doc.get('nombre', '')} {doc.get('apellido', '')}".strip(), "group": doc.get("grupo", "")}
+            for doc in db.usuarios.find({"_id": {"$in": ids}})
+        }
+    return resolve
+
+
+def timed_burst(submissions, send):
+    latencies = []
+
+    def one(item):
+        start = time.perf_counter()
+        send(*item)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(one, submissions))
+    return (time.perf_counter() - start) * 1000, latencies
+
+
+def report(label, wall_ms, latencies):
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"  {label:<8} total {wall_ms:9.1f} ms | ack p50 {q[49]:7.2f} ms  p95 {q[94]:7.2f} ms  p99 {q[98]:7.2f} ms"
+    )
+
+
+def main():
+    rng = random.Random(7)
+    client = connect()
+    db_name = os.getenv("BENCH_DB", "bench_score_ingest")
+    students = [
+        {"_id": ObjectId(), "nombre": f"Alumno{i}", "apellido": "Prueba", "grupo": f"G{i % 12}", "rol": "alumno"}
+        for i in range(SUBMISSIONS)
+    ]
+    submissions = make_submissions(students, rng)
+    print(f"{len(submissions)} envios, {THREADS} hilos")
+    try:
+        client.drop_database(db_name)
+        db = client[db_name]
+        setup(db, students)
+        wall, latencies = timed_burst(submissions, lambda uid, c, t: legacy_save(db, uid, c, t))
+        report("antes", wall, latencies)
+        legacy_attempts = db.simulator_attempts.count_documents({})
+
+        client.drop_database(db_name)
+        db = client[db_name]
+        setup(db, students)
+        ingestor = ScoreIngestor(
+            db.simulator_submissions, db.simulator_attempts, db.simulator_scores,
+            resolve_students=resolver(db), flush_interval=0.2,
+        )
+        drain_start = time.perf_counter()
+        wall, latencies = timed_burst(submissions, lambda uid, c, t: ingestor.submit(uid, SIMULATOR, c, t, {}))
+        report("despues", wall, latencies)
+        while ingestor.pending_count():
+            time.sleep(0.05)
+        applied_ms = (time.perf_counter() - drain_start) * 1000
+        ingestor.close()
+        print(f"  despues  aplicados todos en {applied_ms:9.1f} ms desde el primer envio")
+        print(f"  intentos guardados: antes {legacy_attempts}, despues {db.simulator_attempts.count_documents({})}")
+    finally:
+        client.drop_database(db_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Compresion negociada (brotli / gzip) de las respuestas de la API.
+
+``init_compression(app)`` registra un ``after_request`` que comprime las
+respuestas de texto (JSON, HTML, CSS, JS, SVG) mayores a
+``COMPRESSION_MIN_SIZE`` bytes segun ``Accept-Encoding``: brotli si el
+cliente lo acepta y el paquete ``brotli`` esta instalado, si no gzip. No toca
+respuestas en streaming (exportaciones), 304, respuestas ya codificadas ni
+vistas marcadas con ``@skip_compression``.
+
+Para respuestas cacheadas, ``precompress`` comprime una vez por codificacion
+y ``precompressed_response`` sirve la variante que acepte el cliente sin
+volver a comprimir en cada peticion.
+
+Al comprimir, un ETag fuerte pasa a debil (``W/"..."``) como hace nginx: el
+cuerpo cambia con la codificacion, pero la comparacion de If-None-Match sigue
+funcionando con ``contains_weak``.
+
+Configuracion (``app.config``): COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE,
+COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY.
+"""
+
+from __future__ import annotations
+
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+DEFAULTS = {
+    "COMPRESSION_ENABLED": True,
+    "COMPRESSION_MIN_SIZE": 1024,
+    # gzip 6 y brotli 4: buena relacion tamano/CPU para respuestas dinamicas.
+    "COMPRESSION_GZIP_LEVEL": 6,
+    "COMPRESSION_BROTLI_QUALITY": 4,
+}
+
+
+def skip_compression(view):
+    """Excluye una vista de la compresion (p. ej. si el proxy ya comprime)."""
+    view._skip_compression = True
+    return view
+
+
+def available_encodings() -> list[str]:
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def choose_encoding(accept_encodings, options=None) -> str | None:
+    """Codificacion preferida por el cliente entre las disponibles ('br', 'gzip' o None)."""
+    if options is None:
+        options = available_encodings()
+    best, best_quality = None, 0
+    for encoding in options:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_body(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def precompress(data: bytes, config) -> dict[str, bytes]:
+    """Cuerpos ya comprimidos de ``data`` por codificacion, para respuestas cacheadas.
+
+    Solo incluye las codificaciones que reducen el tamano; vacio si la
+    compresion esta desactivada o ``data`` es menor que COMPRESSION_MIN_SIZE.
+    """
+    if not config.get("COMPRESSION_ENABLED", True):
+        return {}
+    if len(data) < int(config.get("COMPRESSION_MIN_SIZE", 1024)):
+        return {}
+    variants = {}
+    for encoding in available_encodings():
+        body = compress_body(
+            data,
+            encoding,
+            int(config.get("COMPRESSION_GZIP_LEVEL", 6)),
+            int(config.get("COMPRESSION_BROTLI_QUALITY", 4)),
+        )
+        if len(body) < len(data):
+            variants[encoding] = body
+    return variants
+
+
+def precompressed_response(data: bytes, variants: dict[str, bytes], mimetype: str = "application/json"):
+    """Respuesta con el cuerpo precomprimido que acepte el cliente (o ``data`` tal cual)."""
+    response = current_app.response_class(data, mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings, list(variants)) if variants else None
+    if encoding is not None:
+        response.set_data(variants[encoding])
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _view_opted_out() -> bool:
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    return bool(getattr(view, "_skip_compression", False))
+
+
+def compress_response(response):
+    config = current_app.config
+    if not config.get("COMPRESSION_ENABLED", True):
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or _view_opted_out():
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or request.method == "HEAD"
+    ):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < int(config.get("COMPRESSION_MIN_SIZE", 1024)):
+        return response
+    compressed = compress_body(
+        data,
+        encoding,
+        int(config.get("COMPRESSION_GZIP_LEVEL", 6)),
+        int(config.get("COMPRESSION_BROTLI_QUALITY", 4)),
+    )
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app) -> None:
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.after_request(compress_response)
@@ -0,0 +1,109 @@
+"""Caches en memoria de cada worker invalidadas por version.
+
+Cada escritura relevante incrementa un contador de version en Mongo
+(coleccion ``content_versions``). Las lecturas comparan la version guardada
+con la actual (una lectura por ``_id``) y solo reconstruyen el valor cuando
+cambio, asi todos los workers de gunicorn ven los cambios sin compartir
+memoria.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class VersionedCache:
+    """Valores por clave que se reconstruyen cuando cambia su version."""
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Any, build: Callable[[], Any]) -> Any:
+        """Devuelve el valor de ``key`` para ``version``, construyendolo si hace falta."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            value = build()
+            self._entries[key] = (version, value)
+            return value
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, Any]]:
+        """(version, valor) guardados para ``key`` sin validar la version."""
+        return self._entries.get(key)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class SizedLRUCache:
+    """Como ``VersionedCache`` pero con tope de memoria y expulsion LRU.
+
+    ``sizeof(valor)`` da los bytes que ocupa cada entrada; al pasar de
+    ``max_bytes`` se expulsan las menos usadas. Un valor mayor que el tope se
+    devuelve sin guardarse.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = len):
+        self.max_bytes = max(0, int(max_bytes))
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, version: Any, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = build()
+        size = int(self.sizeof(value))
+        with self._lock:
+            self._discard(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (version, value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    oldest = next(iter(self._entries))
+                    self._discard(oldest)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
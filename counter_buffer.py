@@ -0,0 +1,145 @@
+"""Buffer de escritura diferida para contadores de preguntas.
+
+Cada respuesta de practica y cada pregunta aleatoria servida incrementan
+``times_shown`` / ``times_correct``. En lugar de un ``update_one`` por evento,
+los incrementos se acumulan en memoria por ``_id`` y se escriben juntos con un
+``bulk_write`` no ordenado cuando se alcanza ``max_pending`` preguntas
+distintas o pasan ``flush_interval`` segundos. Un hilo daemon por worker hace
+el volcado periodico y ``close`` (registrado en ``atexit`` y en el hook
+``worker_exit`` de gunicorn) vacia lo pendiente al apagar.
+
+Con ``synchronous=True`` cada ``add`` se escribe en el momento; util en
+pruebas y scripts que leen los contadores justo despues.
+
+``derived_stages`` son etapas ``$set`` de pipeline que se aplican despues de
+los incrementos en la misma escritura, para campos calculados a partir de los
+contadores (p. ej. la dificultad).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional
+
+from pymongo import UpdateOne
+
+
+class CounterBuffer:
+    """Acumula ``$inc`` (y ``$set`` de ultimo valor) por documento."""
+
+    def __init__(
+        self,
+        collection,
+        max_pending: int = 500,
+        flush_interval: float = 2.0,
+        synchronous: bool = False,
+        on_flush: Optional[Callable[[Dict[Hashable, Dict[str, Any]], Any], None]] = None,
+        derived_stages: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.collection = collection
+        self.max_pending = max(1, int(max_pending))
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.synchronous = synchronous
+        self.on_flush = on_flush
+        self.derived_stages = list(derived_stages or [])
+        self._pending: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._closed = False
+
+    def add(self, _id: Hashable, inc: Mapping[str, int], set_fields: Optional[Mapping[str, Any]] = None) -> None:
+        """Suma ``inc`` al documento ``_id``; ``set_fields`` conserva el ultimo valor."""
+        with self._lock:
+            self._reset_after_fork()
+            entry = self._pending.setdefault(_id, {'$inc': {}, '$set': {}})
+            for field, amount in inc.items():
+                entry['$inc'][field] = entry['$inc'].get(field, 0) + amount
+            if set_fields:
+                entry['$set'].update(set_fields)
+            pending = len(self._pending)
+        if self.synchronous or self._closed:
+            self.flush()
+            return
+        # El hilo se arranca en toda ruta: tras un fork el primer volcado no debe esperar otro add.
+        self._ensure_thread()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Escribe lo acumulado; devuelve cuantos documentos se actualizaron."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            ops = [UpdateOne({'_id': _id}, self._update_for(entry)) for _id, entry in pending.items()]
+            try:
+                result = self.collection.bulk_write(ops, ordered=False)
+            except Exception as exc:
+                # Se devuelven al buffer para el siguiente intento.
+                self._merge_back(pending)
+                print(f"[counters] warning flushing {len(ops)} updates: {exc}")
+                return 0
+            if self.on_flush is not None:
+                try:
+                    self.on_flush(pending, result)
+                except Exception as exc:
+                    print(f"[counters] warning in on_flush: {exc}")
+            return result.matched_count
+
+    def close(self) -> None:
+        """Detiene el hilo y vacia lo pendiente (apagado del worker)."""
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+
+    def _update_for(self, entry: Dict[str, Any]):
+        if not self.derived_stages:
+            return {op: values for op, values in entry.items() if values}
+        # Pipeline: mismo efecto que $inc/$set y luego los campos derivados, atomico por documento.
+        stages = [{'$set': {
+            field: {'$add': [{'$ifNull': [f'${field}', 0]}, amount]}
+            for field, amount in entry['$inc'].items()
+        }}]
+        if entry['$set']:
+            stages.append({'$set': {field: {'$literal': value} for field, value in entry['$set'].items()}})
+        return stages + self.derived_stages
+
+    def _merge_back(self, pending: Dict[Hashable, Dict[str, Any]]) -> None:
+        with self._lock:
+            for _id, entry in pending.items():
+                current = self._pending.setdefault(_id, {'$inc': {}, '$set': {}})
+                for field, amount in entry['$inc'].items():
+                    current['$inc'][field] = current['$inc'].get(field, 0) + amount
+                # Un $set mas reciente ya acumulado tiene prioridad.
+                current['$set'] = {**entry['$set'], **current['$set']}
+
+    def _reset_after_fork(self) -> None:
+        # Los hilos no sobreviven a fork (gunicorn --preload): cada worker arranca el suyo.
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._thread = None
+            self._pending = {}
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='counter-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
@@ -0,0 +1,73 @@
+"""Resumen por grupo y seccion de un simulador (tablero del maestro).
+
+Cada simulador tiene un documento en ``simulator_dashboards`` con una entrada
+por ``student_group``: alumnos del grupo, intentos completados, tasa de
+finalizacion y promedio/mediana del porcentaje de aciertos, en total y por
+seccion. Las entradas viven en ``groups.<clave>`` (``group_key``: los nombres
+de grupo pueden traer ``.`` o ``$``), asi que al llegar intentos nuevos solo se
+recalculan y reemplazan los grupos afectados con un ``$set`` por campo, sin
+tocar el resto del documento.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+def group_key(group: str) -> str:
+    return hashlib.sha1((group or "").encode("utf-8")).hexdigest()[:16]
+
+
+def percent_summary(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not len(values):
+        return {"average": None, "median": None}
+    data = np.asarray(values, dtype=np.float64)
+    return {"average": round(float(data.mean()), 1), "median": round(float(np.median(data)), 1)}
+
+
+def summarize_group(
+    group: str,
+    attempts: Iterable[Mapping[str, Any]],
+    students: int,
+    section_stats: Callable[[Any], Dict[str, Dict[str, int]]],
+    section_sort_key: Callable[[str], Any] = str,
+) -> Dict[str, Any]:
+    """Entrada del tablero para un grupo a partir de sus intentos (correct, total, section_stats)."""
+    completed = 0
+    scores: List[float] = []
+    sections: Dict[str, List[float]] = {}
+    for attempt in attempts:
+        completed += 1
+        total = int(attempt.get("total") or 0)
+        if total > 0:
+            scores.append(100.0 * int(attempt.get("correct") or 0) / total)
+        for section, stats in section_stats(attempt.get("section_stats")).items():
+            if stats["total"] > 0:
+                sections.setdefault(section, []).append(100.0 * stats["correct"] / stats["total"])
+    return {
+        "group": group,
+        "students": int(students),
+        "completed": completed,
+        # Un alumno que cambio de grupo despues de presentar puede dejar la tasa arriba de 1.
+        "completion_rate": round(min(completed / students, 1.0), 4) if students else None,
+        "score": percent_summary(scores),
+        "sections": [
+            {"section": section, "attempts": len(values), **percent_summary(values)}
+            for section, values in sorted(sections.items(), key=lambda item: section_sort_key(item[0]))
+        ],
+    }
+
+
+def dashboard_totals(groups: Iterable[Mapping[str, Any]]) -> Dict[str, Any]:
+    students = completed = 0
+    for entry in groups:
+        students += entry["students"]
+        completed += entry["completed"]
+    return {
+        "students": students,
+        "completed": completed,
+        "completion_rate": round(min(completed / students, 1.0), 4) if students else None,
+    }
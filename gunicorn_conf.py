@@ -17,3 +17,13 @@ max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
 max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
 
 worker_tmp_dir = "/dev/shm" if os.path.exists("/dev/shm") else None
+
+
+def worker_exit(server, worker):
+    # Vacia los contadores de preguntas y aplica los envios de puntaje en cola antes de salir.
+    try:
+        from app import question_counters, score_ingestor
+    except Exception:
+        return
+    question_counters.close()
+    score_ingestor.close()
@@ -0,0 +1,66 @@
+"""Manifiesto en memoria de las imagenes locales (``static/img``).
+
+Las preguntas antiguas guardan solo el nombre de un archivo local. En lugar
+de un ``os.path.exists`` por pregunta en cada lectura, el worker mantiene el
+conjunto de nombres del directorio y solo lo vuelve a listar cuando cambia el
+``mtime`` del directorio (revisado a lo sumo cada ``check_interval``
+segundos). Agregar o borrar un archivo cambia el ``mtime`` del directorio, asi
+que el manifiesto se actualiza solo.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import FrozenSet, Optional
+
+
+class DirectoryManifest:
+    """Nombres de archivo de un directorio, recargados cuando este cambia."""
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._names: FrozenSet[str] = frozenset()
+        self._mtime_ns: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def names(self) -> FrozenSet[str]:
+        now = time.monotonic()
+        if self._mtime_ns is None or now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if self._mtime_ns is None or now - self._checked_at >= self.check_interval:
+                    self._refresh(now)
+        return self._names
+
+    @property
+    def version(self) -> Optional[int]:
+        """``mtime`` del directorio en el ultimo listado (sirve para ETags)."""
+        self.names()
+        return self._mtime_ns
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names()
+
+    def invalidate(self) -> None:
+        """Fuerza a listar el directorio en la siguiente consulta."""
+        with self._lock:
+            self._mtime_ns = None
+
+    def _refresh(self, now: float) -> None:
+        self._checked_at = now
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._names, self._mtime_ns = frozenset(), -1
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        try:
+            with os.scandir(self.path) as entries:
+                names = frozenset(entry.name for entry in entries if entry.is_file())
+        except OSError:
+            names = frozenset()
+        self._names, self._mtime_ns = names, mtime_ns
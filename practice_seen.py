@@ -0,0 +1,82 @@
+"""Conjunto compacto de preguntas ya vistas en una sesion de practica.
+
+Filtro de Bloom de tamano fijo (por defecto 8192 bits = 1 KB) que se guarda
+como binario en Mongo junto a la sesion. Con 4 funciones hash y 1,000
+preguntas vistas la tasa de falsos positivos ronda 2%: en el peor caso una
+pregunta no vista se omite en esa ronda, nunca se repite una ya vista.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+from typing import Iterable, List, Optional
+
+
+DEFAULT_NUM_BITS = 8192
+DEFAULT_NUM_HASHES = 4
+
+
+class SeenFilter:
+    """Filtro de Bloom sobre ids de pregunta (ObjectId o str)."""
+
+    def __init__(
+        self,
+        num_bits: int = DEFAULT_NUM_BITS,
+        num_hashes: int = DEFAULT_NUM_HASHES,
+        bits: Optional[bytes] = None,
+        count: int = 0,
+    ):
+        if num_bits <= 0 or num_bits % 8:
+            raise ValueError("num_bits debe ser positivo y multiplo de 8")
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray(num_bits // 8)
+        if len(self.bits) != num_bits // 8:
+            raise ValueError("bits no coincide con num_bits")
+        self.count = count
+
+    def _positions(self, item) -> List[int]:
+        digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, items: Iterable) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def false_positive_rate(self) -> float:
+        """Tasa estimada de falsos positivos con los elementos actuales."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def clear(self) -> None:
+        self.bits = bytearray(self.num_bits // 8)
+        self.count = 0
+
+    def to_document(self) -> dict:
+        return {
+            "bits": bytes(self.bits),
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_document(cls, doc: Optional[dict]) -> "SeenFilter":
+        if not doc or not doc.get("bits"):
+            return cls()
+        return cls(
+            num_bits=int(doc.get("num_bits", DEFAULT_NUM_BITS)),
+            num_hashes=int(doc.get("num_hashes", DEFAULT_NUM_HASHES)),
+            bits=bytes(doc["bits"]),
+            count=int(doc.get("count", 0)),
+        )
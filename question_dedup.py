@@ -0,0 +1,207 @@
+"""Deteccion de preguntas casi duplicadas con MinHash + LSH.
+
+Cada pregunta se reduce a un texto normalizado (minusculas, sin acentos ni
+signos) y a sus shingles de ``SHINGLE_SIZE`` caracteres. La firma MinHash
+(``NUM_PERM`` minimos de permutaciones hash) se guarda en la pregunta como
+binario y se parte en ``NUM_BANDS`` bandas; cada banda produce una clave
+``lsh_buckets`` con indice multikey. Dos preguntas son candidatas si
+comparten alguna banda, lo que se resuelve con un ``$in`` sobre el indice sin
+recorrer el banco; despues se confirma con la similitud estimada (fraccion de
+minimos iguales).
+
+Con 16 bandas de 4 filas, pares con Jaccard >= 0.8 coinciden en alguna banda
+con probabilidad > 99.9%, y pares con Jaccard 0.3 solo en ~12%.
+
+En matematicas dos preguntas pueden diferir solo en los datos ("2x + 3 = 7"
+contra "5x + 3 = 7") y compartir casi todos los shingles, asi que ademas se
+guarda un hash de la secuencia de numeros y solo se consideran duplicadas si
+coincide.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import struct
+import unicodedata
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+
+SIGNATURE_FIELD = "minhash"
+BUCKETS_FIELD = "lsh_buckets"
+NUMBERS_FIELD = "minhash_numbers"
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_SIGNATURE_FORMAT = f"<{NUM_PERM}I"
+
+
+def _permutations() -> List[Tuple[int, int]]:
+    # Coeficientes fijos (derivados de una semilla) para que las firmas sean estables entre procesos.
+    perms = []
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(f"minhash-perm-{i}".encode("ascii"), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % (_MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "little") % _MERSENNE_PRIME
+        perms.append((a, b))
+    return perms
+
+
+_PERMUTATIONS = _permutations()
+
+
+def normalize_text(text: str) -> str:
+    """Minusculas, sin acentos, sin comandos LaTeX ni signos; espacios colapsados."""
+    value = unicodedata.normalize("NFKD", str(text or "").lower())
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    value = re.sub(r"\\[a-z]+", " ", value)
+    value = re.sub(r"[^a-z0-9]+", " ", value)
+    return value.strip()
+
+
+def question_text(question: Mapping) -> str:
+    """Texto que identifica una pregunta: enunciado y opciones."""
+    parts = [question.get("question") or ""]
+    parts.extend(str(option or "") for option in (question.get("options") or []))
+    return " ".join(parts)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    normalized = normalize_text(text)
+    if not normalized:
+        return set()
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def minhash_signature(text: str) -> Optional[Tuple[int, ...]]:
+    """Firma MinHash de ``text`` (None si no hay texto util)."""
+    items = shingles(text)
+    if not items:
+        return None
+    hashes = [
+        int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little")
+        for item in items
+    ]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def numbers_key(text: str) -> str:
+    """Hash corto de los numeros del texto, en orden."""
+    numbers = re.findall(r"\d+", normalize_text(text))
+    return hashlib.blake2b(" ".join(numbers).encode("ascii"), digest_size=6).hexdigest()
+
+
+def lsh_buckets(signature: Sequence[int]) -> List[str]:
+    """Claves de banda (``"<banda>:<hash>"``) para el indice multikey."""
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f"<{ROWS_PER_BAND}I", *rows), digest_size=8).hexdigest()
+        buckets.append(f"{band}:{digest}")
+    return buckets
+
+
+def similarity(left: Sequence[int], right: Sequence[int]) -> float:
+    """Jaccard estimado: fraccion de posiciones iguales entre dos firmas."""
+    if not left or not right:
+        return 0.0
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+
+def encode_signature(signature: Sequence[int]) -> bytes:
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def decode_signature(raw) -> Optional[Tuple[int, ...]]:
+    if not raw or len(raw) != NUM_PERM * 4:
+        return None
+    return struct.unpack(_SIGNATURE_FORMAT, bytes(raw))
+
+
+def fingerprint_fields(question: Mapping) -> Dict:
+    """Campos ``minhash`` / ``lsh_buckets`` / ``minhash_numbers`` que se guardan en la pregunta."""
+    text = question_text(question)
+    signature = minhash_signature(text)
+    if signature is None:
+        return {SIGNATURE_FIELD: None, BUCKETS_FIELD: [], NUMBERS_FIELD: None}
+    return {
+        SIGNATURE_FIELD: encode_signature(signature),
+        BUCKETS_FIELD: lsh_buckets(signature),
+        NUMBERS_FIELD: numbers_key(text),
+    }
+
+
+class LSHIndex:
+    """Indice LSH en memoria (lotes de carga y escaneo del banco)."""
+
+    def __init__(self):
+        self._buckets: Dict[str, List] = {}
+        self._signatures: Dict = {}
+        self._numbers: Dict = {}
+
+    def add(
+        self,
+        key,
+        signature: Sequence[int],
+        buckets: Optional[Iterable[str]] = None,
+        numbers: Optional[str] = None,
+    ) -> None:
+        self._signatures[key] = signature
+        self._numbers[key] = numbers
+        for bucket in buckets if buckets is not None else lsh_buckets(signature):
+            self._buckets.setdefault(bucket, []).append(key)
+
+    def query(
+        self,
+        signature: Sequence[int],
+        threshold: float = DEFAULT_THRESHOLD,
+        buckets: Optional[Iterable[str]] = None,
+        numbers: Optional[str] = None,
+    ) -> List[Tuple[object, float]]:
+        """Claves con similitud >= ``threshold`` y los mismos numeros, de mayor a menor."""
+        candidates = set()
+        for bucket in buckets if buckets is not None else lsh_buckets(signature):
+            candidates.update(self._buckets.get(bucket, ()))
+        matches = []
+        for key in candidates:
+            if not self.same_numbers(numbers, self._numbers[key]):
+                continue
+            score = similarity(signature, self._signatures[key])
+            if score >= threshold:
+                matches.append((key, score))
+        matches.sort(key=lambda item: -item[1])
+        return matches
+
+    def candidate_pairs(self):
+        """Pares de claves que comparten alguna banda (sin repetir)."""
+        seen = set()
+        for keys in self._buckets.values():
+            if len(keys) < 2:
+                continue
+            for i, left in enumerate(keys):
+                for right in keys[i + 1:]:
+                    pair = (left, right) if str(left) < str(right) else (right, left)
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    def signature(self, key) -> Sequence[int]:
+        return self._signatures[key]
+
+    def numbers(self, key) -> Optional[str]:
+        return self._numbers[key]
+
+    @staticmethod
+    def same_numbers(left: Optional[str], right: Optional[str]) -> bool:
+        # Firmas antiguas sin hash de numeros se comparan solo por similitud.
+        return left is None or right is None or left == right
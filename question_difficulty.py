@@ -0,0 +1,105 @@
+"""Indice de dificultad de las preguntas.
+
+``difficulty`` es 1 menos la tasa de acierto suavizada con un prior
+(``PRIOR_WEIGHT`` respuestas ficticias con ``PRIOR_CORRECT_RATE`` de
+acierto): una pregunta nueva vale 0.5 y se mueve hacia su tasa real conforme
+acumula respuestas, sin saltar a 0 o 1 con las primeras.
+
+Para elegir preguntas por dificultad con el indice, ademas se guarda
+``difficulty_band`` (entero 0..``NUM_BANDS``-1). Una banda de dificultad se
+traduce en ``difficulty_band: {$in: [...]}``, que junto con ``random_key``
+permite el mismo muestreo por rango de ``question_sampling`` (Mongo recorre
+cada banda por el indice y mezcla por ``random_key``).
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+
+DIFFICULTY_FIELD = "difficulty"
+BAND_FIELD = "difficulty_band"
+PRIOR_WEIGHT = 10
+PRIOR_CORRECT_RATE = 0.5
+NUM_BANDS = 10
+# Niveles con nombre para ?difficulty= (rangos cerrados sobre difficulty).
+DIFFICULTY_LEVELS = {
+    "facil": (0.0, 0.35),
+    "media": (0.35, 0.65),
+    "dificil": (0.65, 1.0),
+}
+DIFFICULTY_ALIASES = {
+    "easy": "facil",
+    "fácil": "facil",
+    "medium": "media",
+    "medio": "media",
+    "hard": "dificil",
+    "difícil": "dificil",
+}
+
+
+def difficulty_score(times_shown: int, times_correct: int) -> float:
+    shown = max(int(times_shown or 0), 0)
+    correct = min(max(int(times_correct or 0), 0), shown)
+    rate = (correct + PRIOR_WEIGHT * PRIOR_CORRECT_RATE) / (shown + PRIOR_WEIGHT)
+    return 1.0 - rate
+
+
+def difficulty_band(score: float) -> int:
+    return min(NUM_BANDS - 1, max(0, int(math.floor(score * NUM_BANDS))))
+
+
+def difficulty_fields(times_shown: int = 0, times_correct: int = 0) -> Dict[str, Any]:
+    """``difficulty`` / ``difficulty_band`` para guardar en una pregunta."""
+    score = difficulty_score(times_shown, times_correct)
+    return {DIFFICULTY_FIELD: score, BAND_FIELD: difficulty_band(score)}
+
+
+def difficulty_pipeline_stages():
+    """Etapas de pipeline de update que recalculan la dificultad desde los contadores."""
+    shown = {"$max": [{"$ifNull": ["$times_shown", 0]}, 0]}
+    correct = {"$min": [{"$max": [{"$ifNull": ["$times_correct", 0]}, 0]}, shown]}
+    score = {
+        "$subtract": [
+            1,
+            {"$divide": [
+                {"$add": [correct, PRIOR_WEIGHT * PRIOR_CORRECT_RATE]},
+                {"$add": [shown, PRIOR_WEIGHT]},
+            ]},
+        ]
+    }
+    band = {"$min": [NUM_BANDS - 1, {"$max": [0, {"$floor": {"$multiply": [f"${DIFFICULTY_FIELD}", NUM_BANDS]}}]}]}
+    return [{"$set": {DIFFICULTY_FIELD: score}}, {"$set": {BAND_FIELD: band}}]
+
+
+def parse_difficulty_range(level: Optional[str], min_value=None, max_value=None) -> Optional[Tuple[float, float]]:
+    """Rango [min, max] a partir de un nivel con nombre o de limites numericos.
+
+    Lanza ValueError si los valores no son validos; None si no se pidio filtro.
+    """
+    level = (level or "").strip().lower()
+    if level and level not in ("todos", "all"):
+        key = DIFFICULTY_ALIASES.get(level, level)
+        if key not in DIFFICULTY_LEVELS:
+            raise ValueError(f"difficulty debe ser uno de: {', '.join(DIFFICULTY_LEVELS)}")
+        return DIFFICULTY_LEVELS[key]
+    if min_value in (None, "") and max_value in (None, ""):
+        return None
+    try:
+        low = float(min_value) if min_value not in (None, "") else 0.0
+        high = float(max_value) if max_value not in (None, "") else 1.0
+    except (TypeError, ValueError):
+        raise ValueError("min_difficulty/max_difficulty deben ser numeros entre 0 y 1")
+    if not (0.0 <= low <= high <= 1.0):
+        raise ValueError("min_difficulty/max_difficulty deben cumplir 0 <= min <= max <= 1")
+    return low, high
+
+
+def difficulty_query(low: float, high: float) -> Dict[str, Any]:
+    """Filtro indexable: bandas que cubren el rango mas el limite exacto."""
+    bands = list(range(difficulty_band(low), difficulty_band(high) + 1))
+    return {
+        BAND_FIELD: {"$in": bands},
+        DIFFICULTY_FIELD: {"$gte": low, "$lte": high},
+    }
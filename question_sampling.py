@@ -0,0 +1,154 @@
+"""Muestreo aleatorio de preguntas respaldado por indice.
+
+Cada pregunta guarda ``random_key`` (float uniforme en [0, 1)). Para elegir
+una pregunta se genera un pivote aleatorio y se toma el primer documento con
+``random_key >= pivote`` segun el indice; si no hay ninguno se da la vuelta y
+se toma el primero desde 0. Cada consulta lee un solo documento sin importar
+el tamano del banco.
+
+El reparto de claves no es perfectamente uniforme (una pregunta tras un hueco
+grande sale mas seguido), por eso ``reshuffle_update`` devuelve un ``$set``
+con una clave nueva para la pregunta servida: el sesgo se corrige solo con el
+uso. Los documentos antiguos sin clave se cubren con ``$sample``.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from pymongo import ASCENDING, UpdateOne
+
+
+RANDOM_KEY_FIELD = "random_key"
+
+
+def new_random_key(rng: Optional[random.Random] = None) -> float:
+    """Clave aleatoria para una pregunta nueva."""
+    return (rng or random).random()
+
+
+def reshuffle_update(rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """``$set`` que reasigna la clave de una pregunta ya servida."""
+    return {RANDOM_KEY_FIELD: new_random_key(rng)}
+
+
+def _with_key_range(query: Mapping[str, Any], key_range: Dict[str, float]) -> Dict[str, Any]:
+    clause = {RANDOM_KEY_FIELD: key_range}
+    if not query:
+        return clause
+    return {"$and": [dict(query), clause]}
+
+
+def sample_question(
+    collection,
+    query: Optional[Mapping[str, Any]] = None,
+    projection: Optional[Mapping[str, Any]] = None,
+    rng: Optional[random.Random] = None,
+) -> Optional[Dict[str, Any]]:
+    """Devuelve una pregunta aleatoria que cumple ``query`` o None.
+
+    Hace a lo sumo dos lecturas de un documento por el indice de
+    ``random_key`` y, solo si ninguna pregunta tiene clave, un ``$sample``.
+    """
+    query = query or {}
+    pivot = (rng or random).random()
+    sort = [(RANDOM_KEY_FIELD, ASCENDING)]
+
+    doc = collection.find_one(_with_key_range(query, {"$gte": pivot}), projection, sort=sort)
+    if doc is None:
+        # Vuelta al inicio del rango [0, pivote).
+        doc = collection.find_one(_with_key_range(query, {"$lt": pivot}), projection, sort=sort)
+    if doc is not None:
+        return doc
+
+    # Preguntas sin random_key (anteriores al backfill).
+    pipeline = [{"$match": dict(query)}, {"$sample": {"size": 1}}]
+    if projection:
+        pipeline.append({"$project": dict(projection)})
+    for legacy in collection.aggregate(pipeline):
+        return legacy
+    return None
+
+
+def default_max_scan(k: int) -> int:
+    """Documentos que ``sample_questions`` lee como maximo si no se indica otro tope."""
+    return max(k * 20, 200)
+
+
+def sample_questions(
+    collection,
+    query: Optional[Mapping[str, Any]],
+    k: int,
+    exclude: Optional[Callable[[Any], bool]] = None,
+    projection: Optional[Mapping[str, Any]] = None,
+    rng: Optional[random.Random] = None,
+    max_scan: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Devuelve hasta ``k`` preguntas distintas que cumplen ``query``.
+
+    Recorre el indice de ``random_key`` desde un pivote aleatorio (con vuelta
+    al inicio) en ventanas pequenas y descarta los ``_id`` para los que
+    ``exclude`` devuelve True. ``max_scan`` acota cuantos documentos se leen
+    cuando casi todo el banco esta excluido.
+
+    ``random_key`` cambia mientras se recorre (``reshuffle_many`` y los
+    contadores), asi que un documento puede aparecer en las dos vueltas; los
+    repetidos se saltan por ``_id``.
+    """
+    if k <= 0:
+        return []
+    query = query or {}
+    if projection is not None:
+        projection = dict(projection)
+        projection[RANDOM_KEY_FIELD] = 1
+    pivot = (rng or random).random()
+    sort = [(RANDOM_KEY_FIELD, ASCENDING)]
+    window = max(k * 4, 20)
+    max_scan = max_scan or default_max_scan(k)
+
+    picked: List[Dict[str, Any]] = []
+    seen_ids = set()
+    scanned = 0
+    for key_range in ({"$gte": pivot}, {"$lt": pivot}):
+        last_key = None
+        while len(picked) < k and scanned < max_scan:
+            current_range = dict(key_range)
+            if last_key is not None:
+                current_range.pop("$gte", None)
+                current_range["$gt"] = last_key
+            docs = list(
+                collection.find(_with_key_range(query, current_range), projection, sort=sort).limit(window)
+            )
+            for doc in docs:
+                scanned += 1
+                if doc["_id"] in seen_ids:
+                    continue
+                seen_ids.add(doc["_id"])
+                if exclude is not None and exclude(doc["_id"]):
+                    continue
+                picked.append(doc)
+                if len(picked) >= k:
+                    break
+            if len(docs) < window:
+                break
+            last_key = docs[-1].get(RANDOM_KEY_FIELD)
+        if len(picked) >= k or scanned >= max_scan:
+            break
+    return picked
+
+
+def reshuffle_many(collection, ids, rng: Optional[random.Random] = None) -> None:
+    """Reasigna ``random_key`` a varias preguntas servidas en un solo bulk_write."""
+    ops = [UpdateOne({"_id": _id}, {"$set": reshuffle_update(rng)}) for _id in ids]
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+
+
+def backfill_random_keys(collection) -> int:
+    """Asigna ``random_key`` a las preguntas que no lo tienen. Idempotente."""
+    result = collection.update_many(
+        {RANDOM_KEY_FIELD: {"$exists": False}},
+        [{"$set": {RANDOM_KEY_FIELD: {"$rand": {}}}}],
+    )
+    return result.modified_count
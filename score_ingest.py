@@ -0,0 +1,293 @@
+"""Ingesta de puntajes de simulador con escritura diferida.
+
+Al cerrar un simulador todo el grupo envia su puntaje en el mismo minuto.
+``ScoreIngestor.submit`` solo inserta el envio en una coleccion de solo
+anexado (``simulator_submissions``) con journal, y responde: el envio ya es
+durable aunque el worker muera. Un hilo daemon por worker reclama lotes de
+envios pendientes y los aplica con un ``bulk_write`` sobre
+``simulator_attempts`` y otro sobre ``simulator_scores``; los nombres y grupos
+de los alumnos del lote se resuelven con una sola consulta.
+
+Las escrituras son updates de pipeline que no dependen del orden en que se
+apliquen los lotes (varios workers pueden drenar a la vez):
+
+- el intento y el primer puntaje se reemplazan solo por un envio mas antiguo
+  (gana el primer intento, como antes con ``$setOnInsert``);
+- ``latest_*`` se reemplaza solo por un envio mas reciente.
+
+Los envios reclamados por un worker que murio vuelven a la cola despues de
+``claim_timeout`` segundos; reaplicarlos es idempotente. Con
+``synchronous=True`` cada envio se aplica en el momento (pruebas y scripts).
+
+``on_apply`` recibe, despues de cada lote, el primer envio de cada
+(alumno, simulador) del lote, ya con nombre y grupo resueltos; sirve para
+invalidar caches o actualizar resumenes que dependen de los intentos.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+# Fecha centinela para comparar contra campos que aun no existen.
+_FAR_FUTURE = datetime(9999, 12, 31, tzinfo=timezone.utc)
+_FAR_PAST = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_DUPLICATE_KEY = 11000
+
+ATTEMPT_FIELDS = (
+    "user_id", "student_name", "student_group", "simulator",
+    "correct", "total", "section_stats", "finished_at", "created_at",
+    "responses", "response_ids",
+)
+
+
+def submission_indexes(done_ttl_seconds: int) -> List[IndexModel]:
+    return [
+        IndexModel([("status", ASCENDING), ("submitted_at", ASCENDING)], name="ix_submissions_status_submitted"),
+        IndexModel([("claimed_by", ASCENDING)], name="ix_submissions_claimed_by"),
+        # Los envios aplicados se conservan un tiempo para auditoria y luego se borran solos.
+        IndexModel([("processed_at", ASCENDING)], expireAfterSeconds=done_ttl_seconds, name="ttl_submissions_processed"),
+    ]
+
+
+def _keep_if(condition, value, field):
+    """Expresion de pipeline: ``value`` si se cumple ``condition``, si no el valor guardado."""
+    return {"$cond": [condition, {"$literal": value}, f"${field}"]}
+
+
+def attempt_update(first: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """Upsert del intento: se queda con el envio mas antiguo visto hasta ahora."""
+    at = first["submitted_at"]
+    older = {"$lt": [at, {"$ifNull": ["$finished_at", _FAR_FUTURE]}]}
+    values = {
+        "user_id": first["user_id"],
+        "student_name": first.get("student_name") or "Alumno",
+        "student_group": first.get("student_group") or "",
+        "simulator": first["simulator"],
+        "correct": first["correct"],
+        "total": first["total"],
+        "section_stats": first.get("section_stats") or {},
+        "finished_at": at,
+        "created_at": at,
+        # Respuestas compactas (simulator_grading) para poder recalificar; None en clientes viejos.
+        "responses": first.get("responses"),
+        "response_ids": first.get("response_ids"),
+    }
+    return [{"$set": {field: _keep_if(older, values[field], field) for field in ATTEMPT_FIELDS}}]
+
+
+def score_update(first: Mapping[str, Any], latest: Mapping[str, Any], now: datetime) -> List[Dict[str, Any]]:
+    """Upsert del puntaje: primer intento fijo y ``latest_*`` del envio mas reciente."""
+    older = {"$lt": [first["submitted_at"], {"$ifNull": ["$created_at", _FAR_FUTURE]}]}
+    newer = {"$gte": [latest["submitted_at"], {"$ifNull": ["$latest_attempt_at", _FAR_PAST]}]}
+    first_values = {
+        "user_id": first["user_id"],
+        "simulator": first["simulator"],
+        "correct": first["correct"],
+        "total": first["total"],
+        "created_at": first["submitted_at"],
+    }
+    latest_values = {
+        "latest_correct": latest["correct"],
+        "latest_total": latest["total"],
+        "latest_section_stats": latest.get("section_stats") or {},
+        "latest_attempt_at": latest["submitted_at"],
+        "latest_responses": latest.get("responses"),
+        "latest_response_ids": latest.get("response_ids"),
+    }
+    fields = {field: _keep_if(older, value, field) for field, value in first_values.items()}
+    fields.update({field: _keep_if(newer, value, field) for field, value in latest_values.items()})
+    fields["updated_at"] = {"$literal": now}
+    return [{"$set": fields}]
+
+
+class ScoreIngestor:
+    """Cola durable de envios de puntaje con aplicacion por lotes."""
+
+    def __init__(
+        self,
+        submissions,
+        attempts,
+        scores,
+        resolve_students: Callable[[Iterable[str]], Dict[str, Dict[str, str]]],
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        claim_timeout: float = 60.0,
+        synchronous: bool = False,
+        on_apply: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
+        # j=True: el envio esta en el journal antes de responder al alumno.
+        self.submissions = submissions.with_options(write_concern=WriteConcern(w=1, j=True))
+        self.attempts = attempts
+        self.scores = scores
+        self.resolve_students = resolve_students
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.claim_timeout = max(1.0, float(claim_timeout))
+        self.synchronous = synchronous
+        self.on_apply = on_apply
+        self._wakeup = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._closed = False
+
+    def submit(self, user_id: str, simulator: str, correct: int, total: int,
+               section_stats: Mapping[str, Any], student_name: str = "",
+               responses: Optional[Tuple[bytes, bytes]] = None) -> Any:
+        """Guarda el envio (durable) y devuelve su ``_id``; la aplicacion es asincrona.
+
+        ``responses`` es el par (responses, response_ids) de ``simulator_grading``.
+        """
+        now = datetime.now(timezone.utc)
+        doc = {
+            "user_id": user_id,
+            "simulator": simulator,
+            "correct": int(correct),
+            "total": int(total),
+            "section_stats": dict(section_stats or {}),
+            "student_name": student_name or "",
+            "status": STATUS_PENDING,
+            "submitted_at": now,
+        }
+        if responses is not None:
+            doc["responses"], doc["response_ids"] = responses
+        result = self.submissions.insert_one(doc)
+        if self.synchronous or self._closed:
+            self.drain()
+        else:
+            self._ensure_thread()
+            self._wakeup.set()
+        return result.inserted_id
+
+    def drain(self, max_batches: Optional[int] = None) -> int:
+        """Aplica envios pendientes por lotes; devuelve cuantos se procesaron."""
+        processed = 0
+        batches = 0
+        with self._drain_lock:
+            while max_batches is None or batches < max_batches:
+                batch = self._claim()
+                if not batch:
+                    break
+                try:
+                    self._apply(batch)
+                except Exception as exc:
+                    # Quedan en 'processing' y se reintentan al vencer claim_timeout.
+                    print(f"[scores] warning applying {len(batch)} submissions: {exc}")
+                    break
+                processed += len(batch)
+                batches += 1
+                if len(batch) < self.batch_size:
+                    break
+        return processed
+
+    def pending_count(self) -> int:
+        return self.submissions.count_documents({"status": {"$in": [STATUS_PENDING, STATUS_PROCESSING]}})
+
+    def close(self) -> None:
+        """Detiene el hilo y aplica lo pendiente (apagado del worker)."""
+        self._closed = True
+        self._wakeup.set()
+        self.drain()
+
+    def _claim(self) -> List[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(seconds=self.claim_timeout)
+        claimable = {"$or": [
+            {"status": STATUS_PENDING},
+            {"status": STATUS_PROCESSING, "claimed_at": {"$lt": stale}},
+        ]}
+        ids = [
+            doc["_id"] for doc in
+            self.submissions.find(claimable, {"_id": 1}).sort("submitted_at", ASCENDING).limit(self.batch_size)
+        ]
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        # El filtro repite la condicion: otro worker pudo reclamar alguno entre find y update.
+        self.submissions.update_many(
+            {"_id": {"$in": ids}, **claimable},
+            {"$set": {"status": STATUS_PROCESSING, "claimed_by": token, "claimed_at": now}},
+        )
+        return list(self.submissions.find({"claimed_by": token}))
+
+    def _apply(self, batch: List[Dict[str, Any]]) -> None:
+        now = datetime.now(timezone.utc)
+        students = self.resolve_students({doc["user_id"] for doc in batch if doc.get("user_id")})
+        first: Dict[tuple, Dict[str, Any]] = {}
+        latest: Dict[tuple, Dict[str, Any]] = {}
+        for doc in sorted(batch, key=lambda d: d["submitted_at"]):
+            info = students.get(str(doc.get("user_id")), {})
+            doc["student_name"] = doc.get("student_name") or info.get("name") or ""
+            doc["student_group"] = info.get("group") or ""
+            key = (doc.get("user_id"), doc["simulator"])
+            first.setdefault(key, doc)
+            latest[key] = doc
+
+        attempt_ops = [
+            UpdateOne({"user_id": user_id, "simulator": simulator}, attempt_update(doc), upsert=True)
+            for (user_id, simulator), doc in first.items()
+        ]
+        score_ops = [
+            UpdateOne({"user_id": user_id, "simulator": simulator}, score_update(doc, latest[(user_id, simulator)], now), upsert=True)
+            for (user_id, simulator), doc in first.items()
+        ]
+        self._bulk_upsert(self.attempts, attempt_ops)
+        self._bulk_upsert(self.scores, score_ops)
+        self.submissions.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in batch]}},
+            {"$set": {"status": STATUS_DONE, "processed_at": now}, "$unset": {"claimed_by": ""}},
+        )
+        if self.on_apply is not None:
+            try:
+                self.on_apply(list(first.values()))
+            except Exception as exc:
+                print(f"[scores] warning in on_apply: {exc}")
+
+    @staticmethod
+    def _bulk_upsert(collection, ops: List[UpdateOne]) -> None:
+        if not ops:
+            return
+        try:
+            collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as exc:
+            # Dos upserts simultaneos de la misma clave: el segundo choca con el indice unico
+            # y al reintentarlo ya encuentra el documento y aplica la misma regla.
+            errors = exc.details.get("writeErrors", [])
+            if not errors or any(err.get("code") != _DUPLICATE_KEY for err in errors):
+                raise
+            collection.bulk_write([ops[err["index"]] for err in errors], ordered=False)
+
+    def _reset_after_fork(self) -> None:
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._thread = None
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            self._reset_after_fork()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="score-ingest", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.drain()
+            except Exception as exc:
+                print(f"[scores] warning draining submissions: {exc}")
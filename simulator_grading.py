@@ -0,0 +1,341 @@
+"""Calificacion vectorizada de simuladores con NumPy.
+
+Cada intento guarda sus respuestas de forma compacta:
+
+- ``response_ids``: los ``_id`` de las preguntas en el orden del examen, como
+  bytes concatenados (12 por pregunta);
+- ``responses``: un byte por pregunta (uint8) con la opcion elegida,
+  ``OPEN_ANSWERED`` si una pregunta abierta tiene texto o ``UNANSWERED``.
+
+``AnswerKey`` es la clave de respuestas de un simulador en arreglos (valor
+correcto y seccion por pregunta). Con ella, ``response_matrix`` arma la matriz
+intentos x preguntas y ``grade`` calcula aciertos, totales y estadisticas por
+seccion de todos los intentos a la vez. La regla es la del cliente: una
+pregunta con opciones es correcta si la opcion coincide y una abierta si tiene
+respuesta; una pregunta sin seccion cuenta en ``General``, y el total siempre
+es la clave completa.
+
+``grade_submission`` califica un solo envio contra la clave completa (el
+servidor es la autoridad: las preguntas que no se enviaron cuentan como sin
+responder); con el orden de preguntas ya visto son unas pocas operaciones
+vectoriales de microsegundos.
+
+``item_analysis`` calcula sobre la misma matriz las estadisticas clasicas de
+cada pregunta: indice de dificultad (p), discriminacion punto-biserial
+contra el puntaje del resto del examen, frecuencia de cada opcion
+(distractores) y la confiabilidad KR-20 del examen.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+UNANSWERED = 255
+OPEN_ANSWERED = 254
+MAX_OPTION = 253
+# correct_option invalido (-1): ninguna respuesta coincide.
+NEVER_CORRECT = -1
+DEFAULT_SECTION = "General"
+MAX_RESPONSES = 1000
+# Umbrales para senalar preguntas a revisar en el analisis de reactivos.
+EASY_P_VALUE = 0.9
+HARD_P_VALUE = 0.2
+LOW_DISCRIMINATION = 0.2
+UNUSED_DISTRACTOR_RATE = 0.02
+_ID_SIZE = 12
+
+
+def encode_choice(answer: Any) -> int:
+    if answer is None or isinstance(answer, bool):
+        return UNANSWERED
+    if isinstance(answer, float) and answer.is_integer():
+        answer = int(answer)
+    if isinstance(answer, int):
+        return answer if 0 <= answer <= MAX_OPTION else UNANSWERED
+    if isinstance(answer, str):
+        return OPEN_ANSWERED if answer.strip() else UNANSWERED
+    return UNANSWERED
+
+
+def encode_responses(answers: Sequence[Any]) -> bytes:
+    return np.fromiter((encode_choice(a) for a in answers), dtype=np.uint8, count=len(answers)).tobytes()
+
+
+def decode_responses(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def pack_question_ids(question_ids: Iterable[Any]) -> bytes:
+    """Lanza ValueError si algun id no es un ObjectId valido."""
+    packed = []
+    for value in question_ids:
+        if not ObjectId.is_valid(value):
+            raise ValueError(f"id de pregunta invalido: {value!r}")
+        packed.append(ObjectId(value).binary)
+    return b"".join(packed)
+
+
+def unpack_question_ids(data: bytes) -> List[ObjectId]:
+    return [ObjectId(data[i:i + _ID_SIZE]) for i in range(0, len(data), _ID_SIZE)]
+
+
+def parse_submitted_responses(answers: Any, question_ids: Any) -> Optional[Tuple[bytes, bytes]]:
+    """(responses, response_ids) a partir del JSON del cliente; None si no se enviaron.
+
+    Lanza ValueError si las listas no son validas.
+    """
+    if answers is None and question_ids is None:
+        return None
+    if not isinstance(answers, list) or not isinstance(question_ids, list):
+        raise ValueError("responses y question_ids deben ser listas")
+    if len(answers) != len(question_ids):
+        raise ValueError("responses y question_ids deben tener la misma longitud")
+    if len(answers) > MAX_RESPONSES:
+        raise ValueError(f"Maximo {MAX_RESPONSES} respuestas por intento")
+    return encode_responses(answers), pack_question_ids(question_ids)
+
+
+class AnswerKey:
+    """Clave de respuestas de un simulador: valor correcto y seccion por pregunta."""
+
+    __slots__ = (
+        "question_ids", "correct", "option_counts", "section_index", "sections", "one_hot", "section_totals",
+        "_columns", "_layouts",
+    )
+
+    def __init__(self, question_ids: List[ObjectId], correct: np.ndarray, section_index: np.ndarray,
+                 sections: List[str], option_counts: Optional[np.ndarray] = None):
+        self.question_ids = question_ids
+        self.correct = correct
+        # Numero de opciones por pregunta (0 en abiertas).
+        self.option_counts = option_counts if option_counts is not None else np.zeros(len(question_ids), dtype=np.int16)
+        self.section_index = section_index
+        self.sections = sections
+        self.one_hot = np.zeros((len(question_ids), len(sections)), dtype=np.int32)
+        self.one_hot[np.arange(len(question_ids)), section_index] = 1
+        self.section_totals = self.one_hot.sum(axis=0)
+        self._columns = {oid.binary: idx for idx, oid in enumerate(question_ids)}
+        self._layouts: Dict[bytes, np.ndarray] = {}
+
+    @classmethod
+    def from_questions(cls, questions: Iterable[Mapping[str, Any]], normalize_section: Callable[[str], str] = str.strip):
+        """``questions`` en el orden del simulador (``_id``, has_options, correct_option, simulator_subject)."""
+        ids, correct, option_counts, section_index, sections, section_pos = [], [], [], [], [], {}
+        for question in questions:
+            if question.get("has_options"):
+                try:
+                    value = int(question.get("correct_option", NEVER_CORRECT))
+                except (TypeError, ValueError):
+                    value = NEVER_CORRECT
+                options = question.get("options") or []
+                if not 0 <= value < max(len(options), 1) or value > MAX_OPTION:
+                    value = NEVER_CORRECT
+                option_counts.append(min(len(options), MAX_OPTION + 1))
+            else:
+                value = OPEN_ANSWERED
+                option_counts.append(0)
+            section = normalize_section(question.get("simulator_subject") or "") or DEFAULT_SECTION
+            if section not in section_pos:
+                section_pos[section] = len(sections)
+                sections.append(section)
+            ids.append(question["_id"])
+            correct.append(value)
+            section_index.append(section_pos[section])
+        return cls(
+            ids,
+            np.array(correct, dtype=np.int16),
+            np.array(section_index, dtype=np.intp),
+            sections or [DEFAULT_SECTION],
+            np.array(option_counts, dtype=np.int16),
+        )
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria aproximada de la clave (para cachearla con tope de bytes)."""
+        return (
+            self.correct.nbytes + self.option_counts.nbytes + self.section_index.nbytes + self.one_hot.nbytes
+            + len(self.question_ids) * 96 + sum(layout.nbytes for layout in self._layouts.values())
+        )
+
+    def columns_for(self, packed_ids: bytes) -> np.ndarray:
+        """Columna de la clave de cada pregunta del intento (-1 si ya no existe)."""
+        layout = self._layouts.get(packed_ids)
+        if layout is None:
+            layout = np.fromiter(
+                (self._columns.get(packed_ids[i:i + _ID_SIZE], -1) for i in range(0, len(packed_ids), _ID_SIZE)),
+                dtype=np.intp,
+            )
+            # Casi todos los intentos comparten el mismo orden de preguntas.
+            if len(self._layouts) < 64:
+                self._layouts[packed_ids] = layout
+        return layout
+
+
+def response_matrix(key: AnswerKey, attempts: Sequence[Tuple[bytes, bytes]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Matriz de opciones (uint8) y de preguntas presentes (bool), intentos x preguntas de la clave.
+
+    ``attempts`` son pares (response_ids, responses). Los intentos con el mismo
+    orden de preguntas se copian juntos con indexado de NumPy.
+    """
+    choices = np.full((len(attempts), len(key)), UNANSWERED, dtype=np.uint8)
+    present = np.zeros((len(attempts), len(key)), dtype=bool)
+    groups: Dict[bytes, List[int]] = {}
+    for row, (packed_ids, _) in enumerate(attempts):
+        groups.setdefault(packed_ids, []).append(row)
+    for packed_ids, rows in groups.items():
+        columns = key.columns_for(packed_ids)
+        known = columns >= 0
+        if not known.any():
+            continue
+        block = np.stack([decode_responses(attempts[row][1])[:len(columns)] for row in rows])
+        if block.shape[1] < len(columns):
+            # Respuestas truncadas: lo que falta cuenta como sin responder.
+            block = np.pad(block, ((0, 0), (0, len(columns) - block.shape[1])), constant_values=UNANSWERED)
+        rows_idx = np.asarray(rows, dtype=np.intp)[:, None]
+        choices[rows_idx, columns[known]] = block[:, known]
+        present[rows_idx, columns[known]] = True
+    return choices, present
+
+
+def grade(key: AnswerKey, choices: np.ndarray, present: np.ndarray) -> Dict[str, np.ndarray]:
+    """Aciertos y totales por intento y por seccion (columnas en ``key.sections``).
+
+    Misma regla que ``grade_submission``: el total es toda la clave y una
+    pregunta que el intento no presento cuenta como sin responder.
+    """
+    hits = (choices.astype(np.int16) == key.correct) & present
+    rows = len(choices)
+    return {
+        "correct": hits.sum(axis=1),
+        "total": np.full(rows, len(key), dtype=np.int64),
+        "section_correct": hits.astype(np.int32) @ key.one_hot,
+        "section_total": np.broadcast_to(key.section_totals, (rows, len(key.sections))),
+        "hits": hits,
+    }
+
+
+def grade_submission(key: AnswerKey, packed_ids: bytes, responses: bytes) -> Dict[str, Any]:
+    """Califica un envio contra todas las preguntas de la clave.
+
+    ``hits`` va en el orden del envio (False para preguntas que ya no estan en
+    la clave); ``correct``/``total``/``section_stats`` cuentan toda la clave.
+    """
+    columns = key.columns_for(packed_ids)
+    submitted = decode_responses(responses)[:len(columns)]
+    if len(submitted) < len(columns):
+        submitted = np.pad(submitted, (0, len(columns) - len(submitted)), constant_values=UNANSWERED)
+    known = columns >= 0
+    choices = np.full(len(key), UNANSWERED, dtype=np.uint8)
+    choices[columns[known]] = submitted[known]
+    hits = choices.astype(np.int16) == key.correct
+    section_correct = np.bincount(key.section_index, weights=hits, minlength=len(key.sections))
+    submitted_hits = np.zeros(len(columns), dtype=bool)
+    submitted_hits[known] = hits[columns[known]]
+    return {
+        "correct": int(hits.sum()),
+        "total": len(key),
+        "section_stats": section_stats(key, section_correct, key.section_totals),
+        "hits": submitted_hits,
+        "columns": columns,
+    }
+
+
+def section_stats(key: AnswerKey, section_correct: np.ndarray, section_total: np.ndarray) -> Dict[str, Dict[str, int]]:
+    return {
+        key.sections[j]: {"correct": int(section_correct[j]), "total": int(section_total[j])}
+        for j in np.flatnonzero(section_total)
+    }
+
+
+def section_stats_row(key: AnswerKey, graded: Mapping[str, np.ndarray], row: int) -> Dict[str, Dict[str, int]]:
+    return section_stats(key, graded["section_correct"][row], graded["section_total"][row])
+
+
+def _ratio(value: Any) -> Optional[float]:
+    value = float(value)
+    return round(value, 4) if np.isfinite(value) else None
+
+
+def item_analysis(key: AnswerKey, choices: np.ndarray, present: np.ndarray) -> Dict[str, Any]:
+    """Estadisticas por pregunta y KR-20 a partir de la matriz intentos x preguntas.
+
+    Cada pregunta se mide solo con los intentos que la presentaron; el KR-20
+    usa los intentos que presentaron todas las preguntas de la clave.
+    """
+    n_attempts, n_items = choices.shape
+    hits = ((choices.astype(np.int16) == key.correct) & present).astype(np.float64)
+    mask = present.astype(np.float64)
+    answered = mask.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_value = hits.sum(axis=0) / answered
+        # Puntaje del resto del examen: evita que la pregunta se correlacione consigo misma.
+        rest = (hits.sum(axis=1)[:, None] - hits) * mask
+        rest_mean = rest.sum(axis=0) / answered
+        covariance = (hits * rest).sum(axis=0) / answered - p_value * rest_mean
+        rest_var = (rest ** 2).sum(axis=0) / answered - rest_mean ** 2
+        discrimination = covariance / np.sqrt(p_value * (1 - p_value) * rest_var)
+
+    # Frecuencia de cada valor (0..255) por pregunta con un solo bincount.
+    rows, columns = np.nonzero(present)
+    counts = np.bincount(
+        columns * 256 + choices[rows, columns], minlength=n_items * 256
+    ).reshape(n_items, 256) if n_items else np.zeros((0, 256), dtype=np.intp)
+
+    complete = present.all(axis=1) if n_items else np.zeros(n_attempts, dtype=bool)
+    kr20 = None
+    if n_items > 1 and complete.sum() > 1:
+        scored = hits[complete]
+        item_p = scored.mean(axis=0)
+        total_var = scored.sum(axis=1).var()
+        if total_var > 0:
+            kr20 = _ratio(n_items / (n_items - 1) * (1 - (item_p * (1 - item_p)).sum() / total_var))
+
+    items = []
+    for j in range(n_items):
+        n = int(answered[j])
+        p = _ratio(p_value[j]) if n else None
+        r = _ratio(discrimination[j]) if n else None
+        options = [
+            {
+                "option": o,
+                "count": int(counts[j, o]),
+                "rate": _ratio(counts[j, o] / n) if n else None,
+                "is_correct": o == int(key.correct[j]),
+            }
+            for o in range(int(key.option_counts[j]))
+        ]
+        flags = []
+        if int(key.correct[j]) == NEVER_CORRECT:
+            flags.append("sin_respuesta_correcta")
+        if p is not None and p >= EASY_P_VALUE:
+            flags.append("muy_facil")
+        if p is not None and p <= HARD_P_VALUE:
+            flags.append("muy_dificil")
+        if r is not None and r < 0:
+            flags.append("discriminacion_negativa")
+        elif r is not None and r < LOW_DISCRIMINATION:
+            flags.append("discriminacion_baja")
+        if n and any(not opt["is_correct"] and opt["rate"] < UNUSED_DISTRACTOR_RATE for opt in options):
+            flags.append("distractor_sin_uso")
+        items.append({
+            "question_id": str(key.question_ids[j]),
+            "section": key.sections[key.section_index[j]],
+            "responses": n,
+            "p_value": p,
+            "discrimination": r,
+            "unanswered": int(counts[j, UNANSWERED]),
+            "options": options,
+            "flags": flags,
+        })
+    return {
+        "attempts": n_attempts,
+        "complete_attempts": int(complete.sum()),
+        "kr20": kr20,
+        "items": items,
+    }
@@ -0,0 +1,77 @@
+"""Coalescencia de lecturas identicas ("single flight") dentro de un worker.
+
+Con varios hilos por worker, peticiones iguales que llegan juntas (todo el
+grupo abriendo el mismo simulador) harian la misma consulta y el mismo
+procesamiento a la vez. ``SingleFlight.do(key, fn)`` deja correr una sola
+``fn`` por clave: los demas hilos esperan y reciben el mismo resultado (o la
+misma excepcion). No es una cache: al terminar, la siguiente llamada vuelve a
+ejecutar ``fn``.
+
+El resultado es compartido entre hilos; quien lo recibe no debe mutarlo.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Una ejecucion por clave a la vez; las llamadas concurrentes comparten el resultado."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            counters = self._counters_for(key)
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counters["executions"] += 1
+            else:
+                counters["waits"] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            with self._lock:
+                counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores por espacio de nombres (primer elemento de la clave si es tupla)."""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "keys": {name: dict(values) for name, values in self._counters.items()},
+            }
+
+    def _counters_for(self, key: Hashable) -> Dict[str, int]:
+        name = str(key[0] if isinstance(key, tuple) and key else key)
+        counters = self._counters.get(name)
+        if counters is None:
+            counters = self._counters[name] = {"executions": 0, "waits": 0, "errors": 0}
+        return counters
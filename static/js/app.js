@@ -11,6 +11,11 @@ let lastFocusedTextarea = null;
 let studySelectedSubject = null;
 let studySelectedTopic = 'todos';
 
+// Cola de practica: lotes de /questions/random?n=K sin repetir preguntas vistas
+const PRACTICE_BATCH_SIZE = 10;
+const PRACTICE_PREFETCH_THRESHOLD = 3;
+let practiceQueue = { key: '', items: [], pending: null };
+
 // Variables para modo edición
 let currentEditQuestionId = null;
 let isEditMode = false;
@@ -381,32 +386,16 @@ async function getRandomQuestion() {
         return;
     }
 
-    let url = `${API_URL}/questions/random`;
-    const params = [];
-
-    if (studySelectedSubject !== 'todos') {
-        params.push(`subject=${encodeURIComponent(studySelectedSubject)}`);
-    }
-
-    if (studySelectedTopic !== 'todos') {
-        params.push(`topic=${encodeURIComponent(studySelectedTopic)}`);
-    }
-
-    if (params.length > 0) {
-        url += '?' + params.join('&');
-    }
-
     const getBtn = document.getElementById('getQuestionBtn');
     const originalText = getBtn.innerHTML;
     getBtn.innerHTML = '<i class="fas fa-spinner loading"></i> Buscando...';
     getBtn.disabled = true;
 
     try {
-        const response = await fetch(url);
-        const data = await response.json();
+        const nextQuestion = await nextPracticeQuestion();
 
-        if (data.success) {
-            currentQuestion = data.question;
+        if (nextQuestion) {
+            currentQuestion = nextQuestion;
             displayQuestion(currentQuestion);
 
             document.getElementById('questionCard').style.display = 'block';
@@ -427,6 +416,50 @@ async function getRandomQuestion() {
 }
 
 
+function practiceFilterKey() {
+    return `${studySelectedSubject}::${studySelectedTopic}`;
+}
+
+async function fetchPracticeBatch(queue) {
+    const params = new URLSearchParams({ n: String(PRACTICE_BATCH_SIZE) });
+    if (studySelectedSubject !== 'todos') {
+        params.set('subject', studySelectedSubject);
+    }
+    if (studySelectedTopic !== 'todos') {
+        params.set('topic', studySelectedTopic);
+    }
+    const response = await fetch(`${API_URL}/questions/random?${params.toString()}`);
+    const data = await response.json();
+    if (data.success && Array.isArray(data.questions)) {
+        queue.items.push(...data.questions);
+    }
+}
+
+// Pide el siguiente lote en segundo plano mientras se responde la pregunta actual.
+function prefetchPracticeBatch() {
+    if (practiceQueue.key !== practiceFilterKey()) {
+        practiceQueue = { key: practiceFilterKey(), items: [], pending: null };
+    }
+    const queue = practiceQueue;
+    if (!queue.pending) {
+        queue.pending = fetchPracticeBatch(queue)
+            .catch(error => console.error('Error precargando preguntas:', error))
+            .finally(() => { queue.pending = null; });
+    }
+    return queue.pending;
+}
+
+async function nextPracticeQuestion() {
+    if (practiceQueue.key !== practiceFilterKey() || practiceQueue.items.length === 0) {
+        await prefetchPracticeBatch();
+    }
+    const question = practiceQueue.items.shift() || null;
+    if (question && practiceQueue.items.length <= PRACTICE_PREFETCH_THRESHOLD) {
+        prefetchPracticeBatch();
+    }
+    return question;
+}
+
 async function getRandomQuestionFromTopic(topic) {
     studySelectedTopic = topic;
     
@@ -537,7 +570,9 @@ function showAnswer() {
 
 // Función para verificar respuesta seleccionada
 function checkAnswer(selectedIndex, questionId) {
-    const question = allQuestions.find(q => q._id === questionId);
+    const question = (currentQuestion && currentQuestion._id === questionId)
+        ? currentQuestion
+        : allQuestions.find(q => q._id === questionId);
     if (!question || !question.has_options) return;
     
     const optionCards = document.querySelectorAll('#modalOptionsContainer .option-card');
@@ -1,6 +1,9 @@
         let allQuestions = [];
+        // Preguntas recibidas del servidor (practica, examen y simuladores) por _id.
+        const questionsById = new Map();
 
         let allSubjects = [];
+        let subjectQuestionCounts = {};
         let allSimulators = [];
         let currentMode = 'study'; // 'study', 'exam' o 'simulator'
         
@@ -9,8 +12,10 @@
 
         let studySelectedSubject = 'todos';
         let studySelectedTopic = 'todos';
-        let studyQuestionPool = [];
-        let lastStudyQuestionId = null;
+        // Cola de practica: lotes de /api/questions/random?n=K sin repetir vistas
+        const PRACTICE_BATCH_SIZE = 10;
+        const PRACTICE_PREFETCH_THRESHOLD = 3;
+        let practiceQueue = { key: '', items: [], pending: null };
         
 
         // Variables para modo examen
@@ -83,18 +88,15 @@
 
         async function loadAllData() {
             try {
-                const response = await fetch('/api/questions');
+                const response = await fetch('/api/subjects?with_counts=1');
                 const data = await response.json();
                 
 
                 if (data.success) {
 
-                    allQuestions = data.questions;
-                    allSubjects = [...new Set(
-                        allQuestions
-                            .map(q => q.subject)
-                            .filter(s => s && s.toLowerCase() !== 'simulador')
-                    )];
+                    subjectQuestionCounts = data.counts || {};
+                    allSubjects = (data.subjects || [])
+                        .filter(s => s && s.toLowerCase() !== 'simulador');
                     updateExamSubjectSelect();
                     loadStudySubjects();
                     await loadSimulators();
@@ -113,6 +115,60 @@
             }
         }
 
+        function rememberQuestions(questions) {
+            questions.forEach(q => {
+                if (!questionsById.has(q._id)) {
+                    questionsById.set(q._id, q);
+                    allQuestions.push(q);
+                }
+            });
+        }
+
+        function practiceFilterKey() {
+            return `${studySelectedSubject}::${studySelectedTopic}`;
+        }
+
+        function resetPracticeQueue() {
+            practiceQueue = { key: practiceFilterKey(), items: [], pending: null };
+        }
+
+        async function fetchPracticeBatch(queue) {
+            const params = new URLSearchParams({ n: String(PRACTICE_BATCH_SIZE), exclude_simulator: '1' });
+            if (studySelectedSubject !== 'todos') params.set('subject', studySelectedSubject);
+            if (studySelectedTopic !== 'todos') params.set('topic', studySelectedTopic);
+            const response = await fetch(`/api/questions/random?${params.toString()}`);
+            const data = await response.json();
+            if (data.success && Array.isArray(data.questions)) {
+                rememberQuestions(data.questions);
+                queue.items.push(...data.questions.map(q => questionsById.get(q._id)));
+            }
+        }
+
+        // Pide el siguiente lote en segundo plano mientras el alumno responde.
+        function prefetchPracticeBatch() {
+            if (practiceQueue.key !== practiceFilterKey()) {
+                resetPracticeQueue();
+            }
+            const queue = practiceQueue;
+            if (!queue.pending) {
+                queue.pending = fetchPracticeBatch(queue)
+                    .catch(error => console.error('Error precargando preguntas:', error))
+                    .finally(() => { queue.pending = null; });
+            }
+            return queue.pending;
+        }
+
+        async function nextPracticeQuestion() {
+            if (practiceQueue.key !== practiceFilterKey() || practiceQueue.items.length === 0) {
+                await prefetchPracticeBatch();
+            }
+            const question = practiceQueue.items.shift() || null;
+            if (question && practiceQueue.items.length <= PRACTICE_PREFETCH_THRESHOLD) {
+                prefetchPracticeBatch();
+            }
+            return question;
+        }
+
         async function loadSimulators() {
             try {
                 const response = await fetch('/api/simulators');
@@ -315,9 +371,8 @@
             if (!container) return;
             
             container.innerHTML = '';
-            const studyQuestions = allQuestions.filter(q => q.subject && q.subject.toLowerCase() !== 'simulador');
-            studyQuestionPool = [];
-            lastStudyQuestionId = null;
+            const studyQuestionsTotal = allSubjects.reduce((sum, subject) => sum + (subjectQuestionCounts[subject] || 0), 0);
+            resetPracticeQueue();
             
             // Agregar "Todas las materias"
             const allBtn = document.createElement('div');
@@ -327,7 +382,7 @@
                     <i class="fas fa-layer-group"></i>
                 </div>
                 <div class="subject-name">Todas</div>
-                <div class="subject-count">${studyQuestions.length}</div>
+                <div class="subject-count">${studyQuestionsTotal}</div>
             `;
             allBtn.dataset.subject = 'todos';
 
@@ -337,8 +392,7 @@
                 this.classList.add('active');
                 studySelectedSubject = 'todos';
                 studySelectedTopic = 'todos';
-                studyQuestionPool = [];
-                lastStudyQuestionId = null;
+                resetPracticeQueue();
                 document.getElementById('topicSelectorContainer').style.display = 'none';
             });
             container.appendChild(allBtn);
@@ -379,7 +433,7 @@
 
             allSubjects.forEach(subject => {
 
-                const count = allQuestions.filter(q => q.subject === subject).length;
+                const count = subjectQuestionCounts[subject] || 0;
 
                 if (count === 0) return;
 
@@ -410,8 +464,7 @@
                     this.classList.add('active');
                     studySelectedSubject = subject;
                     studySelectedTopic = 'todos';
-                    studyQuestionPool = [];
-                    lastStudyQuestionId = null;
+                    resetPracticeQueue();
                     loadStudyTopics();
                 });
                 container.appendChild(btn);
@@ -440,21 +493,15 @@
             try {
                 container.innerHTML = '';
                 topicSelector.style.display = 'block';
-                studyQuestionPool = [];
-                lastStudyQuestionId = null;
+                resetPracticeQueue();
                 
 
-                // Filtrar temas de la materia seleccionada
-
-                const topics = [...new Set(
-
-                    allQuestions
-
-                        .filter(q => q.subject === studySelectedSubject)
-
-                        .map(q => q.topic)
-
-                )].sort();
+                // Temas de la materia seleccionada (sin descargar sus preguntas)
+                const topicsResponse = await fetch(`/api/subjects/${encodeURIComponent(studySelectedSubject)}/topics`);
+                const topicsData = await topicsResponse.json();
+                const topics = (topicsData.success ? topicsData.topics : [])
+                    .filter(Boolean)
+                    .sort();
 
                 
 
@@ -482,8 +529,7 @@
                         document.querySelectorAll('.topic-chip').forEach(b => b.classList.remove('active'));
                         this.classList.add('active');
                         studySelectedTopic = 'todos';
-                        studyQuestionPool = [];
-                        lastStudyQuestionId = null;
+                        resetPracticeQueue();
                     });
                     container.appendChild(allBtn);
 
@@ -509,8 +555,7 @@
                             document.querySelectorAll('.topic-chip').forEach(b => b.classList.remove('active'));
                             this.classList.add('active');
                             studySelectedTopic = topic;
-                            studyQuestionPool = [];
-                            lastStudyQuestionId = null;
+                            resetPracticeQueue();
                         });
                         container.appendChild(btn);
 
@@ -674,6 +719,7 @@
                     showNotification(data.error || 'No hay preguntas en este simulador', 'error');
                     return;
                 }
+                rememberQuestions(data.questions);
 
                 if (mode === 'study') {
                     simulatorStudyState.active = true;
@@ -768,54 +814,12 @@
             return;
         }
 
-        const candidates = allQuestions.filter(q => {
-            if (q.subject && q.subject.toLowerCase() === 'simulador') return false;
-            if (studySelectedSubject !== 'todos' && q.subject !== studySelectedSubject) return false;
-            if (studySelectedTopic !== 'todos' && q.topic !== studySelectedTopic) return false;
-            return true;
-        });
-        
-        if (candidates.length === 0) {
-            showNotification('No hay preguntas con estos filtros', 'warning');
-            return;
-        }
-        
-        const activePool = simulatorStudyState.active ? simulatorStudyState.pool : studyQuestionPool;
-        if (activePool.length === 0) {
-            const refill = candidates.slice();
-            for (let i = refill.length - 1; i > 0; i--) {
-                const j = Math.floor(Math.random() * (i + 1));
-                [refill[i], refill[j]] = [refill[j], refill[i]];
-            }
-            if (simulatorStudyState.active) {
-                simulatorStudyState.pool = refill;
-            } else {
-                studyQuestionPool = refill;
-            }
-        }
-        
-        let nextQuestion = (simulatorStudyState.active ? simulatorStudyState.pool : studyQuestionPool).pop();
-        const lastId = simulatorStudyState.active ? simulatorStudyState.lastQuestionId : lastStudyQuestionId;
-        if (nextQuestion && nextQuestion._id === lastId && (simulatorStudyState.active ? simulatorStudyState.pool : studyQuestionPool).length > 0) {
-            if (simulatorStudyState.active) {
-                simulatorStudyState.pool.unshift(nextQuestion);
-                nextQuestion = simulatorStudyState.pool.pop();
-            } else {
-                studyQuestionPool.unshift(nextQuestion);
-                nextQuestion = studyQuestionPool.pop();
-            }
-        }
-        
+        const nextQuestion = await nextPracticeQuestion();
         if (!nextQuestion) {
-            showNotification('No hay preguntas disponibles', 'warning');
+            showNotification('No hay preguntas con estos filtros', 'warning');
             return;
         }
         
-        if (simulatorStudyState.active) {
-            simulatorStudyState.lastQuestionId = nextQuestion._id;
-        } else {
-            lastStudyQuestionId = nextQuestion._id;
-        }
         displayStudyQuestion(nextQuestion);
     } catch (error) {
         console.error('Error obteniendo pregunta:', error);
@@ -1205,7 +1209,7 @@ function displayStudyQuestion(question) {
 
 function checkAnswer(selectedIndex, questionId) {
 
-    const question = allQuestions.find(q => q._id === questionId);
+    const question = questionsById.get(questionId) || allQuestions.find(q => q._id === questionId);
 
     if (!question || !question.has_options) return;
 
@@ -1417,111 +1421,79 @@ function checkAnswer(selectedIndex, questionId) {
         }
         
 
+        // Cuantas preguntas pedir por materia: partes iguales y el resto a las que aun tienen.
+        function examSubjectQuotas(subjects, questionCount) {
+            const available = subjects
+                .map(subject => ({ subject, left: subjectQuestionCounts[subject] || 0, count: 0 }))
+                .filter(entry => entry.left > 0);
+            let remaining = questionCount;
+            while (remaining > 0) {
+                const open = available.filter(entry => entry.left > 0);
+                if (open.length === 0) break;
+                const share = Math.max(1, Math.floor(remaining / open.length));
+                for (const entry of open) {
+                    if (remaining === 0) break;
+                    const take = Math.min(share, entry.left, remaining);
+                    entry.count += take;
+                    entry.left -= take;
+                    remaining -= take;
+                }
+            }
+            return available.filter(entry => entry.count > 0);
+        }
+
         async function startExam() {
             updateExamConfig();
             activeExamContext = 'general';
             configureExamHeaderLayout();
 
-            // Filtrar preguntas segÃºn configuraciÃ³n
-
-            let filteredQuestions = allQuestions.filter(q => {
-                if (q.subject && q.subject.toLowerCase() === 'simulador') return false;
-                if (examConfig.subjects && examConfig.subjects.length > 0 && !examConfig.subjects.includes(q.subject)) return false;
-                return true;
-            });
-            
-
-            if (filteredQuestions.length === 0) {
-
-                showNotification('No hay preguntas disponibles con los filtros seleccionados', 'error');
+            // Reparto equilibrado por materia con los conteos de /api/subjects;
+            // el servidor elige al azar solo las preguntas que se van a usar.
+            const selectedSubjects = (examConfig.subjects && examConfig.subjects.length > 0)
+                ? examConfig.subjects
+                : allSubjects;
+            const quotas = examSubjectQuotas(selectedSubjects, examConfig.questionCount);
 
+            examState.questions = [];
+            const usedIds = new Set();
+            try {
+                // Una peticion por materia, en serie: todas actualizan la misma sesion de practica.
+                for (const { subject, count } of quotas) {
+                    const params = new URLSearchParams({ n: String(count), subject });
+                    const response = await fetch(`/api/questions/random?${params.toString()}`);
+                    const data = await response.json();
+                    if (!data.success || !Array.isArray(data.questions)) continue;
+                    rememberQuestions(data.questions);
+                    data.questions.forEach(q => {
+                        if (!usedIds.has(q._id)) {
+                            usedIds.add(q._id);
+                            examState.questions.push(questionsById.get(q._id));
+                        }
+                    });
+                }
+            } catch (error) {
+                console.error('Error cargando preguntas del examen:', error);
+                showNotification('Error de conexion con el servidor', 'error');
                 return;
-
             }
-
             
 
-            if (filteredQuestions.length < examConfig.questionCount) {
+            if (examState.questions.length === 0) {
 
-                showNotification(`Solo hay ${filteredQuestions.length} preguntas disponibles. Se usaran todas.`, 'warning');
+                showNotification('No hay preguntas disponibles con los filtros seleccionados', 'error');
 
-                examConfig.questionCount = filteredQuestions.length;
+                return;
 
             }
 
             
 
-            // Seleccionar preguntas aleatorias de forma equilibrada por materia
-
-            const allAvailable = allQuestions.filter(q => !(q.subject && q.subject.toLowerCase() === 'simulador'));
-            const selectedSubjects = (examConfig.subjects && examConfig.subjects.length > 0)
-                ? examConfig.subjects
-                : [...new Set(allAvailable.map(q => q.subject))];
-
-            const subjectPools = {};
-            selectedSubjects.forEach(subject => {
-                subjectPools[subject] = allAvailable.filter(q => q.subject === subject);
-                // shuffle
-                for (let i = subjectPools[subject].length - 1; i > 0; i--) {
-                    const j = Math.floor(Math.random() * (i + 1));
-                    [subjectPools[subject][i], subjectPools[subject][j]] = [subjectPools[subject][j], subjectPools[subject][i]];
-                }
-            });
+            if (examState.questions.length < examConfig.questionCount) {
 
-            examState.questions = [];
-            const usedIds = new Set();
-            const subjectCount = selectedSubjects.length;
-            const base = Math.floor(examConfig.questionCount / subjectCount);
-            let remaining = examConfig.questionCount;
-
-            // Reparto base
-            selectedSubjects.forEach(subject => {
-                const pool = subjectPools[subject] || [];
-                const take = Math.min(base, pool.length);
-                for (let i = 0; i < take; i++) {
-                    const q = pool.pop();
-                    if (q && !usedIds.has(q._id)) {
-                        examState.questions.push(q);
-                        usedIds.add(q._id);
-                        remaining--;
-                    }
-                }
-            });
+                showNotification(`Solo hay ${examState.questions.length} preguntas disponibles. Se usaran todas.`, 'warning');
 
-            // Reparto del resto priorizando materias con preguntas disponibles
-            let round = 0;
-            while (remaining > 0) {
-                let picked = false;
-                for (const subject of selectedSubjects) {
-                    if (remaining === 0) break;
-                    const pool = subjectPools[subject] || [];
-                    if (pool.length > 0) {
-                        const q = pool.pop();
-                        if (q && !usedIds.has(q._id)) {
-                            examState.questions.push(q);
-                            usedIds.add(q._id);
-                            remaining--;
-                            picked = true;
-                        }
-                    }
-                }
-                if (!picked) break;
-                round++;
-                if (round > 1000) break;
-            }
+                examConfig.questionCount = examState.questions.length;
 
-            // Si aún faltan, rellenar con cualquier materia disponible
-            if (remaining > 0) {
-                const leftovers = allAvailable.filter(q => !usedIds.has(q._id));
-                // shuffle leftovers
-                for (let i = leftovers.length - 1; i > 0; i--) {
-                    const j = Math.floor(Math.random() * (i + 1));
-                    [leftovers[i], leftovers[j]] = [leftovers[j], leftovers[i]];
-                }
-                for (let i = 0; i < leftovers.length && remaining > 0; i++) {
-                    examState.questions.push(leftovers[i]);
-                    remaining--;
-                }
             }
             
             // Inicializar estado del examen
@@ -2010,27 +1982,32 @@ function showExamQuestion(index) {
 
             const results = calculateExamResults();
 
-            showExamResults(results);
-
             if (currentMode === 'simulator' && selectedSimulator) {
-                fetch(`/api/simulators/${encodeURIComponent(selectedSimulator.name)}/score`, {
+                // El simulador se califica en el servidor: las preguntas no traen la respuesta correcta.
+                fetch(`/api/simulators/${encodeURIComponent(selectedSimulator.name)}/answers`, {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({
-                        correct: results.correct,
-                        total: results.total,
-                        section_stats: results.sectionStats || {}
+                        responses: examState.answers.map(answer => answer === undefined ? null : answer),
+                        question_ids: examState.questions.map(question => question._id)
                     })
                 })
                 .then(res => res.json())
                 .then(data => {
-                    if (data.success) {
-                        selectedSimulator.last_score = { correct: results.correct, total: results.total };
-                        renderSimulators();
-                        updateSimulatorResultsButtonVisibility();
+                    if (!data.success) {
+                        throw new Error(data.error || 'No se pudo calificar el simulador');
                     }
+                    showExamResults(applyServerGrading(results, data));
+                    selectedSimulator.last_score = { correct: results.correct, total: results.total };
+                    renderSimulators();
+                    updateSimulatorResultsButtonVisibility();
                 })
-                .catch(err => console.log('Error guardando puntaje:', err));
+                .catch(err => {
+                    console.log('Error guardando puntaje:', err);
+                    alert(`No se pudo enviar el simulador: ${err.message}`);
+                });
+            } else {
+                showExamResults(results);
             }
 
             
@@ -2161,6 +2138,34 @@ function showExamQuestion(index) {
 
         
 
+        function applyServerGrading(results, data) {
+            const graded = Array.isArray(data.review) ? data.review : [];
+            results.review = results.review.map((item, index) => {
+                const answer = graded[index];
+                const question = examState.questions[index];
+                if (!answer || !question) return item;
+                if (data.answers_available_at) {
+                    // Simulador aun abierto: solo se sabe si se acerto.
+                    const releaseText = `Disponible al cerrar el simulador (${new Date(data.answers_available_at).toLocaleString()})`;
+                    return { ...item, correctAnswer: releaseText, isCorrect: Boolean(answer.is_correct), solution: '' };
+                }
+                let correctAnswer = answer.correct_answer || '';
+                if (question.has_options) {
+                    correctAnswer = answer.correct_option !== undefined && answer.correct_option !== -1
+                        ? `${String.fromCharCode(65 + answer.correct_option)}. ${question.options[answer.correct_option] || ''}`
+                        : 'N/A';
+                }
+                return { ...item, correctAnswer, isCorrect: Boolean(answer.is_correct), solution: answer.solution || '' };
+            });
+            const attempt = data.current_attempt || {};
+            results.correct = Number(attempt.correct) || 0;
+            results.total = Number(attempt.total) || 0;
+            results.sectionStats = attempt.section_stats || {};
+            results.score = results.total > 0 ? Math.round((results.correct / results.total) * 100) : 0;
+            results.grade = getGrade(results.score);
+            return results;
+        }
+
         function getGrade(score) {
 
             if (score >= 90) return 'Excelente (A)';
@@ -2,6 +2,17 @@
         let currentUser = null;
         let userRole = null;
         let allQuestions = [];
+        // Preguntas vistas en las paginas cargadas (para editar / vista previa).
+        const questionsById = new Map();
+        let questionListState = {
+            filterKey: null,
+            cursors: [null],
+            totalItems: 0,
+            requestId: 0
+        };
+        let allSubjects = [];
+        let subjectQuestionCounts = {};
+        let questionStatsSummary = { total: 0, subjects: 0, shown: 0, correct: 0 };
         let allStudents = [];
         let currentStudentGroup = 'todos';
         let studentGroupsSummary = [];
@@ -28,6 +39,11 @@
             pageSize: 25,
             totalPages: 1
         };
+        let attendanceState = {
+            page: 1,
+            pageSize: 50,
+            totalPages: 1
+        };
 let existingImageUrl = null;
         const DEFAULT_MODAL_SUBJECTS = ['Simulador'];
 
@@ -408,9 +424,17 @@ function resolveQuestionImageUrl(imageValue) {
             if (refreshAttendanceBtn) {
                 refreshAttendanceBtn.addEventListener('click', function() {
                     const simulatorName = (document.getElementById('attendanceSimulatorName')?.value || '').trim();
-                    if (simulatorName) loadSimulatorAttendance(simulatorName);
+                    if (simulatorName) {
+                        loadSimulatorAttendance(simulatorName, attendanceState.page);
+                        loadSimulatorDashboard(simulatorName);
+                    }
                 });
             }
+            document.querySelectorAll('[data-export-report]').forEach(btn => {
+                btn.addEventListener('click', function() {
+                    downloadSimulatorReport(btn.dataset.exportReport, btn.dataset.exportFormat);
+                });
+            });
             const attendanceGroupFilter = document.getElementById('attendanceGroupFilter');
             if (attendanceGroupFilter) {
                 attendanceGroupFilter.addEventListener('change', function() {
@@ -942,16 +966,31 @@ function resolveQuestionImageUrl(imageValue) {
         
         async function loadAllData() {
             try {
-                // Cargar preguntas
-                const response = await fetch('/api/questions');
-                const data = await response.json();
+                // Catalogo de materias y resumen; las preguntas se piden por pagina.
+                const [subjectsResponse, statsResponse] = await Promise.all([
+                    fetch('/api/subjects?with_counts=1'),
+                    fetch('/api/stats')
+                ]);
+                const subjectsData = await subjectsResponse.json();
+                const statsData = await statsResponse.json();
                 
-                if (data.success) {
-                    allQuestions = data.questions;
-                    updateSidebarStats();
-                    updateFilterOptions();
-                    loadQuestionsPage();
+                if (subjectsData.success) {
+                    allSubjects = (subjectsData.subjects || []).filter(Boolean);
+                    subjectQuestionCounts = subjectsData.counts || {};
+                }
+                if (statsData.success) {
+                    questionStatsSummary = {
+                        total: statsData.stats.total_questions || 0,
+                        subjects: allSubjects.length,
+                        shown: statsData.stats.total_shown || 0,
+                        correct: statsData.stats.total_correct || 0
+                    };
                 }
+                questionListState.filterKey = null;
+                currentPage = 1;
+                updateSidebarStats();
+                updateFilterOptions();
+                loadQuestionsPage();
             } catch (error) {
                 console.error('Error cargando datos:', error);
                 showNotification('Error al cargar los datos', 'error');
@@ -959,10 +998,7 @@ function resolveQuestionImageUrl(imageValue) {
         }
         
         function updateSidebarStats() {
-            const total = allQuestions.length;
-            const subjects = [...new Set(allQuestions.map(q => q.subject))].length;
-            const shown = allQuestions.reduce((sum, q) => sum + (q.times_shown || 0), 0);
-            const correct = allQuestions.reduce((sum, q) => sum + (q.times_correct || 0), 0);
+            const { total, subjects, shown, correct } = questionStatsSummary;
             
             const sidebarTotal = document.getElementById('sidebarTotal');
             const sidebarSubjects = document.getElementById('sidebarSubjects');
@@ -988,7 +1024,7 @@ function resolveQuestionImageUrl(imageValue) {
             const subjectSelect = document.getElementById('subjectFilter');
             subjectSelect.innerHTML = '<option value="todos">Todas las materias</option>';
             
-            const subjects = [...new Set(allQuestions.map(q => q.subject))].sort();
+            const subjects = [...allSubjects].sort();
             subjects.forEach(subject => {
                 const option = document.createElement('option');
                 option.value = subject;
@@ -1002,7 +1038,7 @@ function resolveQuestionImageUrl(imageValue) {
             const modalSubject = document.getElementById('modalSubject');
             if (!modalSubject) return;
 
-            const dynamicSubjects = [...new Set(allQuestions.map(q => (q.subject || '').trim()).filter(Boolean))];
+            const dynamicSubjects = [...new Set(allSubjects.map(subject => (subject || '').trim()).filter(Boolean))];
             const merged = [...new Set([...DEFAULT_MODAL_SUBJECTS, ...dynamicSubjects])]
                 .sort((a, b) => a.localeCompare(b, 'es', { sensitivity: 'base' }));
 
@@ -1042,12 +1078,15 @@ function resolveQuestionImageUrl(imageValue) {
             topicFilter.innerHTML = '<option value="todos">Todos los temas</option>';
             
             if (subject !== 'todos') {
-                // Obtener temas nicos de la materia seleccionada
-                const topics = [...new Set(
-                    allQuestions
-                        .filter(q => q.subject === subject)
-                        .map(q => q.topic)
-                )].sort();
+                // Obtener temas de la materia seleccionada desde el servidor
+                let topics = [];
+                try {
+                    const response = await fetch(`/api/subjects/${encodeURIComponent(subject)}/topics`);
+                    const data = await response.json();
+                    topics = data.success ? data.topics.filter(Boolean).sort() : [];
+                } catch (error) {
+                    console.error('Error cargando temas:', error);
+                }
                 
                 topics.forEach(topic => {
                     const option = document.createElement('option');
@@ -1076,7 +1115,7 @@ function resolveQuestionImageUrl(imageValue) {
         }
         
         function performSearch() {
-            currentSearch = document.getElementById('searchInput').value.trim().toLowerCase();
+            currentSearch = document.getElementById('searchInput').value.trim();
             currentPage = 1;
             displayQuestions();
         }
@@ -1107,50 +1146,80 @@ function resolveQuestionImageUrl(imageValue) {
             displayQuestions();
         }
         
-        function displayQuestions() {
-            // Filtrar preguntas
-            let filteredQuestions = allQuestions.filter(question => {
-                // Filtrar por materia
-                if (currentFilters.subject !== 'todos' && question.subject !== currentFilters.subject) {
-                    return false;
-                }
-                
-                // Filtrar por tema
-                if (currentFilters.topic !== 'todos' && question.topic !== currentFilters.topic) {
-                    return false;
-                }
-                
-                // Filtrar por universidad
-                if (currentFilters.university !== 'todos' && question.university !== currentFilters.university) {
-                    return false;
-                }
-                
-                // Filtrar por tipo
-                if (currentFilters.type !== 'todos') {
-                    if (currentFilters.type === 'opciones' && !question.has_options) {
-                        return false;
-                    }
-                    if (currentFilters.type === 'abierta' && question.has_options) {
-                        return false;
-                    }
-                }
-                
-                // Filtrar por bsqueda
+        function buildQuestionListParams() {
+            const params = new URLSearchParams();
+            if (currentFilters.subject !== 'todos') params.set('subject', currentFilters.subject);
+            if (currentFilters.topic !== 'todos') params.set('topic', currentFilters.topic);
+            if (currentFilters.university !== 'todos') params.set('university', currentFilters.university);
+            if (currentFilters.type === 'opciones') params.set('has_options', '1');
+            if (currentFilters.type === 'abierta') params.set('has_options', '0');
+            return params;
+        }
+        
+        async function fetchQuestionListPage(cursor, limit = itemsPerPage, withTotal = true) {
+            const params = buildQuestionListParams();
+            params.set('limit', String(limit));
+            if (withTotal) params.set('with_total', '1');
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch(`/api/questions?${params.toString()}`);
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.error || 'Error al cargar preguntas');
+            }
+            data.questions.forEach(q => questionsById.set(q._id, q));
+            return data;
+        }
+        
+        // Busqueda en el servidor (indice de texto), ordenada por relevancia.
+        async function fetchSearchPage(searchText, page) {
+            const params = buildQuestionListParams();
+            params.set('q', searchText);
+            params.set('page', String(page));
+            params.set('limit', String(itemsPerPage));
+            params.set('with_total', '1');
+            const response = await fetch(`/api/questions/search?${params.toString()}`);
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.error || 'Error al buscar preguntas');
+            }
+            data.questions.forEach(q => questionsById.set(q._id, q));
+            return data;
+        }
+        
+        async function displayQuestions() {
+            const filterKey = JSON.stringify([currentFilters, currentSearch]);
+            if (filterKey !== questionListState.filterKey) {
+                questionListState.filterKey = filterKey;
+                questionListState.cursors = [null];
+                questionListState.totalItems = 0;
+                currentPage = 1;
+            }
+            const requestId = ++questionListState.requestId;
+            
+            let pageQuestions = [];
+            let totalItems = 0;
+            try {
                 if (currentSearch) {
-                    const searchText = currentSearch.toLowerCase();
-                    const questionText = question.question.toLowerCase();
-                    const answerText = (question.answer || question.correct_answer || '').toLowerCase();
-                    const solutionText = (question.solution || '').toLowerCase();
-                    
-                    if (!questionText.includes(searchText) && 
-                        !answerText.includes(searchText) && 
-                        !solutionText.includes(searchText)) {
-                        return false;
-                    }
+                    const data = await fetchSearchPage(currentSearch, currentPage);
+                    pageQuestions = data.questions;
+                    totalItems = data.total || 0;
+                } else {
+                    const data = await fetchQuestionListPage(questionListState.cursors[currentPage - 1] || null);
+                    questionListState.cursors[currentPage] = data.has_more ? data.next_cursor : null;
+                    pageQuestions = data.questions;
+                    totalItems = data.total || 0;
                 }
-                
-                return true;
-            });
+            } catch (error) {
+                console.error('Error cargando preguntas:', error);
+                showNotification('Error al cargar las preguntas', 'error');
+                return;
+            }
+            // Ignorar respuestas de filtros anteriores.
+            if (requestId !== questionListState.requestId) return;
+            
+            allQuestions = pageQuestions;
+            questionListState.totalItems = totalItems;
+            const totalPages = Math.max(1, Math.ceil(totalItems / itemsPerPage));
             
             // Actualizar contadores
             updateSidebarStats();
@@ -1161,7 +1230,7 @@ function resolveQuestionImageUrl(imageValue) {
             const noSearchResults = document.getElementById('noSearchResults');
             const pagination = document.getElementById('pagination');
             
-            if (filteredQuestions.length === 0) {
+            if (totalItems === 0) {
                 container.style.display = 'none';
                 pagination.style.display = 'none';
                 
@@ -1183,12 +1252,6 @@ function resolveQuestionImageUrl(imageValue) {
             noQuestionsMsg.style.display = 'none';
             noSearchResults.style.display = 'none';
             
-            // Calcular paginacin
-            const totalPages = Math.ceil(filteredQuestions.length / itemsPerPage);
-            const startIndex = (currentPage - 1) * itemsPerPage;
-            const endIndex = startIndex + itemsPerPage;
-            const pageQuestions = filteredQuestions.slice(startIndex, endIndex);
-            
             // Mostrar preguntas
             container.innerHTML = '';
             pageQuestions.forEach(question => {
@@ -1208,7 +1271,7 @@ function resolveQuestionImageUrl(imageValue) {
                 document.getElementById('prevPageBtn').disabled = currentPage === 1;
                 document.getElementById('nextPageBtn').disabled = currentPage === totalPages;
                 document.getElementById('pageInfo').textContent = 
-                    `Pgina ${currentPage} de ${totalPages} (${filteredQuestions.length} preguntas)`;
+                    `Pgina ${currentPage} de ${totalPages} (${totalItems} preguntas)`;
             } else {
                 pagination.style.display = 'none';
             }
@@ -1321,8 +1384,7 @@ function createQuestionCard(question) {
         }
         
         function nextPage() {
-            const totalQuestions = getFilteredQuestions().length;
-            const totalPages = Math.ceil(totalQuestions / itemsPerPage);
+            const totalPages = Math.ceil(questionListState.totalItems / itemsPerPage);
             
             if (currentPage < totalPages) {
                 currentPage++;
@@ -1330,35 +1392,6 @@ function createQuestionCard(question) {
             }
         }
         
-        function getFilteredQuestions() {
-            return allQuestions.filter(question => {
-                // Aplicar los mismos filtros que en displayQuestions
-                if (currentFilters.subject !== 'todos' && question.subject !== currentFilters.subject) {
-                    return false;
-                }
-                if (currentFilters.topic !== 'todos' && question.topic !== currentFilters.topic) {
-                    return false;
-                }
-                if (currentFilters.university !== 'todos' && question.university !== currentFilters.university) {
-                    return false;
-                }
-                if (currentFilters.type !== 'todos') {
-                    if (currentFilters.type === 'opciones' && !question.has_options) return false;
-                    if (currentFilters.type === 'abierta' && question.has_options) return false;
-                }
-                if (currentSearch) {
-                    const searchText = currentSearch.toLowerCase();
-                    const questionText = question.question.toLowerCase();
-                    const answerText = (question.answer || question.correct_answer || '').toLowerCase();
-                    
-                    if (!questionText.includes(searchText) && !answerText.includes(searchText)) {
-                        return false;
-                    }
-                }
-                return true;
-            });
-        }
-        
         function loadQuestionsPage() {
             displayQuestions();
         }
@@ -1381,7 +1414,9 @@ function createQuestionCard(question) {
                     
                     // Preguntas ms vistas
                     const mostViewed = document.getElementById('mostViewedQuestions');
-                    mostViewed.innerHTML = createMostViewedList(allQuestions);
+                    const topResponse = await fetch('/api/questions?sort=-times_shown&limit=5&fields=subject,question,times_shown,times_correct');
+                    const topData = await topResponse.json();
+                    mostViewed.innerHTML = createMostViewedList(topData.success ? topData.questions : []);
                 }
             } catch (error) {
                 console.error('Error cargando estadsticas:', error);
@@ -1442,7 +1477,7 @@ function createQuestionCard(question) {
         
         function createPerformanceStats(stats) {
             const totalShown = stats.total_shown || 0;
-            const totalCorrect = allQuestions.reduce((sum, q) => sum + (q.times_correct || 0), 0);
+            const totalCorrect = stats.total_correct || 0;
             const accuracy = totalShown > 0 ? ((totalCorrect / totalShown) * 100).toFixed(1) : 0;
             
             return `
@@ -2233,6 +2268,63 @@ function createQuestionCard(question) {
             input.value = simulatorName || '';
             modal.classList.add('active');
             loadSimulatorAttendance(simulatorName);
+            loadSimulatorDashboard(simulatorName);
+        }
+
+        async function loadSimulatorDashboard(simulatorName) {
+            const head = document.getElementById('simulatorDashboardHead');
+            const body = document.getElementById('simulatorDashboardBody');
+            if (!head || !body || !simulatorName) return;
+
+            head.innerHTML = '';
+            body.innerHTML = '<tr><td style="text-align:center; color: var(--text-muted);">Cargando...</td></tr>';
+            const formatPercent = value => (value === null || value === undefined ? '-' : `${value}%`);
+            try {
+                const response = await fetch(`/api/simulators/${encodeURIComponent(simulatorName)}/dashboard`);
+                const data = await response.json();
+                if (!data.success) {
+                    body.innerHTML = `<tr><td style="text-align:center; color: var(--danger);">${escapeHtml(data.error || 'Error al cargar')}</td></tr>`;
+                    return;
+                }
+                const sections = Array.isArray(data.sections) ? data.sections : [];
+                const groups = Array.isArray(data.groups) ? data.groups : [];
+                head.innerHTML = `
+                    <tr>
+                        <th>Grupo</th>
+                        <th>Completado</th>
+                        <th>Promedio</th>
+                        <th>Mediana</th>
+                        ${sections.map(section => `<th>${escapeHtml(section)} (prom. / med.)</th>`).join('')}
+                    </tr>
+                `;
+                if (groups.length === 0) {
+                    body.innerHTML = `<tr><td colspan="${4 + sections.length}" style="text-align:center; color: var(--text-muted);">Sin intentos registrados</td></tr>`;
+                    return;
+                }
+                body.innerHTML = groups.map(entry => {
+                    const bySection = {};
+                    (entry.sections || []).forEach(item => { bySection[item.section] = item; });
+                    const rate = entry.completion_rate === null || entry.completion_rate === undefined
+                        ? '-'
+                        : `${Math.round(entry.completion_rate * 100)}%`;
+                    const score = entry.score || {};
+                    return `
+                        <tr>
+                            <td>${escapeHtml(entry.group || 'Sin grupo')}</td>
+                            <td>${entry.completed || 0}/${entry.students || 0} (${rate})</td>
+                            <td>${formatPercent(score.average)}</td>
+                            <td>${formatPercent(score.median)}</td>
+                            ${sections.map(section => {
+                                const item = bySection[section];
+                                return `<td>${item ? `${formatPercent(item.average)} / ${formatPercent(item.median)}` : '-'}</td>`;
+                            }).join('')}
+                        </tr>
+                    `;
+                }).join('');
+            } catch (error) {
+                console.error('Error cargando resumen por grupo:', error);
+                body.innerHTML = '<tr><td style="text-align:center; color: var(--danger);">Error al cargar el resumen</td></tr>';
+            }
         }
 
         function closeSimulatorAttendanceModal() {
@@ -2241,14 +2333,37 @@ function createQuestionCard(question) {
             modal.classList.remove('active');
         }
 
-        async function loadSimulatorAttendance(simulatorName) {
+        function downloadSimulatorReport(report, format) {
+            let simulatorName = '';
+            let params = `?format=${encodeURIComponent(format || 'csv')}`;
+            if (report === 'attendance') {
+                simulatorName = (document.getElementById('attendanceSimulatorName')?.value || '').trim();
+                const selectedGroup = (document.getElementById('attendanceGroupFilter')?.value || 'todos').trim();
+                if (selectedGroup && selectedGroup !== 'todos') {
+                    params += `&group=${encodeURIComponent(selectedGroup)}`;
+                }
+            } else {
+                const entry = adminResultsCache[adminResultsState.selectedIndex];
+                simulatorName = entry && entry.simulator ? entry.simulator : '';
+            }
+            if (!simulatorName) return;
+            window.location.href = `/api/simulators/${encodeURIComponent(simulatorName)}/${report}${params}`;
+        }
+
+        async function loadSimulatorAttendance(simulatorName, page = 1) {
             const body = document.getElementById('simulatorAttendanceBody');
             const summary = document.getElementById('attendanceSummary');
             const groupFilter = document.getElementById('attendanceGroupFilter');
+            const pager = document.getElementById('attendancePagination');
             if (!body || !summary || !groupFilter || !simulatorName) return;
 
             const selectedGroup = (groupFilter.value || 'todos').trim();
-            const params = selectedGroup && selectedGroup !== 'todos' ? `?group=${encodeURIComponent(selectedGroup)}` : '';
+            const safePage = Math.max(1, parseInt(page, 10) || 1);
+            let params = `?page=${safePage}&page_size=${attendanceState.pageSize}`;
+            if (selectedGroup && selectedGroup !== 'todos') {
+                params += `&group=${encodeURIComponent(selectedGroup)}`;
+            }
+            if (pager) pager.innerHTML = '';
 
             body.innerHTML = '<tr><td colspan="6" style="text-align:center; color: var(--text-muted);">Cargando...</td></tr>';
             try {
@@ -2274,6 +2389,24 @@ function createQuestionCard(question) {
 
                 summary.textContent = `Completados: ${data.completed_students || 0} | Pendientes: ${data.pending_students || 0} | Total: ${data.total_students || 0}`;
 
+                const pagination = data.pagination || {};
+                attendanceState.page = parseInt(pagination.page || 1, 10) || 1;
+                attendanceState.totalPages = parseInt(pagination.total_pages || 1, 10) || 1;
+                const offset = (attendanceState.page - 1) * attendanceState.pageSize;
+                if (pager && attendanceState.totalPages > 1) {
+                    pager.innerHTML = `
+                        <button type="button" class="btn btn-secondary" id="attendancePrevBtn" ${attendanceState.page <= 1 ? 'disabled' : ''}>Anterior</button>
+                        <span class="results-admin-page-info">Pagina ${attendanceState.page} de ${attendanceState.totalPages}</span>
+                        <button type="button" class="btn btn-secondary" id="attendanceNextBtn" ${attendanceState.page >= attendanceState.totalPages ? 'disabled' : ''}>Siguiente</button>
+                    `;
+                    document.getElementById('attendancePrevBtn').addEventListener('click', () => {
+                        loadSimulatorAttendance(simulatorName, attendanceState.page - 1);
+                    });
+                    document.getElementById('attendanceNextBtn').addEventListener('click', () => {
+                        loadSimulatorAttendance(simulatorName, attendanceState.page + 1);
+                    });
+                }
+
                 const rows = Array.isArray(data.rows) ? data.rows : [];
                 if (rows.length === 0) {
                     body.innerHTML = '<tr><td colspan="6" style="text-align:center; color: var(--text-muted);">No hay alumnos para este filtro</td></tr>';
@@ -2284,7 +2417,7 @@ function createQuestionCard(question) {
                     const completed = (row.status || '').toLowerCase() === 'completado';
                     return `
                         <tr>
-                            <td>${idx + 1}</td>
+                            <td>${offset + idx + 1}</td>
                             <td>${escapeHtml(row.name || 'Alumno')}</td>
                             <td>${escapeHtml(row.group || '-')}</td>
                             <td><span class="attendance-status ${completed ? 'completed' : 'pending'}">${completed ? 'Completado' : 'Pendiente'}</span></td>
@@ -2355,7 +2488,7 @@ function createQuestionCard(question) {
             allBtn.className = 'subject-btn active';
             allBtn.innerHTML = `
                 <i class="fas fa-layer-group"></i> Todas las materias
-                <span class="count">${allQuestions.length}</span>
+                <span class="count">${questionStatsSummary.total}</span>
             `;
             allBtn.dataset.subject = 'todos';
             allBtn.addEventListener('click', function() {
@@ -2368,9 +2501,8 @@ function createQuestionCard(question) {
             container.appendChild(allBtn);
             
             // Agregar cada materia
-            const subjects = [...new Set(allQuestions.map(q => q.subject))];
-            subjects.forEach(subject => {
-                const count = allQuestions.filter(q => q.subject === subject).length;
+            allSubjects.forEach(subject => {
+                const count = subjectQuestionCounts[subject] || 0;
                 if (count === 0) return;
                 
                 const btn = document.createElement('div');
@@ -2589,14 +2721,14 @@ function displayStudyQuestion(question) {
 }
         
         function previewQuestion(questionId) {
-            const question = allQuestions.find(q => q._id === questionId);
+            const question = questionsById.get(questionId);
             if (question) {
                 displayStudyQuestion(question);
             }
         }
         
         function checkAnswer(selectedIndex, questionId) {
-            const question = allQuestions.find(q => q._id === questionId);
+            const question = questionsById.get(questionId);
             if (!question || !question.has_options) return;
             
             const optionCards = document.querySelectorAll('#modalOptionsContainer .option-card');
@@ -2714,7 +2846,7 @@ function displayStudyQuestion(question) {
         }
         
         function editQuestion(questionId) {
-            const question = allQuestions.find(q => q._id === questionId);
+            const question = questionsById.get(questionId);
             if (!question) {
                 showNotification('Pregunta no encontrada', 'error');
                 return;
@@ -3206,6 +3338,7 @@ document.addEventListener('DOMContentLoaded', function() {
                             <div><strong>Tema:</strong> ${topic}</div>
                             <div><strong>Universidad:</strong> ${university}</div>
                             <div><strong>Preguntas insertadas:</strong> ${data.inserted_count}</div>
+                            ${data.skipped_count ? `<div><strong>Duplicadas omitidas:</strong> ${data.skipped_count}</div>` : ''}
                         </div>
                         
                         <p style="font-size: 0.9rem; color: #666; margin-top: 10px;">
@@ -3499,7 +3632,7 @@ function removeImage() {
 
 // Modificar la funcin editQuestion para cargar imagen existente
 function editQuestion(questionId) {
-    const question = allQuestions.find(q => q._id === questionId);
+    const question = questionsById.get(questionId);
     if (!question) {
         showNotification('Pregunta no encontrada', 'error');
         return;
@@ -0,0 +1,159 @@
+"""Exportacion en streaming de tablas (CSV y XLSX) para reportes de maestro.
+
+Ambos generadores reciben el encabezado y un iterable de filas (normalmente
+alimentado por un cursor de Mongo) y van entregando bytes/texto por bloques,
+asi una exportacion de miles de filas usa memoria constante y la descarga
+empieza con la primera fila.
+
+El XLSX se escribe sin dependencias: es un zip con el XML minimo de un libro
+de una hoja (celdas ``inlineStr``, sin tabla de cadenas compartidas), y
+``zipfile`` puede escribir a un flujo no buscable usando descriptores de
+datos, de modo que la hoja se comprime mientras se generan las filas.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import datetime, timezone
+from numbers import Number
+from typing import Any, Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape
+
+EXPORT_CHUNK_ROWS = 200
+
+# Caracteres de control que XML 1.0 no admite.
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SHEET_NAME_ILLEGAL = re.compile(r"[\[\]:*?/\\]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _cell_text(value: Any) -> str:
+    """Texto de una celda: fechas en ISO UTC, listas/objetos como JSON y lo demas (ObjectId) con ``str``."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        # Mongo devuelve fechas naive en UTC.
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_cell_text, ensure_ascii=False)
+    return str(value)
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence[Any]], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """CSV por bloques de ``chunk_rows`` filas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM: Excel abre el CSV como UTF-8 (nombres con acentos).
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for idx, row in enumerate(rows, start=1):
+        writer.writerow([_cell_text(value) for value in row])
+        if idx % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+class _ChunkSink:
+    """Destino de ``zipfile`` que acumula lo escrito hasta que el generador lo entrega."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _xlsx_row(row: Sequence[Any]) -> str:
+    cells = []
+    for value in row:
+        if isinstance(value, Number) and not isinstance(value, bool):
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            text = escape(_XML_ILLEGAL.sub('', _cell_text(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def iter_xlsx(
+    header: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    sheet_name: str = 'Hoja1',
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """Libro XLSX de una hoja, entregado por bloques mientras se comprime."""
+    sheet_name = _SHEET_NAME_ILLEGAL.sub(' ', sheet_name).strip()[:31] or 'Hoja1'
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        workbook.writestr('_rels/.rels', _ROOT_RELS)
+        workbook.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(sheet_name, {'"': '&quot;'})))
+        workbook.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield sink.drain()
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((_SHEET_HEAD + _xlsx_row(header)).encode('utf-8'))
+            for idx, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if idx % chunk_rows == 0:
+                    data = sink.drain()
+                    if data:
+                        yield data
+            sheet.write(_SHEET_TAIL.encode('utf-8'))
+    yield sink.drain()
@@ -0,0 +1,11 @@
+"""Pruebas de los modulos de apoyo (sin Flask ni servidor de Mongo).
+
+Uso:
+    pip install pytest mongomock
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
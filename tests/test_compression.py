@@ -0,0 +1,89 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response, jsonify
+
+from compression import (
+    choose_encoding,
+    init_compression,
+    precompress,
+    precompressed_response,
+    skip_compression,
+)
+from werkzeug.http import parse_accept_header
+
+BIG = {"items": ["pregunta %d" % idx for idx in range(400)]}
+BIG_BODY = json.dumps(BIG).encode("utf-8")
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_compression(app)
+
+    @app.route("/big")
+    def big():
+        response = jsonify(BIG)
+        response.set_etag("v1")
+        return response
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/stream")
+    def stream():
+        return Response((chunk for chunk in [BIG_BODY]), mimetype="application/json")
+
+    @app.route("/raw")
+    @skip_compression
+    def raw():
+        return jsonify(BIG)
+
+    @app.route("/cached")
+    def cached():
+        return precompressed_response(BIG_BODY, precompress(BIG_BODY, app.config))
+
+    return app.test_client()
+
+
+def test_gzip_when_accepted_and_etag_becomes_weak(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert json.loads(gzip.decompress(response.data)) == BIG
+    assert response.headers["ETag"] == 'W/"v1"'
+
+
+def test_without_accept_encoding_body_is_plain(client):
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == BIG
+
+
+@pytest.mark.parametrize("path", ["/small", "/stream", "/raw"])
+def test_small_streamed_and_opted_out_responses_are_untouched(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_precompressed_variant_matches_the_client(client):
+    response = client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == BIG_BODY
+    plain = client.get("/cached", headers={"Accept-Encoding": "identity"})
+    assert plain.data == BIG_BODY
+
+
+def test_choose_encoding_respects_quality():
+    header = parse_accept_header("gzip;q=0.5, br;q=0")
+    assert choose_encoding(header, ["br", "gzip"]) == "gzip"
+    assert choose_encoding(parse_accept_header("br, gzip;q=0.5"), ["br", "gzip"]) == "br"
+    assert choose_encoding(parse_accept_header("identity"), ["br", "gzip"]) is None
+
+
+def test_precompress_skips_small_or_disabled():
+    assert precompress(b"x" * 10, {}) == {}
+    assert precompress(BIG_BODY, {"COMPRESSION_ENABLED": False}) == {}
+    assert "gzip" in precompress(BIG_BODY, {})
@@ -0,0 +1,47 @@
+from group_dashboard import dashboard_totals, group_key, percent_summary, summarize_group
+
+
+def identity_sections(stats):
+    return stats or {}
+
+
+def test_group_key_is_stable_and_safe_for_field_paths():
+    assert group_key("3.A $b") == group_key("3.A $b")
+    assert group_key("3A") != group_key("3B")
+    assert group_key(None) == group_key("")
+    assert len(group_key("3.A")) == 16
+    assert "." not in group_key("3.A") and "$" not in group_key("3.A")
+
+
+def test_percent_summary():
+    assert percent_summary([]) == {"average": None, "median": None}
+    assert percent_summary([50.0, 100.0, 60.0]) == {"average": 70.0, "median": 60.0}
+
+
+def test_summarize_group_scores_and_sections():
+    attempts = [
+        {"correct": 3, "total": 4, "section_stats": {"B": {"correct": 1, "total": 2}, "A": {"correct": 2, "total": 2}}},
+        {"correct": 1, "total": 4, "section_stats": {"A": {"correct": 1, "total": 2}, "B": {"correct": 0, "total": 2}}},
+        # Intento sin preguntas calificables: cuenta como completado pero no como puntaje.
+        {"correct": 0, "total": 0, "section_stats": {"A": {"correct": 0, "total": 0}}},
+    ]
+    entry = summarize_group("3A", attempts, students=4, section_stats=identity_sections)
+    assert entry["completed"] == 3
+    assert entry["completion_rate"] == 0.75
+    assert entry["score"] == {"average": 50.0, "median": 50.0}
+    assert entry["sections"] == [
+        {"section": "A", "attempts": 2, "average": 75.0, "median": 75.0},
+        {"section": "B", "attempts": 2, "average": 25.0, "median": 25.0},
+    ]
+
+
+def test_completion_rate_is_capped_and_none_without_students():
+    attempts = [{"correct": 1, "total": 1}] * 3
+    assert summarize_group("3A", attempts, 2, identity_sections)["completion_rate"] == 1.0
+    assert summarize_group("3A", attempts, 0, identity_sections)["completion_rate"] is None
+
+
+def test_dashboard_totals():
+    groups = [{"students": 4, "completed": 3}, {"students": 6, "completed": 1}]
+    assert dashboard_totals(groups) == {"students": 10, "completed": 4, "completion_rate": 0.4}
+    assert dashboard_totals([])["completion_rate"] is None
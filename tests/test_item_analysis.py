@@ -0,0 +1,71 @@
+from bson import ObjectId
+
+from simulator_grading import AnswerKey, encode_responses, item_analysis, pack_question_ids, response_matrix
+
+
+def make_key():
+    questions = [
+        {"_id": ObjectId(), "has_options": True, "options": ["a", "b", "c", "d"], "correct_option": correct}
+        for correct in (0, 1, 2)
+    ]
+    return AnswerKey.from_questions(questions), [q["_id"] for q in questions]
+
+
+def analyse(key, attempts):
+    return item_analysis(key, *response_matrix(key, attempts))
+
+
+def hand_attempts(ids):
+    """Aciertos por intento: A 1 1 1, B 1 1 0, C 1 0 0, D 0 0 0."""
+    packed = pack_question_ids(ids)
+    return [
+        (packed, encode_responses([0, 1, 2])),
+        (packed, encode_responses([0, 1, 0])),
+        (packed, encode_responses([0, 3, 0])),
+        (packed, encode_responses([3, None, 0])),
+    ]
+
+
+def test_p_values_and_kr20_on_a_hand_computed_matrix():
+    key, ids = make_key()
+    result = analyse(key, hand_attempts(ids))
+    # p = .75, .5, .25; sum(pq) = .625; varianza del puntaje (3, 2, 1, 0) = 1.25.
+    # KR-20 = 3/2 * (1 - .625 / 1.25) = .75
+    assert [item["p_value"] for item in result["items"]] == [0.75, 0.5, 0.25]
+    assert result["kr20"] == 0.75
+    assert result["complete_attempts"] == 4
+    # Pregunta 1 contra el resto (2, 1, 0, 0): r = .1875 / sqrt(.1875 * .6875)
+    assert result["items"][0]["discrimination"] == 0.5222
+    assert result["items"][1]["unanswered"] == 1
+
+
+def test_distractor_counts_and_flags():
+    key, ids = make_key()
+    third = analyse(key, hand_attempts(ids))["items"][2]
+    assert [(opt["option"], opt["count"], opt["is_correct"]) for opt in third["options"]] == [
+        (0, 3, False), (1, 0, False), (2, 1, True), (3, 0, False)
+    ]
+    assert "distractor_sin_uso" in third["flags"]
+
+
+def test_items_use_only_attempts_that_presented_them():
+    key, ids = make_key()
+    attempts = [
+        (pack_question_ids(ids), encode_responses([0, 1, 2])),
+        # Solo vio las dos primeras preguntas.
+        (pack_question_ids(ids[:2]), encode_responses([0, 0])),
+    ]
+    result = analyse(key, attempts)
+    assert [item["responses"] for item in result["items"]] == [2, 2, 1]
+    assert result["items"][2]["p_value"] == 1.0
+    assert result["complete_attempts"] == 1
+    # Con un solo intento completo no hay varianza para KR-20.
+    assert result["kr20"] is None
+
+
+def test_empty_matrix():
+    key, _ = make_key()
+    result = analyse(key, [])
+    assert result["attempts"] == 0
+    assert all(item["p_value"] is None and item["responses"] == 0 for item in result["items"])
+    assert result["items"][0]["unanswered"] == 0
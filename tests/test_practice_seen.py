@@ -0,0 +1,49 @@
+from bson import ObjectId
+import pytest
+
+from practice_seen import DEFAULT_NUM_BITS, SeenFilter
+
+
+def test_added_ids_are_seen_and_others_mostly_not():
+    seen = SeenFilter()
+    added = [ObjectId() for _ in range(200)]
+    seen.update(added)
+    assert all(oid in seen for oid in added)
+    others = [ObjectId() for _ in range(2000)]
+    assert sum(oid in seen for oid in others) / len(others) < 0.01
+    assert seen.count == 200
+
+
+def test_document_round_trip_keeps_membership():
+    seen = SeenFilter()
+    oid = ObjectId()
+    seen.add(oid)
+    restored = SeenFilter.from_document(seen.to_document())
+    assert oid in restored
+    assert restored.count == 1
+    assert restored.to_document() == seen.to_document()
+
+
+def test_missing_document_gives_empty_filter():
+    seen = SeenFilter.from_document(None)
+    assert seen.count == 0
+    assert seen.num_bits == DEFAULT_NUM_BITS
+
+
+def test_false_positive_rate_grows_and_clear_resets():
+    seen = SeenFilter()
+    assert seen.false_positive_rate() == 0
+    seen.update(range(500))
+    low = seen.false_positive_rate()
+    seen.update(range(500, 3000))
+    assert seen.false_positive_rate() > low
+    seen.clear()
+    assert seen.count == 0
+    assert 7 not in seen
+
+
+def test_invalid_sizes_are_rejected():
+    with pytest.raises(ValueError):
+        SeenFilter(num_bits=100)
+    with pytest.raises(ValueError):
+        SeenFilter(num_bits=64, bits=b"\x00")
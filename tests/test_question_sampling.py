@@ -0,0 +1,75 @@
+import random
+
+import mongomock
+
+from question_sampling import RANDOM_KEY_FIELD, default_max_scan, sample_questions
+
+
+def make_collection(size, rng):
+    collection = mongomock.MongoClient().db.questions
+    collection.insert_many([
+        {"_id": idx, "subject": "Mat" if idx % 2 else "Bio", RANDOM_KEY_FIELD: rng.random()}
+        for idx in range(size)
+    ])
+    return collection
+
+
+class ReshufflingCollection:
+    """Reasigna random_key a lo que lee, como reshuffle_many entre una ventana y la siguiente."""
+
+    def __init__(self, collection, rng):
+        self.collection = collection
+        self.rng = rng
+
+    def find(self, *args, **kwargs):
+        docs = list(self.collection.find(*args, **kwargs))
+        for doc in docs:
+            self.collection.update_one({"_id": doc["_id"]}, {"$set": {RANDOM_KEY_FIELD: self.rng.random()}})
+        return _Cursor(docs)
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        return self.docs[:n]
+
+
+def test_returns_k_distinct_matching_questions():
+    rng = random.Random(1)
+    collection = make_collection(100, rng)
+    picked = sample_questions(collection, {"subject": "Mat"}, 10, rng=rng)
+    ids = [doc["_id"] for doc in picked]
+    assert len(ids) == 10
+    assert len(set(ids)) == 10
+    assert all(doc["subject"] == "Mat" for doc in picked)
+
+
+def test_excluded_ids_are_skipped():
+    rng = random.Random(2)
+    collection = make_collection(30, rng)
+    excluded = set(range(25))
+    picked = sample_questions(collection, {}, 10, exclude=excluded.__contains__, rng=rng)
+    assert sorted(doc["_id"] for doc in picked) == [25, 26, 27, 28, 29]
+
+
+def test_no_repeats_when_keys_move_during_the_scan():
+    rng = random.Random(3)
+    collection = ReshufflingCollection(make_collection(60, rng), rng)
+    for _ in range(20):
+        picked = sample_questions(collection, {}, 60, rng=rng)
+        ids = [doc["_id"] for doc in picked]
+        assert len(ids) == len(set(ids))
+
+
+def test_max_scan_bounds_the_reads():
+    rng = random.Random(4)
+    collection = make_collection(500, rng)
+    excluded = set(range(500))
+    assert sample_questions(collection, {}, 5, exclude=excluded.__contains__, rng=rng, max_scan=40) == []
+    assert default_max_scan(5) == 200
+    assert default_max_scan(50) == 1000
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from simulator_grading import (
+    NEVER_CORRECT,
+    OPEN_ANSWERED,
+    UNANSWERED,
+    AnswerKey,
+    encode_responses,
+    grade,
+    grade_submission,
+    pack_question_ids,
+    parse_submitted_responses,
+    response_matrix,
+    section_stats_row,
+)
+
+
+def make_key():
+    questions = [
+        {"_id": ObjectId(), "has_options": True, "options": ["a", "b", "c"], "correct_option": 1,
+         "simulator_subject": "Matemáticas"},
+        {"_id": ObjectId(), "has_options": True, "options": ["a", "b"], "correct_option": 0,
+         "simulator_subject": "Matemáticas"},
+        # correct_option fuera de rango: ninguna respuesta cuenta.
+        {"_id": ObjectId(), "has_options": True, "options": ["a", "b"], "correct_option": 5,
+         "simulator_subject": "Química"},
+        {"_id": ObjectId(), "has_options": False, "simulator_subject": ""},
+    ]
+    return AnswerKey.from_questions(questions), [q["_id"] for q in questions]
+
+
+def test_answer_key_encodes_open_and_never_correct_questions():
+    key, _ = make_key()
+    assert key.correct.tolist() == [1, 0, NEVER_CORRECT, OPEN_ANSWERED]
+    assert key.sections == ["Matemáticas", "Química", "General"]
+    assert key.section_totals.tolist() == [2, 1, 1]
+
+
+def test_encode_responses():
+    assert list(encode_responses([2, None, "  ", "x", 2.0, True, 999])) == [
+        2, UNANSWERED, UNANSWERED, OPEN_ANSWERED, 2, UNANSWERED, UNANSWERED
+    ]
+
+
+def test_parse_submitted_responses_validates_lists():
+    assert parse_submitted_responses(None, None) is None
+    with pytest.raises(ValueError):
+        parse_submitted_responses([1], [])
+    with pytest.raises(ValueError):
+        parse_submitted_responses([1], ["no-es-un-id"])
+
+
+@pytest.mark.parametrize("case", ["full", "shuffled", "missing", "removed", "truncated"])
+def test_grade_submission_matches_batch_grade(case):
+    key, ids = make_key()
+    answers = [1, 1, 0, "respuesta"]
+    order = list(range(4))
+    if case == "shuffled":
+        order = [3, 1, 0, 2]
+    elif case == "missing":
+        # El envio no trae la pregunta abierta: cuenta como sin responder.
+        order = [0, 1, 2]
+    submitted_ids = [ids[i] for i in order]
+    submitted = [answers[i] for i in order]
+    if case == "removed":
+        # Una pregunta que ya no esta en la clave se ignora.
+        submitted_ids.append(ObjectId())
+        submitted.append(0)
+    packed, responses = pack_question_ids(submitted_ids), encode_responses(submitted)
+    if case == "truncated":
+        responses = responses[:2]
+
+    single = grade_submission(key, packed, responses)
+    choices, present = response_matrix(key, [(packed, responses)])
+    batch = grade(key, choices, present)
+
+    assert single["correct"] == int(batch["correct"][0])
+    assert single["total"] == int(batch["total"][0]) == len(key)
+    assert single["section_stats"] == section_stats_row(key, batch, 0)
+
+
+def test_grade_counts_each_rule():
+    key, ids = make_key()
+    packed = pack_question_ids(ids)
+    attempts = [
+        (packed, encode_responses([1, 0, 0, "texto"])),  # todo lo posible: 3 (la de Quimica nunca cuenta)
+        (packed, encode_responses([0, None, 1, ""])),    # nada
+        (pack_question_ids(ids[:2]), encode_responses([1, 0])),
+    ]
+    graded = grade(key, *response_matrix(key, attempts))
+    assert graded["correct"].tolist() == [3, 0, 2]
+    assert graded["total"].tolist() == [4, 4, 4]
+    assert section_stats_row(key, graded, 0) == {
+        "Matemáticas": {"correct": 2, "total": 2},
+        "Química": {"correct": 0, "total": 1},
+        "General": {"correct": 1, "total": 1},
+    }
+
+
+def test_response_matrix_places_answers_by_question_id():
+    key, ids = make_key()
+    attempts = [(pack_question_ids([ids[2], ids[0]]), encode_responses([1, 2]))]
+    choices, present = response_matrix(key, attempts)
+    assert present.tolist() == [[True, False, True, False]]
+    assert choices[0, 0] == 2 and choices[0, 2] == 1
+    assert np.all(choices[~present] == UNANSWERED)